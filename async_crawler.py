@@ -0,0 +1,318 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from bus_crawler import BusCrawler, PageResult, IncompleteDownload
+from rate_control import RETRY_STATUSES, parse_retry_after
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncBusCrawler(BusCrawler):
+    def __init__(self, base_url, download_dir="images", max_workers=8,
+                 max_concurrency=200, per_host_limit=64, **options):
+        if aiohttp is None:
+            raise RuntimeError("O motor async requer o pacote aiohttp (pip install aiohttp)")
+
+        super().__init__(base_url, download_dir, max_workers, **options)
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.host_semaphores = {}
+        self.http = None
+
+    def host_semaphore(self, url):
+        host = urlparse(url).netloc
+        semaphore = self.host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self.host_semaphores[host] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def request_async(self, url, timeout, headers=None):
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        if self.rate_controller is None:
+            async with self.host_semaphore(url):
+                async with self.http.get(url, timeout=client_timeout, headers=headers) as response:
+                    yield response
+            return
+
+        controller = self.rate_controller
+        for attempt in range(controller.max_attempts):
+            limiter = await controller.acquire_async(url)
+            start = time.monotonic()
+            try:
+                response = await self.http.get(url, timeout=client_timeout, headers=headers)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                limiter.observe(time.monotonic() - start, error=True)
+                limiter.release()
+                if attempt == controller.max_attempts - 1:
+                    raise
+                self.metrics.count('http_retries')
+                await asyncio.sleep(controller.backoff(attempt))
+                continue
+            except BaseException:
+                # Redirecionamentos em loop, URL inválida, corpo truncado...:
+                # o slot do host é devolvido antes de propagar o erro
+                limiter.observe(time.monotonic() - start, error=True)
+                limiter.release()
+                raise
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            limiter.observe(time.monotonic() - start, response.status, retry_after)
+            if response.status in RETRY_STATUSES and attempt < controller.max_attempts - 1:
+                response.release()
+                limiter.release()
+                self.metrics.count('http_retries')
+                await asyncio.sleep(controller.backoff(attempt, retry_after))
+                continue
+
+            try:
+                yield response
+            finally:
+                response.release()
+                limiter.release()
+            return
+
+    async def get_page_async(self, url, timeout=5):
+        with self.metrics.stage('page_fetch'):
+            if self.http_cache is not None:
+                html = await self.get_cached_page_async(url, timeout)
+            else:
+                html = await self.fetch_page_async(url, timeout)
+
+        if html is None:
+            self.metrics.count('page_errors')
+        return html
+
+    async def fetch_page_async(self, url, timeout=5):
+        try:
+            async with self.request_async(url, timeout) as response:
+                response.raise_for_status()
+                body = await response.read()
+                encoding = response.get_encoding()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.log.error(f"Erro ao acessar {url}: {e}")
+            return None
+
+        self.metrics.add_bytes('page_fetch', len(body))
+        return body.decode(encoding, errors='replace')
+
+    async def get_cached_page_async(self, url, timeout=5):
+        entry, served = self.cached_entry(url)
+        if served:
+            self.metrics.add_bytes('page_fetch', len(entry.body))
+            return entry.text()
+        if self.offline:
+            return None
+
+        try:
+            async with self.request_async(url, timeout, headers=entry.validators() if entry else None) as response:
+                if response.status == 304:
+                    if entry is None:
+                        self.log.error(f"Erro ao acessar {url}: 304 sem página em cache")
+                        return None
+                    self.count_cache('cache_not_modified')
+                    self.http_cache.touch(url)
+                    self.metrics.add_bytes('page_fetch', len(entry.body))
+                    return entry.text()
+                response.raise_for_status()
+                body = await response.read()
+                encoding = response.get_encoding()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.log.error(f"Erro ao acessar {url}: {e}")
+            return None
+
+        self.count_cache('cache_misses')
+        self.http_cache.put(url, body, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                            response.headers.get('Content-Type'), encoding)
+        self.metrics.add_bytes('page_fetch', len(body))
+        return body.decode(encoding, errors='replace')
+
+    async def get_high_res_image_url_async(self, image_page_url):
+        if self.journal is not None:
+            known, image_data = self.journal.detail_result(image_page_url)
+            if known:
+                return image_data
+
+        self.log.image(f"🔍 Acessando página da imagem: {image_page_url}")
+
+        html = await self.get_page_async(image_page_url)
+        if html is None:
+            return None
+
+        image_data = self.resolve_image_page(html, image_page_url)
+        self.remember_detail(image_page_url, image_data)
+        return image_data
+
+    async def download_image_async(self, image_url, filename, filepath=None):
+        filepath = filepath or os.path.join(self.download_dir, filename)
+        part_path = self.part_path(filepath)
+
+        with self.metrics.stage('download'):
+            for attempt in range(self.download_attempts):
+                try:
+                    await self.fetch_to_part_async(image_url, part_path)
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownload) as e:
+                    error = e
+                    if attempt < self.download_attempts - 1:
+                        self.metrics.count('download_retries')
+                        self.log.warning(f"⚠️ Download interrompido ({e}), retomando: {filename}")
+                        await asyncio.sleep(0.5 * 2 ** attempt)
+            else:
+                self.metrics.count('download_errors')
+                self.log.error(f"Erro ao baixar {image_url}: {error}")
+                return False
+
+        return self.finish_download(part_path, filepath, filename)
+
+    async def fetch_to_part_async(self, image_url, part_path):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+
+        async with self.request_async(image_url, 15, headers=headers) as response:
+            if response.status == 416:
+                self.handle_range_not_satisfiable(response.headers, part_path, offset)
+                return
+            response.raise_for_status()
+            offset, expected = self.resume_plan(response.status, response.headers, offset)
+
+            with open(part_path, 'ab' if offset else 'wb', buffering=self.buffer_size) as f:
+                written = 0
+                write_time = 0.0
+                try:
+                    async for chunk in response.content.iter_chunked(16384):
+                        start = time.perf_counter()
+                        f.write(chunk)
+                        write_time += time.perf_counter() - start
+                        written += len(chunk)
+                finally:
+                    self.metrics.observe('disk_write', write_time)
+                    self.metrics.add_bytes('download', written)
+
+        self.check_complete(part_path, expected)
+
+    async def download_validated_image_async(self, image_data, index):
+        try:
+            high_res_url = image_data['url']
+            bus_info = image_data['bus_info']
+            filename = self.reserve_filename(image_data, self.generate_filename(high_res_url, index, bus_info))
+            filepath = os.path.join(self.download_dir, filename)
+
+            if self.is_already_downloaded(filename, filepath, high_res_url):
+                self.log.image(f"⏭ Já existe: {filename}")
+                self.index_download(image_data)
+                return None
+
+            self.log.image(f"Baixando: {filename}\n"
+                           f"Linha: {bus_info.get('line_number', 'N/A')} - {bus_info.get('bus_name', 'N/A')}")
+
+            if self.offline:
+                self.log.image(f"📴 Modo offline: {filename} não baixada")
+                return None
+
+            if self.store is not None:
+                temp_path = self.store.temp_path(high_res_url)
+                try:
+                    if not await self.download_image_async(high_res_url, filename, temp_path):
+                        return None
+                    # Hash do conteúdo e hash perceptual leem a imagem: ficam fora do event loop
+                    return await asyncio.to_thread(self.store_download, temp_path, image_data, filename)
+                finally:
+                    self.store.release_temp(temp_path)
+
+            if await self.download_image_async(high_res_url, filename):
+                self.record_download(filename, high_res_url)
+                self.index_download(image_data)
+                self.submit_postprocess(filename, image_data)
+                return filename
+            return None
+
+        except Exception as e:
+            self.log.error(f"Erro no download: {e}")
+            return None
+
+    async def process_images_async(self, image_links, page_num):
+        results = await asyncio.gather(
+            *(self.get_high_res_image_url_async(link) for link in image_links)
+        )
+        valid_images = [result for result in results if result]
+
+        base_index = self.page_base_index(page_num)
+        downloaded = await asyncio.gather(
+            *(self.download_validated_image_async(image_data, base_index + seq_num)
+              for seq_num, image_data in enumerate(valid_images, 1))
+        )
+        return [filename for filename in downloaded if filename]
+
+    async def crawl_page_async(self, page_url, page_num=1, collect_pagination=True):
+        self.log.info(f"\nProcessando página {page_num}: {page_url}")
+
+        links = self.journal.listing_links(page_url) if self.journal is not None else None
+        if links is not None:
+            image_links, pagination_urls = links
+        else:
+            self.record_listing_fetch(page_url)
+
+            html = await self.get_page_async(page_url)
+            if html is None:
+                return PageResult(page_url, page_num)
+
+            image_links, pagination_urls = self.parse_listing_page(html, page_url, collect_pagination)
+            if self.journal is not None:
+                self.journal.record_listing(page_url, image_links, pagination_urls)
+        self.log.info(f"Encontrados {len(image_links)} links de imagens na página {page_num}")
+        new_links = self.filter_new_links(image_links)
+
+        downloaded = await self.process_images_async(new_links, page_num)
+        self.log.info(f"✅ Página {page_num} concluída: {len(downloaded)} imagens baixadas em alta resolução")
+        return PageResult(page_url, page_num, image_links, pagination_urls, downloaded, new_links)
+
+    async def crawl_website_async(self, start_url, max_pages=None):
+        print(f"Iniciando crawler async para: {start_url}")
+
+        self.reset_stats()
+        frontier = self.open_frontier(start_url)
+        total_images = 0
+
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=0)
+        headers = dict(self.session.headers)
+        async with aiohttp.ClientSession(connector=connector, headers=headers) as http:
+            self.http = http
+            try:
+                while True:
+                    page = frontier.next_page(max_pages)
+                    if page is None:
+                        break
+                    current_url, page_num = page
+
+                    collect_pagination = frontier.wants_more(max_pages)
+                    result = await self.crawl_page_async(current_url, page_num, collect_pagination)
+                    if not result.fetched:
+                        continue
+                    total_images += len(result.image_links)
+
+                    if self.should_stop_paginating(result.new_links):
+                        frontier.stop()
+                    else:
+                        for url in frontier.add(result.pagination_urls):
+                            self.log.info(f"🔗 Nova página encontrada: {url}")
+                    frontier.finish(current_url)
+
+                self.finish_run(frontier)
+            finally:
+                self.http = None
+                self.close_stores()
+
+        self.print_summary(frontier.page_count, total_images)
+
+    def crawl_website(self, start_url, max_pages=None):
+        asyncio.run(self.crawl_website_async(start_url, max_pages))
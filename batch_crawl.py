@@ -0,0 +1,274 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from bus_crawler import (create_crawler, create_session, create_rate_controller, store_paths, canonicalize_url)
+
+DEFAULTS = {
+    'base_url': "https://www.onibusbrasil.com",
+    'download_dir': "onibus_images",
+    'engine': "threads",
+    'workers': 8,
+    'budget': None,
+    'concurrent_seeds': 4,
+    'pages': None,
+    'max_details': None,
+}
+
+
+class Seed:
+    # discovery: None (listagens), 'sitemap' (url é o sitemap) ou 'ids'
+    # (url é um modelo com {id} e ids o intervalo inclusivo)
+    def __init__(self, url, name=None, pages=None, download_dir=None, options=None, discovery=None, ids=None):
+        self.url = url
+        self.name = name
+        self.pages = pages
+        self.download_dir = download_dir
+        self.options = options or {}
+        self.discovery = discovery
+        self.ids = ids
+
+
+def seed_name(url):
+    # Nome de diretório legível e estável a partir da URL
+    parsed = urlsplit(url)
+    name = re.sub(r'\W+', '_', f"{parsed.netloc}{parsed.path}_{parsed.query}").strip('_').lower()
+    return name[:80] or 'seed'
+
+
+def parse_seed(entry):
+    if isinstance(entry, str):
+        return Seed(entry)
+    options = dict(entry)
+    ids = options.pop('ids', None)
+    if isinstance(ids, str):
+        ids = parse_id_range(ids)
+    return Seed(options.pop('url'), options.pop('name', None), options.pop('pages', None),
+                options.pop('download_dir', None), options, options.pop('discovery', None),
+                tuple(ids) if ids else None)
+
+
+def load_job(path):
+    # .json: {"seeds": [...], e opções padrão}; outro arquivo: uma URL por linha
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            job = json.load(f)
+            seeds = [parse_seed(entry) for entry in job.pop('seeds', [])]
+            return job, seeds
+        urls = [line.strip() for line in f]
+    return {}, [Seed(url) for url in urls if url and not url.startswith('#')]
+
+
+def shard_key(seed):
+    # Intervalos de IDs compartilham o mesmo modelo de URL: o tipo de
+    # descoberta e o intervalo entram na chave
+    if seed.discovery is None:
+        return canonicalize_url(seed.url)
+    ids = f"{seed.ids[0]}-{seed.ids[1]}" if seed.ids else ''
+    return f"{canonicalize_url(seed.url)}|{seed.discovery}|{ids}"
+
+
+def shard_seeds(seeds, shard, shards):
+    # Pelo hash da URL canônica: a divisão não depende da ordem da lista, e
+    # cada seed continua no mesmo shard quando outros entram ou saem
+    if shards <= 1:
+        return list(seeds)
+    return [seed for seed in seeds
+            if int(hashlib.sha1(shard_key(seed).encode('utf-8')).hexdigest(), 16) % shards == shard - 1]
+
+
+def assign_names(seeds, download_dir):
+    # Um seed sozinho usa o próprio download_dir, como o modo interativo;
+    # com vários, cada um ganha um subdiretório
+    used = set()
+    for seed in seeds:
+        if seed.download_dir:
+            continue
+        if len(seeds) == 1 and not seed.name:
+            seed.download_dir = download_dir
+            continue
+        name = seed.name or seed_name(seed.url)
+        unique = name
+        suffix = 2
+        while unique in used:
+            unique = f"{name}_{suffix}"
+            suffix += 1
+        used.add(unique)
+        seed.name = unique
+        seed.download_dir = os.path.join(download_dir, unique)
+
+
+def run_batch(seeds, download_dir=DEFAULTS['download_dir'], base_url=DEFAULTS['base_url'],
+              engine=DEFAULTS['engine'], workers=DEFAULTS['workers'], budget=None,
+              concurrent_seeds=DEFAULTS['concurrent_seeds'], pages=None, stores=True, max_details=None,
+              **options):
+    # Vários seeds no mesmo processo, com sessão (pool de conexões), controle
+    # de taxa e orçamento de requisições simultâneas compartilhados
+    seeds = [seed if isinstance(seed, Seed) else parse_seed(seed) for seed in seeds]
+    if not seeds:
+        return []
+    if engine not in ('threads', 'pipeline') and len(seeds) > 1:
+        raise RuntimeError("Vários seeds na mesma execução requerem o motor threads ou pipeline")
+    assign_names(seeds, download_dir)
+
+    budget = budget or workers * min(len(seeds), concurrent_seeds)
+    shared = {}
+    if engine in ('threads', 'pipeline'):
+        adaptive = options.get('adaptive', False)
+        rate = options.get('requests_per_second')
+        shared['session'] = create_session(budget, adaptive or bool(rate))
+        shared['budget'] = threading.BoundedSemaphore(budget)
+        if adaptive or rate:
+            shared['rate_controller'] = create_rate_controller(
+                budget, adaptive, options.get('target_latency', 1.0), rate)
+
+    def run_seed(seed):
+        seed_options = dict(options)
+        if stores:
+            seed_options.update(store_paths(seed.download_dir))
+        seed_options.update(seed.options)
+        seed_options.update(shared)
+        if seed.name and len(seeds) > 1:
+            seed_options.setdefault('log_name', seed.name)
+        result = {'name': seed.name, 'url': seed.url, 'download_dir': seed.download_dir, 'error': None}
+        try:
+            crawler = create_crawler(base_url, seed.download_dir, max_workers=workers, engine=engine, **seed_options)
+            if seed.discovery == 'sitemap':
+                crawler.crawl_sitemap(seed.url, max_details)
+            elif seed.discovery == 'ids':
+                crawler.crawl_id_range(seed.url, *seed.ids, max_details)
+            else:
+                crawler.crawl_website(seed.url, seed.pages if seed.pages is not None else pages)
+        except Exception as e:
+            result['error'] = str(e)
+            return result
+        result['listing_fetches'] = crawler.stats['listing_fetches'] + crawler.stats['sitemap_fetches']
+        result['downloaded'] = crawler.metrics.snapshot()['counters'].get('images_downloaded', 0)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrent_seeds, len(seeds)))) as executor:
+        return list(executor.map(run_seed, seeds))
+
+
+def print_results(results):
+    if len(results) < 2:
+        return
+    print("\nResumo dos seeds:")
+    for result in results:
+        if result['error']:
+            print(f"❌ {result['name']}: {result['error']}")
+        else:
+            print(f"✅ {result['name']}: {result['listing_fetches']} páginas, "
+                  f"{result['downloaded']} imagens baixadas em {result['download_dir']}")
+
+
+def parse_shard(value):
+    try:
+        shard, shards = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("use o formato K/N, por exemplo 2/4")
+    if not 1 <= shard <= shards:
+        raise argparse.ArgumentTypeError("K deve estar entre 1 e N")
+    return shard, shards
+
+
+def parse_id_range(value):
+    try:
+        start, end = (int(part) for part in value.split('-'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("use o formato INÍCIO-FIM, por exemplo 1-5000")
+    if start > end:
+        raise argparse.ArgumentTypeError("o início do intervalo deve ser menor ou igual ao fim")
+    return start, end
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='bus_crawler.py',
+        description="Crawl sem perguntas: um ou mais seeds, ou um arquivo de job. Sem argumentos, o modo interativo.")
+    parser.add_argument('urls', nargs='*', help="URLs iniciais")
+    parser.add_argument('--job', help="arquivo de job: .json com seeds e opções, ou uma URL por linha")
+    parser.add_argument('--pages', type=int, help="máximo de páginas de listagem por seed")
+    parser.add_argument('--sitemap', action='append', default=[],
+                        help="descobre as páginas de detalhe num sitemap.xml (.gz e índices aceitos; pode repetir)")
+    parser.add_argument('--id-range', type=parse_id_range, action='append', default=[],
+                        help="descobre as páginas de detalhe por um intervalo de IDs, INÍCIO-FIM (pode repetir)")
+    parser.add_argument('--id-template', help="modelo da URL de detalhe com {id} (padrão: BASE_URL/foto/{id})")
+    parser.add_argument('--max-details', type=int, help="máximo de páginas de detalhe por sitemap ou intervalo")
+    parser.add_argument('--engine', choices=['threads', 'pipeline', 'async'])
+    parser.add_argument('--workers', type=int, help="threads (ou requisições simultâneas no async) por seed")
+    parser.add_argument('--budget', type=int, help="requisições simultâneas somando todos os seeds")
+    parser.add_argument('--concurrent-seeds', type=int, help="seeds processados ao mesmo tempo (padrão: 4)")
+    parser.add_argument('--download-dir', help="diretório das imagens (um subdiretório por seed)")
+    parser.add_argument('--base-url')
+    parser.add_argument('--shard', type=parse_shard, help="processa só o shard K de N dos seeds (K/N)")
+    parser.add_argument('--resume', action='store_true', default=None, help="retoma o crawl registrado no journal")
+    parser.add_argument('--incremental', action='store_true', default=None)
+    parser.add_argument('--offline', action='store_true', default=None)
+    parser.add_argument('--adaptive', action='store_true', default=None)
+    parser.add_argument('--content-store', action='store_true', default=None)
+    parser.add_argument('--perceptual-dedupe', action='store_true', default=None)
+    parser.add_argument('--verify-images', action='store_true', default=None)
+    parser.add_argument('--postprocess', action='store_true', default=None)
+    parser.add_argument('--fast-parse', action='store_true', default=None)
+    parser.add_argument('--parse-processes', type=int)
+    parser.add_argument('--stats-interval', type=float)
+    parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error'])
+    parser.add_argument('--log-sample', type=int)
+    parser.add_argument('--log-json', action='store_true', default=None)
+    parser.add_argument('--progress', action='store_true', default=None)
+    parser.add_argument('--no-stores', action='store_true',
+                        help="sem journal, índice, cache HTTP, estatísticas de estratégia e manifesto")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = vars(parser.parse_args(argv))
+
+    # Precedência: padrões < arquivo de job < linha de comando
+    settings = dict(DEFAULTS)
+    seeds = []
+    if args['job']:
+        job, seeds = load_job(args['job'])
+        settings.update(job)
+    seeds += [Seed(url) for url in args['urls']]
+    seeds += [Seed(url, discovery='sitemap') for url in args['sitemap']]
+    if not (seeds or args['id_range']):
+        parser.error("informe ao menos uma URL, um sitemap, um intervalo de IDs ou um arquivo de job (--job)")
+
+    shard = args.pop('shard')
+    no_stores = args.pop('no_stores')
+    id_template = args.pop('id_template')
+    id_ranges = args.pop('id_range')
+    for key in ('job', 'urls', 'sitemap'):
+        args.pop(key)
+    settings.update({key: value for key, value in args.items() if value is not None})
+
+    template = id_template or settings['base_url'].rstrip('/') + '/foto/{id}'
+    if '{id}' not in template:
+        parser.error("--id-template precisa conter {id}")
+    seeds += [Seed(template, name=f"ids_{start}_{end}" if len(id_ranges) > 1 else None,
+                   discovery='ids', ids=(start, end)) for start, end in id_ranges]
+
+    # Nomes antes da divisão: o diretório de cada seed é o mesmo com ou sem shards
+    assign_names(seeds, settings['download_dir'])
+    if shard:
+        total = len(seeds)
+        seeds = shard_seeds(seeds, *shard)
+        print(f"🧩 Shard {shard[0]}/{shard[1]}: {len(seeds)} de {total} seeds")
+        if not seeds:
+            return []
+
+    results = run_batch(seeds, stores=not no_stores, **settings)
+    print_results(results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
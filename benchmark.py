@@ -0,0 +1,730 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixture_site import FixtureSite
+
+
+def run_child(args):
+    from bus_crawler import create_crawler
+
+    download_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+    try:
+        crawler = create_crawler(args.url, download_dir, max_workers=args.workers, engine=args.engine,
+                                 log_level=args.log_level, log_sample=args.log_sample)
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        with open(args.log_file or os.devnull, 'w') as output, contextlib.redirect_stdout(output):
+            crawler.crawl_website(args.url, args.pages)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+
+        images = len([name for name in os.listdir(download_dir) if not name.startswith('.')])
+    finally:
+        shutil.rmtree(download_dir, ignore_errors=True)
+
+    counters = crawler.metrics.snapshot()['counters']
+    print(json.dumps({
+        'engine': args.engine,
+        'workers': args.workers,
+        'pages': crawler.stats['listing_fetches'],
+        'images': images,
+        'seconds': elapsed,
+        'cpu_seconds': cpu,
+        'pages_per_sec': crawler.stats['listing_fetches'] / elapsed if elapsed else 0.0,
+        'images_per_sec': images / elapsed if elapsed else 0.0,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'resumed': crawler.stats['resumed_downloads'],
+        'branches': {name: value for name, value in counters.items()
+                     if name.startswith('service_') or name.endswith('_hits') or name == 'strategy_misses'},
+    }))
+
+
+def run_parse_scaling(args):
+    from bus_crawler import BusCrawler, _init_parse_worker, _resolve_detail_batch, process_context
+    from concurrent.futures import ProcessPoolExecutor
+
+    page_size = args.page_size if args.page_size is not None else 200_000
+    site = FixtureSite(images_per_page=1, page_size=page_size)
+    site.server.server_close()
+
+    download_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+    try:
+        pages = [
+            (i, f"http://fixture/foto/{i}", site.detail_page(i).encode('utf-8'), 'utf-8')
+            for i in range(1, args.parse_pages + 1)
+        ]
+        batches = [pages[i:i + args.chunksize] for i in range(0, len(pages), args.chunksize)]
+
+        crawler = BusCrawler("http://fixture", download_dir)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            for _, url, content, encoding in pages:
+                crawler.resolve_image_page(content.decode(encoding), url)
+            baseline = time.perf_counter() - start
+
+        print(f"{len(pages)} páginas de detalhe de ~{len(pages[0][2]) // 1024} KB, lotes de {args.chunksize}")
+        print(f"{'processos':>9} {'seg':>8} {'pág/s':>9} {'speedup':>8}")
+        print(f"{'0':>9} {baseline:>8.2f} {len(pages) / baseline:>9.1f} {1.0:>8.2f}")
+
+        for processes in args.processes or [1, 2, 4, 8]:
+            with ProcessPoolExecutor(max_workers=processes, mp_context=process_context(),
+                                     initializer=_init_parse_worker,
+                                     initargs=("http://fixture", download_dir)) as pool:
+                # Aquece os processos antes de medir
+                list(pool.map(abs, range(processes)))
+                start = time.perf_counter()
+                for future in [pool.submit(_resolve_detail_batch, batch) for batch in batches]:
+                    future.result()
+                elapsed = time.perf_counter() - start
+            print(f"{processes:>9} {elapsed:>8.2f} {len(pages) / elapsed:>9.1f} {baseline / elapsed:>8.2f}")
+    finally:
+        shutil.rmtree(download_dir, ignore_errors=True)
+
+
+def run_matcher(args):
+    from bs4 import BeautifulSoup
+    from service_matcher import match_service
+
+    site = FixtureSite(images_per_page=1)
+    site.server.server_close()
+
+    detail = site.detail_page(7)
+    variants = {
+        'serviço': detail,
+        'inter': detail.replace('107 - Terminal Central / Centro', 'INTER 107'),
+        'genérico': detail.replace('Serviço Urbano: ', 'Urbano ').replace(' - Terminal', ' Terminal'),
+        'sem urbano': detail.replace('Serviço Urbano', 'Serviço Rodoviário'),
+    }
+
+    print(f"{'tamanho':>9} {'variante':<11} {'ms/pág':>8} {'MB/s':>8}  resultado")
+    for size in args.matcher_sizes or [10_000, 100_000, 1_000_000]:
+        # Repete o conteúdo de preenchimento antes do bloco de serviço
+        filler = ' '.join(['Carroceria em ótimo estado, foto registrada na garagem.'] * (size // 56))
+        for name, html in variants.items():
+            text = filler + ' ' + BeautifulSoup(html, 'html.parser').get_text().replace('\n', ' ')
+            repeat = max(1, 2_000_000 // len(text))
+            start = time.perf_counter()
+            for _ in range(repeat):
+                result = match_service(text)
+            elapsed = (time.perf_counter() - start) / repeat
+            print(f"{len(text):>9} {name:<11} {elapsed * 1000:>8.3f} {len(text) / elapsed / 1e6:>8.1f}  "
+                  f"{result[1] if result else None}")
+
+
+def run_parse_modes(args):
+    import tracemalloc
+    from bus_crawler import BusCrawler
+
+    page_size = args.page_size if args.page_size is not None else 200_000
+    site = FixtureSite(images_per_page=1, page_size=page_size)
+    site.server.server_close()
+    pages = [site.detail_page(i) for i in range(1, args.parse_pages + 1)]
+
+    download_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+    try:
+        print(f"{len(pages)} páginas de detalhe de ~{len(pages[0]) // 1024} KB")
+        print(f"{'modo':<10} {'ms/pág':>8} {'pico MB/pág':>12}")
+        for fast_parse in (False, True):
+            crawler = BusCrawler("http://fixture", download_dir, fast_parse=fast_parse)
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                for i, html in enumerate(pages):
+                    crawler.resolve_image_page(html, f"http://fixture/foto/{i}")
+                elapsed = (time.perf_counter() - start) / len(pages)
+
+                # Pico de memória alocada durante o parsing de uma página
+                tracemalloc.start()
+                crawler.resolve_image_page(pages[0], "http://fixture/foto/0")
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            name = 'rápido' if fast_parse else 'completo'
+            print(f"{name:<10} {elapsed * 1000:>8.2f} {peak / 1024 / 1024:>12.2f}")
+    finally:
+        shutil.rmtree(download_dir, ignore_errors=True)
+
+
+def run_rate_control(args):
+    import threading
+    from bus_crawler import create_crawler
+
+    workers = (args.workers or [32])[0]
+    engine = (args.engine or ['threads'])[0]
+    print(f"Servidor com capacidade {args.capacity}, {engine} com {workers} workers")
+    print(f"{'modo':<10} {'seg':>7} {'imagens':>7} {'req':>6} {'429/503':>7} {'pico srv':>8} {'limite final':>12}")
+
+    for adaptive in (False, True):
+        with FixtureSite(pages=args.pages, images_per_page=args.images_per_page, latency=args.latency,
+                         capacity=args.capacity, retry_after=args.retry_after) as site:
+            download_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+            trajectory = []
+            try:
+                crawler = create_crawler(site.base_url, download_dir, max_workers=workers,
+                                         engine=engine, adaptive=adaptive,
+                                         target_latency=args.target_latency)
+                done = threading.Event()
+
+                def sample():
+                    # Amostra o limite aprendido e a carga real no servidor
+                    while not done.wait(0.25):
+                        if crawler.rate_controller is not None:
+                            for info in crawler.rate_controller.snapshot().values():
+                                trajectory.append((info['limit'], site.in_flight))
+
+                sampler = threading.Thread(target=sample, daemon=True)
+                sampler.start()
+                start = time.perf_counter()
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    crawler.crawl_website(site.start_url, args.pages)
+                elapsed = time.perf_counter() - start
+                done.set()
+                sampler.join()
+                images = len(os.listdir(download_dir))
+            finally:
+                shutil.rmtree(download_dir, ignore_errors=True)
+
+            final = trajectory[-1][0] if trajectory else '-'
+            name = 'adaptativo' if adaptive else 'fixo'
+            print(f"{name:<10} {elapsed:>7.2f} {images:>7} {site.request_count:>6} {site.overload_count:>7} "
+                  f"{site.max_in_flight:>8} {final:>12}")
+
+    if trajectory:
+        print("\nConvergência do modo adaptativo (limite / requisições no servidor, a cada 0,25 s):")
+        print(' '.join(f"{limit:g}/{load}" for limit, load in trajectory))
+
+
+def run_frontier(args):
+    from bus_crawler import Frontier
+
+    def links(page):
+        # Cada página anuncia a anterior e as duas seguintes, com variações
+        # que só a canonicalização reconhece como a mesma URL
+        return [
+            f"http://fixture/fotos?page={page - 1}",
+            f"http://fixture/fotos?page={page + 1}&",
+            f"http://fixture/fotos?page={page + 1}#topo",
+            f"http://FIXTURE:80/fotos?page={page + 2}",
+        ]
+
+    def crawl_list(total):
+        # Fronteira antiga: lista com pop(0) e busca linear
+        visited = set()
+        queue = ["http://fixture/fotos?page=1"]
+        pages = 0
+        while queue and pages < total:
+            url = queue.pop(0)
+            if url in visited:
+                continue
+            visited.add(url)
+            pages += 1
+            for link in links(pages):
+                if link not in visited and link not in queue:
+                    queue.append(link)
+        return pages, len(queue)
+
+    def crawl_frontier(total):
+        frontier = Frontier("http://fixture/fotos?page=1")
+        while True:
+            page = frontier.next_page(total)
+            if page is None:
+                break
+            frontier.add(links(page[1]))
+        return frontier.page_count, len(frontier.queue)
+
+    print(f"{'URLs':>9} {'fronteira':<10} {'seg':>8} {'URLs/s':>11} {'páginas':>9} {'na fila':>8}")
+    for urls in args.frontier_sizes or [10_000, 100_000, 1_000_000]:
+        total = urls // 4
+        for name, crawl in (('lista', crawl_list), ('deque', crawl_frontier)):
+            if name == 'lista' and urls > 40_000:
+                print(f"{urls:>9} {name:<10} {'-':>8} (quadrático, omitido)")
+                continue
+            start = time.perf_counter()
+            pages, queued = crawl(total)
+            elapsed = time.perf_counter() - start
+            print(f"{urls:>9} {name:<10} {elapsed:>8.2f} {urls / elapsed:>11.0f} {pages:>9} {queued:>8}")
+
+
+def run_image_store(args):
+    import random
+    from image_store import ImageStore
+
+    print(f"{'entradas':>9} {'abrir(ms)':>10} {'carregar tudo(s)':>16} {'consultas/s':>12} {'MB':>7}")
+    for entries in args.store_sizes or [100_000, 1_000_000]:
+        download_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+        try:
+            store = ImageStore(download_dir)
+            with store.conn:
+                store.conn.executemany(
+                    'INSERT INTO urls (image_url, sha256) VALUES (?, ?)',
+                    ((f"http://fixture/img/{i}-large.jpg", f"{i:064x}") for i in range(entries)),
+                )
+            store.close()
+            size = os.path.getsize(store.path) / 1024 / 1024
+
+            start = time.perf_counter()
+            store = ImageStore(download_dir)
+            opened = time.perf_counter() - start
+
+            # Para comparação: carregar todas as URLs em memória, como o índice de detalhes faz
+            start = time.perf_counter()
+            loaded = {url for (url,) in store.conn.execute('SELECT image_url FROM urls')}
+            load_all = time.perf_counter() - start
+            del loaded
+
+            rng = random.Random(0)
+            lookups = [f"http://fixture/img/{rng.randrange(entries * 2)}-large.jpg" for _ in range(100_000)]
+            start = time.perf_counter()
+            for url in lookups:
+                store.url_digest(url)
+            elapsed = time.perf_counter() - start
+            store.close()
+
+            print(f"{entries:>9} {opened * 1000:>10.1f} {load_all:>16.2f} {len(lookups) / elapsed:>12.0f} {size:>7.1f}")
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+
+def run_manifest(args):
+    import random
+    from manifest import ManifestWriter, Manifest
+
+    print(f"{'registros':>9} {'escrita/s':>10} {'por linha(ms)':>13} {'varredura(s)':>12} {'MB':>7}")
+    for entries in args.manifest_sizes or [100_000, 1_000_000]:
+        manifest_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+        path = os.path.join(manifest_dir, 'manifest.jsonl')
+        try:
+            rng = random.Random(0)
+            writer = ManifestWriter(path)
+            start = time.perf_counter()
+            for i in range(entries):
+                line_number = rng.randrange(1, 1000)
+                writer.append({
+                    'filename': f"{i:07d}_linha_{line_number}.jpg",
+                    'line_number': str(line_number),
+                    'bus_name': f"linha {line_number}",
+                    'page_url': f"http://fixture/foto/{i}",
+                    'image_url': f"http://fixture/img/{i}-large.jpg",
+                    'size': 150_000,
+                    'sha256': None,
+                    'downloaded_at': time.time(),
+                })
+            writer.close()
+            write_rate = entries / (time.perf_counter() - start)
+            size = os.path.getsize(path) / 1024 / 1024
+
+            manifest = Manifest(path)
+            queries = [str(rng.randrange(1, 1000)) for _ in range(100)]
+            start = time.perf_counter()
+            found = sum(len(manifest.by_line(line_number)) for line_number in queries)
+            by_line = (time.perf_counter() - start) / len(queries)
+
+            # Para comparação: a mesma consulta varrendo o JSONL inteiro
+            start = time.perf_counter()
+            scanned = sum(1 for record in manifest if record['line_number'] == queries[0])
+            scan = time.perf_counter() - start
+            assert found and scanned == len(manifest.by_line(queries[0]))
+            manifest.close()
+
+            print(f"{entries:>9} {write_rate:>10.0f} {by_line * 1000:>13.2f} {scan:>12.2f} {size:>7.1f}")
+        finally:
+            shutil.rmtree(manifest_dir, ignore_errors=True)
+
+
+def run_http_cache(args):
+    from bus_crawler import create_crawler
+
+    workers = (args.workers or [16])[0]
+    engine = (args.engine or ['threads'])[0]
+    cache_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+    cache_path = os.path.join(cache_dir, 'cache.db')
+
+    print(f"{'execução':<10} {'seg':>7} {'requisições':>11} {'hits':>6} {'misses':>7} {'304':>6}")
+    try:
+        with FixtureSite(pages=args.pages, images_per_page=args.images_per_page, latency=args.latency,
+                         page_size=args.page_size or 0) as site:
+            for name, options in (('fria', {}), ('morna', {}), ('offline', {'offline': True})):
+                download_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+                try:
+                    crawler = create_crawler(site.base_url, download_dir, max_workers=workers, engine=engine,
+                                             cache_path=cache_path, **options)
+                    requests_before = site.request_count
+                    start = time.perf_counter()
+                    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                        crawler.crawl_website(site.start_url, args.pages)
+                    elapsed = time.perf_counter() - start
+                finally:
+                    shutil.rmtree(download_dir, ignore_errors=True)
+
+                stats = crawler.stats
+                print(f"{name:<10} {elapsed:>7.2f} {site.request_count - requests_before:>11} "
+                      f"{stats['cache_hits']:>6} {stats['cache_misses']:>7} {stats['cache_not_modified']:>6}")
+        print(f"Cache em disco: {os.path.getsize(cache_path) / 1024:.0f} KB")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def run_discovery(args):
+    from bus_crawler import create_crawler
+
+    workers = (args.workers or [16])[0]
+    engine = (args.engine or ['threads'])[0]
+    print(f"{engine} com {workers} workers, {args.pages} páginas de {args.images_per_page} fotos")
+    print(f"{'descoberta':<10} {'seg':>7} {'imagens':>7} {'requisições':>11} {'img/s':>8}")
+
+    for name in ('listagem', 'sitemap', 'ids'):
+        with FixtureSite(pages=args.pages, images_per_page=args.images_per_page, latency=args.latency,
+                         page_size=args.page_size or 0) as site:
+            download_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+            try:
+                crawler = create_crawler(site.base_url, download_dir, max_workers=workers, engine=engine)
+                start = time.perf_counter()
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    if name == 'sitemap':
+                        crawler.crawl_sitemap(site.sitemap_url)
+                    elif name == 'ids':
+                        crawler.crawl_id_range(site.id_template, 1, args.pages * args.images_per_page)
+                    else:
+                        crawler.crawl_website(site.start_url, args.pages)
+                elapsed = time.perf_counter() - start
+                images = len(os.listdir(download_dir))
+            finally:
+                shutil.rmtree(download_dir, ignore_errors=True)
+
+            print(f"{name:<10} {elapsed:>7.2f} {images:>7} {site.request_count:>11} {images / elapsed:>8.1f}")
+
+
+def run_image_candidates(args):
+    from urllib.parse import urljoin
+    from bs4 import BeautifulSoup
+    from bus_crawler import BusCrawler
+    from fixture_site import IMAGE_LAYOUTS
+    from image_candidates import (IMAGE_EXTENSIONS, LIGHTBOX_SELECTORS, SCRIPT_IMAGE_PATTERNS,
+                                  MAIN_IMAGE_SELECTORS, DOWNLOAD_SELECTORS, META_SELECTORS)
+
+    def select_cascade(soup, page_url):
+        # Cascata antiga: um soup.select_one (percurso da árvore) por seletor
+        for selector in LIGHTBOX_SELECTORS:
+            img = soup.select_one(selector)
+            if img:
+                parent = img.find_parent('a')
+                href = parent.get('href') if parent else None
+                if href and any(ext in href.lower() for ext in IMAGE_EXTENSIONS):
+                    return urljoin(page_url, href)
+        for script in soup.find_all('script'):
+            if script.string:
+                for pattern in SCRIPT_IMAGE_PATTERNS:
+                    for match in pattern.findall(script.string):
+                        if 'large' in match.lower() or 'full' in match.lower() or 'original' in match.lower():
+                            return urljoin(page_url, match)
+        for selector in MAIN_IMAGE_SELECTORS:
+            img = soup.select_one(selector)
+            if img and (img.get('src') or img.get('data-src')):
+                return urljoin(page_url, img.get('src') or img.get('data-src'))
+        largest, max_size = None, 0
+        for img in soup.find_all('img'):
+            src = img.get('src') or img.get('data-src')
+            if src and img.get('width') and img.get('height'):
+                try:
+                    size = int(img.get('width')) * int(img.get('height'))
+                except ValueError:
+                    continue
+                if size > max_size:
+                    largest, max_size = src, size
+        if largest:
+            return urljoin(page_url, largest)
+        for selector in DOWNLOAD_SELECTORS:
+            link = soup.select_one(selector)
+            href = link.get('href') if link else None
+            if href and any(ext in href.lower() for ext in IMAGE_EXTENSIONS):
+                return urljoin(page_url, href)
+        for selector in META_SELECTORS:
+            meta = soup.select_one(selector)
+            if meta and meta.get('content'):
+                return urljoin(page_url, meta.get('content'))
+        return None
+
+    download_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+    try:
+        crawler = BusCrawler("http://fixture", download_dir)
+        print(f"{'tamanho':>9} {'layout':<21} {'seletores(ms)':>13} {'índice(ms)':>10} {'speedup':>8}")
+        for page_size in args.candidate_sizes or [10_000, 100_000, 1_000_000]:
+            site = FixtureSite(images_per_page=1, page_size=page_size, mixed_layouts=True)
+            site.server.server_close()
+            # Uma foto de cada layout de imagem, com serviço urbano
+            for layout_index, (layout, _) in enumerate(IMAGE_LAYOUTS):
+                photo_id = next(i for i in range(1, 200) if site.layouts(i)[1][0] == layout
+                                and site.layouts(i)[0][0] != 'rodoviario')
+                url = f"http://fixture/foto/{photo_id}"
+                soup = BeautifulSoup(site.detail_page(photo_id), 'html.parser')
+                repeat = max(1, 2_000_000 // page_size)
+
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    expected = select_cascade(soup, url)
+                old = (time.perf_counter() - start) / repeat
+
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    result = crawler.find_high_res_image(soup, url, {})
+                new = (time.perf_counter() - start) / repeat
+
+                assert (result['url'] if result else None) == expected, (layout, result, expected)
+                print(f"{len(str(soup)):>9} {layout:<21} {old * 1000:>13.2f} {new * 1000:>10.2f} {old / new:>8.1f}")
+    finally:
+        shutil.rmtree(download_dir, ignore_errors=True)
+
+
+def run_sharded(args):
+    from bus_crawler import canonicalize_url
+    from work_queue import WorkQueue
+
+    workers = (args.workers or [8])[0]
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sharded_crawler.py')
+    print(f"{'nós':>4} {'threads/nó':>10} {'seg':>7} {'imagens':>7} {'requisições':>11} {'tarefas':>8} {'falhas':>6}")
+
+    for nodes in args.nodes or [1, 2, 4]:
+        with FixtureSite(pages=args.pages, images_per_page=args.images_per_page, latency=args.latency,
+                         error_rate=args.error_rate, page_size=args.page_size or 0) as site:
+            work_dir = tempfile.mkdtemp(prefix='buscrawl_bench_')
+            try:
+                queue_path = os.path.join(work_dir, 'fila.db')
+                download_dir = os.path.join(work_dir, 'imagens')
+                queue = WorkQueue(queue_path, key=canonicalize_url)
+                queue.seed(site.start_url, args.pages)
+
+                # Cada nó é um processo independente que só conhece o arquivo da fila
+                command = [sys.executable, script, 'worker', '--queue', queue_path,
+                           '--download-dir', download_dir, '--base-url', site.base_url,
+                           '--threads', str(workers)]
+                start = time.perf_counter()
+                processes = [subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                             for _ in range(nodes)]
+                for process in processes:
+                    process.wait()
+                elapsed = time.perf_counter() - start
+
+                counts = queue.counts()
+                queue.close()
+                done = sum(states.get('done', 0) for states in counts.values())
+                failed = sum(states.get('failed', 0) for states in counts.values())
+                images = len([name for name in os.listdir(download_dir) if not name.startswith('.')])
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+            print(f"{nodes:>4} {workers:>10} {elapsed:>7.2f} {images:>7} {site.request_count:>11} {done:>8} {failed:>6}")
+
+
+def run_engine(site, engine, workers, pages, args):
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child',
+        '--engine', engine,
+        '--workers', str(workers),
+        '--pages', str(pages),
+        '--url', site.start_url,
+        '--log-level', args.log_level,
+        '--log-sample', str(args.log_sample),
+    ]
+    if args.log_file:
+        command += ['--log-file', args.log_file]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_branches(results):
+    # Quantas páginas passaram por cada ramo do matcher e cada estratégia de imagem
+    for r in results:
+        branches = ' '.join(f"{name.replace('strategy_', '').replace('_hits', '')}={value}"
+                            for name, value in sorted(r['branches'].items()))
+        print(f"{r['engine']:<8} {r['workers']:>7}  {branches}")
+
+
+def compare_results(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r['engine'], r['workers']): r for r in json.load(f)}
+
+    print(f"\nComparação com {baseline_path} (variação em relação à linha de base):")
+    print(f"{'motor':<8} {'workers':>7} {'pág/s':>8} {'img/s':>8} {'cpu(s)':>8} {'rss(MB)':>8}")
+    for r in results:
+        base = baseline.get((r['engine'], r['workers']))
+        if base is None:
+            print(f"{r['engine']:<8} {r['workers']:>7}  sem linha de base")
+            continue
+
+        def delta(key):
+            if not base[key]:
+                return '-'
+            return f"{(r[key] - base[key]) / base[key] * 100:+.1f}%"
+
+        print(f"{r['engine']:<8} {r['workers']:>7} {delta('pages_per_sec'):>8} {delta('images_per_sec'):>8} "
+              f"{delta('cpu_seconds'):>8} {delta('peak_rss_mb'):>8}")
+
+
+def print_results(results):
+    print(f"{'motor':<8} {'workers':>7} {'páginas':>7} {'imagens':>7} {'seg':>8} "
+          f"{'pág/s':>8} {'img/s':>8} {'cpu(s)':>8} {'rss(MB)':>8}")
+    for r in results:
+        print(f"{r['engine']:<8} {r['workers']:>7} {r['pages']:>7} {r['images']:>7} {r['seconds']:>8.2f} "
+              f"{r['pages_per_sec']:>8.2f} {r['images_per_sec']:>8.1f} {r['cpu_seconds']:>8.2f} "
+              f"{r['peak_rss_mb']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do crawler contra um site local de fixture")
+    parser.add_argument('--engine', action='append', choices=['threads', 'pipeline', 'async'],
+                        help="motores a comparar (padrão: threads, pipeline e async)")
+    parser.add_argument('--workers', type=int, action='append',
+                        help="threads/requisições simultâneas (pode repetir)")
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--images-per-page', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.05, help="latência simulada por requisição (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help="fração dos downloads de imagem cortados no meio pelo servidor")
+    parser.add_argument('--mixed-layouts', action='store_true',
+                        help="páginas de detalhe variadas, cobrindo todos os ramos do matcher e todas as estratégias de imagem")
+    parser.add_argument('--save', help="grava os resultados em JSON para comparações futuras")
+    parser.add_argument('--compare', help="compara com resultados gravados antes com --save")
+    parser.add_argument('--parse-scaling', action='store_true',
+                        help="mede a escala do parsing em processos (sem rede)")
+    parser.add_argument('--parse-pages', type=int, default=400)
+    parser.add_argument('--page-size', type=int,
+                        help="tamanho aproximado das páginas de detalhe em bytes (padrão: 0; 200000 em --parse-scaling)")
+    parser.add_argument('--processes', type=int, action='append', help="processos de parsing (pode repetir)")
+    parser.add_argument('--chunksize', type=int, default=8)
+    parser.add_argument('--parse-modes', action='store_true',
+                        help="compara tempo e memória do parsing completo e do parsing rápido (lxml)")
+    parser.add_argument('--matcher', action='store_true',
+                        help="microbenchmark do matcher de serviço urbano em páginas grandes")
+    parser.add_argument('--matcher-sizes', type=int, action='append', help="tamanhos de texto (pode repetir)")
+    parser.add_argument('--rate-control', action='store_true',
+                        help="compara concorrência fixa e adaptativa contra um servidor com capacidade limitada")
+    parser.add_argument('--capacity', type=int, default=8,
+                        help="requisições simultâneas aceitas pelo servidor antes de responder 429")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--target-latency', type=float, default=1.0)
+    parser.add_argument('--frontier', action='store_true',
+                        help="empurra milhões de URLs de paginação sintéticas pela fronteira")
+    parser.add_argument('--frontier-sizes', type=int, action='append', help="URLs de paginação empurradas (pode repetir)")
+    parser.add_argument('--image-store', action='store_true',
+                        help="mede abertura e consultas do índice do store de imagens com milhões de entradas")
+    parser.add_argument('--store-sizes', type=int, action='append', help="entradas no índice (pode repetir)")
+    parser.add_argument('--manifest', action='store_true',
+                        help="mede a escrita do manifesto e as consultas por linha pelo índice")
+    parser.add_argument('--manifest-sizes', type=int, action='append', help="registros no manifesto (pode repetir)")
+    parser.add_argument('--http-cache', action='store_true',
+                        help="crawl frio, revalidado (304) e offline usando o cache HTTP em disco")
+    parser.add_argument('--discovery', action='store_true',
+                        help="descoberta das páginas de detalhe: listagens x sitemap x intervalo de IDs")
+    parser.add_argument('--image-candidates', action='store_true',
+                        help="compara a busca por seletores com o índice de candidatos em uma passada")
+    parser.add_argument('--candidate-sizes', type=int, action='append',
+                        help="tamanhos das páginas de detalhe em bytes (pode repetir)")
+    parser.add_argument('--sharded', action='store_true',
+                        help="crawl distribuído: vários processos worker dividindo uma fila SQLite")
+    parser.add_argument('--nodes', type=int, action='append', help="processos worker (pode repetir)")
+    parser.add_argument('--log-level', default='info', choices=['debug', 'info', 'warning', 'error'],
+                        help="nível do log do crawl")
+    parser.add_argument('--log-sample', type=int, default=1, help="escreve só uma a cada N linhas por imagem")
+    parser.add_argument('--log-file', help="grava a saída do crawl neste arquivo em vez de descartá-la")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.engine = args.engine[0]
+        args.workers = args.workers[0]
+        run_child(args)
+        return
+
+    if args.parse_modes:
+        run_parse_modes(args)
+        return
+
+    if args.matcher:
+        run_matcher(args)
+        return
+
+    if args.parse_scaling:
+        run_parse_scaling(args)
+        return
+
+    if args.rate_control:
+        run_rate_control(args)
+        return
+
+    if args.frontier:
+        run_frontier(args)
+        return
+
+    if args.image_store:
+        run_image_store(args)
+        return
+
+    if args.manifest:
+        run_manifest(args)
+        return
+
+    if args.http_cache:
+        run_http_cache(args)
+        return
+
+    if args.image_candidates:
+        run_image_candidates(args)
+        return
+
+    if args.discovery:
+        run_discovery(args)
+        return
+
+    if args.sharded:
+        run_sharded(args)
+        return
+
+    engines = args.engine or ['threads', 'pipeline', 'async']
+    worker_counts = args.workers or [16]
+
+    results = []
+    with FixtureSite(pages=args.pages, images_per_page=args.images_per_page,
+                     latency=args.latency, error_rate=args.error_rate,
+                     drop_rate=args.drop_rate, page_size=args.page_size or 0,
+                     mixed_layouts=args.mixed_layouts) as site:
+        expected = site.expected_images()
+        for engine in engines:
+            for workers in worker_counts:
+                results.append(run_engine(site, engine, workers, args.pages, args))
+
+    print_results(results)
+
+    if args.mixed_layouts:
+        print(f"\nImagens esperadas: {expected}")
+        print_branches(results)
+
+    if args.drop_rate:
+        # Quedas no meio do download retomadas com Range a partir do .part
+        print(f"\nDownloads retomados: " + ', '.join(
+            f"{r['engine']}/{r['workers']}={r['resumed']}" for r in results))
+
+    for r in results:
+        if r['images'] != expected and not args.error_rate:
+            print(f"⚠️ {r['engine']} com {r['workers']} workers baixou {r['images']} de {expected} imagens")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados gravados em {args.save}")
+
+    if args.compare:
+        compare_results(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,442 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import lxml.html
+from lxml import etree
 import os
+import sys
+import tempfile
 import time
-from urllib.parse import urljoin, urlparse
+import itertools
+import multiprocessing
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import threading
+from contextlib import contextmanager
 from queue import Queue
+from collections import deque
+
+from service_matcher import match_service
+from rate_control import RateController, RETRY_STATUSES, parse_retry_after
+from metrics import Metrics, MetricsReporter
+from crawl_log import CrawlLog
+from discovery import DETAIL_PATTERN, iter_sitemap_urls, iter_id_urls
+from strategy_order import url_pattern
+from image_candidates import (ImageCandidates, IMAGE_EXTENSIONS, LIGHTBOX_SELECTORS, SCRIPT_IMAGE_PATTERNS,
+                              MAIN_IMAGE_SELECTORS, DOWNLOAD_SELECTORS, META_SELECTORS)
+
+# Modo de parsing rápido: o texto do serviço vem direto da árvore do lxml
+# (mesmos nós de texto que soup.get_text()), e o BeautifulSoup só constrói
+# as subárvores lidas pelas estratégias de imagem em alta resolução.
+SERVICE_TEXT = etree.XPath('//text()[not(ancestor::script or ancestor::style or ancestor::template)]')
+
+DETAIL_TAGS = {'a', 'img', 'meta', 'script'}
+DETAIL_CLASSES = {'image-container', 'main-content', 'photo-view', 'download-link', 'full-size-link'}
+
+
+def _is_detail_tag(name, attrs):
+    if name in DETAIL_TAGS:
+        return True
+    classes = attrs.get('class') or ()
+    if isinstance(classes, str):
+        classes = classes.split()
+    return any(cls in DETAIL_CLASSES for cls in classes)
+
+
+DETAIL_STRAINER = SoupStrainer(_is_detail_tag)
+FULL_PARSE = object()
+
+
+class PageResult:
+    def __init__(self, url, page_num, image_links=None, pagination_urls=None, downloaded=None,
+                 new_links=None):
+        self.url = url
+        self.page_num = page_num
+        self.image_links = image_links or []
+        self.pagination_urls = pagination_urls or []
+        self.downloaded = downloaded or []
+        self.new_links = self.image_links if new_links is None else new_links
+        self.fetched = image_links is not None
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+CONTENT_RANGE = re.compile(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)')
+
+
+class IncompleteDownload(Exception):
+    pass
+
+
+def parse_content_range(value):
+    # "bytes 100-199/2000" -> (100, 2000); "bytes */2000" -> (None, 2000)
+    match = CONTENT_RANGE.fullmatch(value.strip()) if value else None
+    if not match:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start is not None else None,
+            int(total) if total != '*' else None)
+
+
+def canonicalize_url(url):
+    # Variações da mesma página (fragmento, "&" sobrando, ordem dos parâmetros,
+    # maiúsculas no host, porta padrão) viram uma única chave. É só a chave de
+    # deduplicação: a requisição vai para a URL como veio, já que há servidores
+    # sensíveis à ordem dos parâmetros ou a um "?flag" sem valor
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        # Porta ou host malformado (":8o8", "[::1"): a URL segue como veio
+        return url
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if port is not None and port == DEFAULT_PORTS.get(scheme):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query = urlencode(sorted(query, key=lambda item: item[0]))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+class Frontier:
+    def __init__(self, start_url, journal=None):
+        self.journal = journal
+        self.visited = set()
+        self.queue = deque()
+        self.queued = set()
+        self.resumed = {}
+        self.page_count = 0
+
+        if journal is not None and journal.has_state():
+            visited, queue, self.resumed, self.page_count = journal.load_frontier()
+            # O journal guarda as URLs como foram buscadas; os conjuntos usam a chave
+            self.visited = {canonicalize_url(url) for url in visited}
+            self.queue.extend(queue)
+            self.queued.update(canonicalize_url(url) for url in queue)
+        else:
+            self.add([start_url])
+
+    def pop(self):
+        url = self.queue.popleft()
+        self.queued.discard(canonicalize_url(url))
+        return url
+
+    def next_page(self, max_pages=None):
+        while self.queue:
+            # Páginas interrompidas na execução anterior mantêm sua numeração
+            if self.queue[0] in self.resumed:
+                url = self.pop()
+                return url, self.resumed.pop(url)
+
+            if max_pages is not None and self.page_count >= max_pages:
+                return None
+
+            url = self.pop()
+            key = canonicalize_url(url)
+            if key in self.visited:
+                continue
+
+            self.visited.add(key)
+            self.page_count += 1
+            if self.journal is not None:
+                self.journal.start_listing(url, self.page_count)
+            return url, self.page_count
+
+        return None
+
+    def wants_more(self, max_pages=None):
+        return max_pages is None or self.page_count < max_pages
+
+    def add(self, urls):
+        new_urls = []
+        for url in urls:
+            key = canonicalize_url(url)
+            if key not in self.visited and key not in self.queued:
+                self.queue.append(url)
+                self.queued.add(key)
+                new_urls.append(url)
+
+        if self.journal is not None and new_urls:
+            self.journal.add_frontier(new_urls)
+        return new_urls
+
+    def finish(self, url):
+        if self.journal is not None:
+            self.journal.finish_listing(url)
+
+    def stop(self):
+        self.queue.clear()
+        self.queued.clear()
+        self.resumed.clear()
+        if self.journal is not None:
+            self.journal.clear_frontier()
+
+
+def create_session(max_workers=8, rate_controlled=False):
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    })
+
+    max_retries = 2
+    if rate_controlled:
+        # 429/503 e Retry-After ficam com o controle de taxa, que precisa vê-los
+        max_retries = requests.adapters.Retry(total=2, read=False, respect_retry_after_header=False)
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=max(20, max_workers),
+        max_retries=max_retries
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def create_rate_controller(max_workers, adaptive=False, target_latency=1.0, requests_per_second=None):
+    return RateController(
+        initial=min(4, max_workers) if adaptive else max_workers,
+        maximum=max_workers,
+        target_latency=target_latency,
+        rate=requests_per_second,
+        adaptive=adaptive,
+    )
+
+
+def store_paths(download_dir):
+    # Arquivos de estado ao lado do diretório de imagens
+    return {
+        'journal_path': f"{download_dir}_journal.db",
+        'cache_path': f"{download_dir}_cache.db",
+        'index_path': f"{download_dir}_index.db",
+        'strategy_path': f"{download_dir}_strategies.db",
+        'manifest_path': f"{download_dir}_manifest.jsonl",
+    }
+
 
 class BusCrawler:
-    def __init__(self, base_url, download_dir="images", max_workers=8):
+    def __init__(self, base_url, download_dir="images", max_workers=8,
+                 parse_processes=0, parse_chunksize=8, fast_parse=False,
+                 journal_path=None, resume=False,
+                 index_path=None, incremental=False, stop_after_known_pages=3,
+                 adaptive=False, target_latency=1.0, requests_per_second=None,
+                 content_store=False, perceptual_dedupe=False,
+                 download_attempts=3, buffer_size=65536, verify_images=False,
+                 cache_path=None, cache_max_bytes=512 * 1024 * 1024, cache_max_age=0, offline=False,
+                 stats_interval=None, metrics_port=None, profile_stages=(), profile_dir='.',
+                 strategy_path=None, postprocess=False, postprocess_dir=None, postprocess_processes=1,
+                 thumbnail_size=256, webp_quality=80, manifest_path=None,
+                 log_level='info', log_sample=1, log_json=False, progress=False, log_name=None,
+                 session=None, rate_controller=None, budget=None):
+        if offline and not cache_path:
+            raise RuntimeError("O modo offline requer o cache HTTP (cache_path)")
+
         self.base_url = base_url
         self.download_dir = download_dir
         self.max_workers = max_workers
+        self.parse_processes = parse_processes
+        self.parse_chunksize = max(parse_chunksize, 1)
+        self.parse_pool = None
+        self.fast_parse = fast_parse
+        self.journal_path = journal_path
+        self.resume = resume
+        self.journal = None
+        self.index_path = index_path
+        self.incremental = incremental
+        self.stop_after_known_pages = stop_after_known_pages
+        self.index = None
+        self.index_offset = 0
+        self.known_page_streak = 0
+        self.content_store = content_store or perceptual_dedupe
+        self.perceptual_dedupe = perceptual_dedupe
+        self.store = None
+        self.download_attempts = max(download_attempts, 1)
+        self.buffer_size = buffer_size
+        self.verify_images = verify_images
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_max_age = cache_max_age
+        self.offline = offline
+        self.http_cache = None
+        self.stats_interval = stats_interval
+        self.metrics_port = metrics_port
+        self.profile_stages = tuple(profile_stages)
+        self.profile_dir = profile_dir
+        self.metrics_reporter = None
+        self.strategy_path = strategy_path
+        self.postprocess = postprocess
+        self.postprocess_dir = postprocess_dir or f"{download_dir}_processed"
+        self.postprocess_processes = postprocess_processes
+        self.thumbnail_size = thumbnail_size
+        self.webp_quality = webp_quality
+        self.postprocessor = None
+        self.manifest_path = manifest_path
+        self.manifest = None
+        self.log_level = log_level
+        self.log_sample = log_sample
+        self.progress = progress
+        self.log = CrawlLog(log_level, log_sample, log_json, name=log_name)
+        self.strategy_stats = None
+        self.image_probes = self.build_image_probes()
+        self.probe_map = {name: (strategy, probe) for strategy, name, probe in self.image_probes}
+        # Sessão, controle de taxa e orçamento podem vir de fora, compartilhados
+        # entre vários crawlers no mesmo processo (batch_crawl.py)
+        self.rate_controller = rate_controller
+        if rate_controller is None and (adaptive or requests_per_second):
+            self.rate_controller = create_rate_controller(max_workers, adaptive, target_latency, requests_per_second)
+        self.budget = budget
         self.lock = threading.Lock()
 
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.session = session or create_session(max_workers, self.rate_controller is not None)
 
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=20,
-            pool_maxsize=20,
-            max_retries=2
-        )
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        self.reset_stats()
 
         if not os.path.exists(download_dir):
             os.makedirs(download_dir)
+
+    def reset_stats(self):
+        self.stats = {
+            'listing_fetches': 0,
+            'sitemap_fetches': 0,
+            'duplicate_listing_fetches': 0,
+            'fast_parse_fallbacks': 0,
+            'known_links_skipped': 0,
+            'duplicate_images': 0,
+            'resumed_downloads': 0,
+            'invalid_images': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'cache_not_modified': 0,
+            'postprocessed': 0,
+            'postprocess_invalid': 0,
+            'postprocess_too_small': 0,
+        }
+        self.fetched_listing_urls = set()
+        self.metrics = Metrics(self.profile_stages)
     
+    @contextmanager
+    def request(self, url, timeout, stream=False, headers=None):
+        if self.budget is None:
+            with self.send_request(url, timeout, stream, headers) as response:
+                yield response
+            return
+
+        # Orçamento global: o slot fica ocupado até o corpo da resposta ser lido
+        with self.budget:
+            with self.send_request(url, timeout, stream, headers) as response:
+                yield response
+
+    @contextmanager
+    def send_request(self, url, timeout, stream=False, headers=None):
+        if self.rate_controller is None:
+            response = self.session.get(url, timeout=timeout, stream=stream, headers=headers)
+            try:
+                yield response
+            finally:
+                response.close()
+            return
+
+        controller = self.rate_controller
+        for attempt in range(controller.max_attempts):
+            limiter = controller.acquire(url)
+            start = time.monotonic()
+            try:
+                response = self.session.get(url, timeout=timeout, stream=stream, headers=headers)
+            except (requests.Timeout, requests.ConnectionError):
+                limiter.observe(time.monotonic() - start, error=True)
+                limiter.release()
+                if attempt == controller.max_attempts - 1:
+                    raise
+                self.metrics.count('http_retries')
+                time.sleep(controller.backoff(attempt))
+                continue
+            except BaseException:
+                # Redirecionamentos em loop, URL inválida, corpo truncado...:
+                # o slot do host é devolvido antes de propagar o erro
+                limiter.observe(time.monotonic() - start, error=True)
+                limiter.release()
+                raise
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            limiter.observe(time.monotonic() - start, response.status_code, retry_after)
+            if response.status_code in RETRY_STATUSES and attempt < controller.max_attempts - 1:
+                response.close()
+                limiter.release()
+                self.metrics.count('http_retries')
+                time.sleep(controller.backoff(attempt, retry_after))
+                continue
+
+            # O slot do host fica ocupado até o corpo da resposta ser lido
+            try:
+                yield response
+            finally:
+                response.close()
+                limiter.release()
+            return
+
     def get_page(self, url, timeout=5):
+        with self.metrics.stage('page_fetch'):
+            if self.http_cache is not None:
+                response = self.get_cached_page(url, timeout)
+            else:
+                response = self.fetch_page(url, timeout)
+
+        if response is None:
+            self.metrics.count('page_errors')
+        else:
+            self.metrics.add_bytes('page_fetch', len(response.content))
+        return response
+
+    def fetch_page(self, url, timeout=5):
         try:
-            response = self.session.get(url, timeout=timeout)
-            response.raise_for_status()
+            with self.request(url, timeout) as response:
+                response.raise_for_status()
             return response
         except requests.RequestException as e:
-            with self.lock:
-                print(f"Erro ao acessar {url}: {e}")
+            self.log.error(f"Erro ao acessar {url}: {e}")
+            return None
+
+    def cached_entry(self, url):
+        # Retorna (entrada do cache, servir sem requisição?)
+        entry = self.http_cache.get(url)
+        if entry is not None and (self.offline or entry.is_fresh(self.cache_max_age)):
+            self.count_cache('cache_hits')
+            return entry, True
+        if entry is None and self.offline:
+            self.count_cache('cache_misses')
+            self.log.warning(f"📴 Fora do cache (modo offline): {url}")
+        return entry, False
+
+    def count_cache(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def get_cached_page(self, url, timeout=5):
+        entry, served = self.cached_entry(url)
+        if served:
+            return entry.to_response()
+        if self.offline:
             return None
+
+        try:
+            with self.request(url, timeout, headers=entry.validators() if entry else None) as response:
+                if response.status_code == 304:
+                    if entry is None:
+                        # 304 sem validadores enviados (entrada expirada no
+                        # meio ou proxy no caminho): não há corpo para servir
+                        self.log.error(f"Erro ao acessar {url}: 304 sem página em cache")
+                        return None
+                    self.count_cache('cache_not_modified')
+                    self.http_cache.touch(url)
+                    return entry.to_response()
+                response.raise_for_status()
+        except requests.RequestException as e:
+            self.log.error(f"Erro ao acessar {url}: {e}")
+            return None
+
+        self.count_cache('cache_misses')
+        self.http_cache.put(url, response.content, response.headers.get('ETag'),
+                            response.headers.get('Last-Modified'), response.headers.get('Content-Type'),
+                            response.encoding)
+        return response
     
     def extract_image_links(self, soup, page_url):
         image_links = []
@@ -51,7 +448,10 @@ class BusCrawler:
                 continue
             img_tag = link.find('img')
             if img_tag:
-                full_url = urljoin(page_url, href)
+                try:
+                    full_url = urljoin(page_url, href)
+                except ValueError:
+                    continue
                 if self.is_valid_image_link(full_url, img_tag):
                     image_links.append(full_url)
         
@@ -83,266 +483,368 @@ class BusCrawler:
         bus_info = self.extract_bus_service_info(soup)
         return bus_info is not None
 
-    def extract_bus_service_info(self, soup):
-        page_text = soup.get_text().replace('\n', ' ').replace('\r', ' ')
+    def extract_bus_service_info(self, soup, page_text=None):
+        if page_text is None:
+            page_text = soup.get_text()
+        page_text = page_text.replace('\n', ' ').replace('\r', ' ')
 
+        with self.metrics.stage('service_match'):
+            result = match_service(page_text)
+        if result:
+            origin, bus_info = result
+            self.metrics.count(f'service_{origin}')
+            if origin == 'fallback':
+                if bus_info['line_number'] == 'INTER':
+                    self.log.image(f"🔄 Fallback encontrou INTER: {bus_info['bus_name']}")
+                else:
+                    self.log.image(f"🔄 Fallback encontrou: {bus_info['line_number']} - {bus_info['bus_name']}")
+            return bus_info
 
-        service_patterns = [
-            r'Serviço\s+Urbano:?\s*(INTER\s+\d+)',
-            r'SERVIÇO\s+URBANO:?\s*(INTER\s+\d+)',
-            r'Urbano:?\s*(INTER\s+\d+)',
-            r'URBANO:?\s*(INTER\s+\d+)',
-            r'(INTER\s+\d+).*Urbano',
-            r'Urbano.*(INTER\s+\d+)',
+        self.metrics.count('service_missing')
+        self.log.image(f"Serviço urbano não encontrado")
+        return None
 
-            r'Serviço\s+Urbano:\s*([A-Z]?\d+[A-Z]?)\s*-\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]+)',
-            r'SERVIÇO\s+URBANO:\s*([A-Z]?\d+[A-Z]?)\s*-\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]+)',
-            r'Urbano:\s*([A-Z]?\d+[A-Z]?)\s*-\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]+)',
-            r'URBANO:\s*([A-Z]?\d+[A-Z]?)\s*-\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]+)',
+    def get_high_res_image_url(self, image_page_url):
+        if self.journal is not None:
+            known, image_data = self.journal.detail_result(image_page_url)
+            if known:
+                return image_data
 
-            r'Serviço\s+Urbano\s+([A-Z]?\d+[A-Z]?)\s*-\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]+)',
-            r'SERVIÇO\s+URBANO\s+([A-Z]?\d+[A-Z]?)\s*-\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]+)',
+        self.log.image(f"🔍 Acessando página da imagem: {image_page_url}")
 
-            r'Tipo.*Urbano.*?([A-Z]?\d+[A-Z]?)\s*-\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]+)',
-            r'Linha\s*([A-Z]?\d+[A-Z]?)\s*-\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]+).*Urbano',
-        ]
+        response = self.get_page(image_page_url)
+        if not response:
+            return None
 
-        for i, pattern in enumerate(service_patterns):
-
-            match = re.search(pattern, page_text, re.IGNORECASE)
-            if match:
-
-                if 'INTER' in pattern and len(match.groups()) == 1:
-                    full_name = match.group(1)
-                    return {
-                        'line_number': 'INTER',
-                        'bus_name': full_name.lower()
-                    }
-
-                elif len(match.groups()) >= 2:
-                    line_number = match.group(1)
-                    bus_name = match.group(2).strip()
-                    return {
-                        'line_number': line_number,
-                        'bus_name': bus_name
-                    }
-
-        service_elements = soup.find_all(['td', 'div', 'span', 'p'],
-                                        string=re.compile(r'Serviço.*Urbano|SERVIÇO.*URBANO', re.IGNORECASE))
-
-        for element in service_elements:
-            text = element.get_text()
-            for pattern in service_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    line_number = match.group(1)
-                    bus_name = match.group(2).strip()
-                    return {
-                        'line_number': line_number,
-                        'bus_name': bus_name
-                    }
-
-        if re.search(r'urbano', page_text, re.IGNORECASE):
-                fallback_patterns = [
-                    r'(INTER\s+\d+)',
-                    r'([A-Z]?\d+[A-Z]?)\s*-\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]{3,})',
-                    r'Linha\s*([A-Z]?\d+[A-Z]?)\s*([A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]{3,})'
-                ]
-
-                for fallback in fallback_patterns:
-                    match = re.search(fallback, page_text, re.IGNORECASE)
-                    if match:
-                        if 'INTER' in fallback and len(match.groups()) == 1:
-                            inter_name = match.group(1)
-                            print(f"🔄 Fallback encontrou INTER: {inter_name}")
-                            return {
-                                'line_number': 'INTER',
-                                'bus_name': inter_name.lower()
-                            }
-                        elif len(match.groups()) >= 2:
-                            line_num = match.group(1)
-                            bus_name = match.group(2).strip()
-                            if len(bus_name) > 3:
-                                print(f"🔄 Fallback encontrou: {line_num} - {bus_name}")
-                                return {
-                                    'line_number': line_num,
-                                    'bus_name': bus_name
-                                }
+        image_data = self.resolve_image_page(response.text, image_page_url)
+        self.remember_detail(image_page_url, image_data)
+        return image_data
 
-                return {
-                'line_number': 'unknown',
-                'bus_name': 'urbano'
-            }
+    def remember_detail(self, image_page_url, image_data):
+        if self.journal is not None:
+            self.journal.record_detail(image_page_url, image_data)
+        # Uma página com imagem só entra no índice quando a imagem estiver
+        # no disco (index_download): um download que falhou é refeito na
+        # próxima execução incremental
+        if self.index is not None and image_data is None:
+            self.index.record(image_page_url, image_data)
 
-        with self.lock:
-            print(f"Serviço urbano não encontrado")
-        return None
+    def reserve_filename(self, image_data, filename):
+        # Um download interrompido mantém o nome na próxima execução, mesmo
+        # numa execução incremental que numera a partir de outro bloco
+        if self.index is None or not image_data.get('page_url'):
+            return filename
+        return self.index.reserve_filename(image_data['page_url'], filename)
 
-    def get_high_res_image_url(self, image_page_url):
-        print(f"🔍 Acessando página da imagem: {image_page_url}")
+    def index_download(self, image_data):
+        # Detalhes guardados por versões anteriores do journal não têm page_url
+        if self.index is not None and image_data.get('page_url'):
+            self.index.record(image_data['page_url'], image_data)
 
-        response = self.get_page(image_page_url)
-        if not response:
-            return None
+    def resolve_image_page(self, html, image_page_url):
+        with self.metrics.stage('detail_parse'):
+            return self.parse_image_page(html, image_page_url)
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+    def parse_image_page(self, html, image_page_url):
+        if self.fast_parse:
+            result = self.resolve_image_page_fast(html, image_page_url)
+            if result is not FULL_PARSE:
+                return result
+
+        soup = BeautifulSoup(html, 'html.parser')
 
         bus_info = self.extract_bus_service_info(soup)
         if not bus_info:
-            print(f"Não é serviço urbano - pulando: {image_page_url}")
+            self.log.image(f"Não é serviço urbano - pulando: {image_page_url}")
             return None
-        
-        strategies = [
-            lambda s: self.enhance_onibus_brasil_detection(s, image_page_url),
-            lambda s: self.find_main_image(s, image_page_url),
-            lambda s: self.find_download_link(s, image_page_url),
-            lambda s: self.find_meta_image(s, image_page_url)
-        ]
-        
-        for strategy in strategies:
-            image_url = strategy(soup)
+
+        return self.find_high_res_image(soup, image_page_url, bus_info)
+
+    def resolve_image_page_fast(self, html, image_page_url):
+        try:
+            document = lxml.html.document_fromstring(html)
+        except (etree.ParserError, ValueError):
+            self.count_fast_parse_fallback()
+            return FULL_PARSE
+
+        page_text = ''.join(SERVICE_TEXT(document))
+        bus_info = self.extract_bus_service_info(None, page_text)
+        if not bus_info:
+            self.log.image(f"Não é serviço urbano - pulando: {image_page_url}")
+            return None
+
+        soup = BeautifulSoup(html, 'lxml', parse_only=DETAIL_STRAINER)
+        result = self.find_high_res_image(soup, image_page_url, bus_info)
+        if result:
+            return result
+
+        # Nenhuma estratégia achou a imagem na árvore parcial: refaz com a árvore completa
+        self.count_fast_parse_fallback()
+        soup = BeautifulSoup(html, 'html.parser')
+        return self.find_high_res_image(soup, image_page_url, bus_info)
+
+    def count_fast_parse_fallback(self):
+        with self.lock:
+            self.stats['fast_parse_fallbacks'] += 1
+
+    def find_high_res_image(self, soup, image_page_url, bus_info):
+        # Uma passada pela árvore; cada sonda vira uma consulta a dicionário
+        candidates = ImageCandidates(soup)
+        pattern = url_pattern(image_page_url) if self.strategy_stats is not None else None
+        preferred = self.strategy_stats.preferred(pattern) if pattern else None
+        attempted = set()
+
+        # Caminho comum: só a sonda que costuma vencer neste padrão de URL
+        if preferred in self.probe_map:
+            strategy, probe = self.probe_map[preferred]
+            attempted.add(strategy)
+            self.metrics.count(f'strategy_{strategy}_attempts')
+            image_url = probe(candidates, image_page_url)
             if image_url:
+                self.metrics.count(f'strategy_{strategy}_hits')
+                self.metrics.count('strategy_learned_hits')
                 return {
                     'url': image_url,
-                    'bus_info': bus_info
+                    'bus_info': bus_info,
+                    'page_url': image_page_url
                 }
+            self.metrics.count('strategy_learned_misses')
 
+        # Ordem original; o resultado alimenta as estatísticas do padrão
+        for strategy, name, probe in self.image_probes:
+            if strategy not in attempted:
+                attempted.add(strategy)
+                self.metrics.count(f'strategy_{strategy}_attempts')
+            if name == preferred:
+                continue
+            image_url = probe(candidates, image_page_url)
+            if image_url:
+                self.metrics.count(f'strategy_{strategy}_hits')
+                if pattern:
+                    self.strategy_stats.record(pattern, name)
+                return {
+                    'url': image_url,
+                    'bus_info': bus_info,
+                    'page_url': image_page_url
+                }
+
+        self.metrics.count('strategy_misses')
+        if pattern:
+            self.strategy_stats.record(pattern, None)
         return None
-    
+
+    def build_image_probes(self):
+        # Cada estratégia é dividida nas suas consultas independentes ("sondas"),
+        # na mesma ordem em que as funções abaixo as executam
+        probes = []
+        for selector in LIGHTBOX_SELECTORS:
+            probes.append(('onibus_brasil', f'lightbox:{selector}',
+                           lambda candidates, url, selector=selector: self.find_lightbox_image(candidates, url, selector)))
+        probes.append(('onibus_brasil', 'script', self.find_script_image))
+        for selector in MAIN_IMAGE_SELECTORS:
+            probes.append(('main_image', f'main:{selector}',
+                           lambda candidates, url, selector=selector: self.find_selector_image(candidates, url, selector)))
+        probes.append(('main_image', 'largest', self.find_largest_image))
+        for selector in DOWNLOAD_SELECTORS:
+            probes.append(('download_link', f'download:{selector}',
+                           lambda candidates, url, selector=selector: self.find_download_href(candidates, url, selector)))
+        for selector in META_SELECTORS:
+            probes.append(('meta_image', f'meta:{selector}',
+                           lambda candidates, url, selector=selector: self.find_meta_content(candidates, url, selector)))
+        return probes
+
     def find_main_image(self, soup, page_url):
-        main_image_selectors = [
-            'img.main-image',
-            'img.large-image', 
-            'img.full-size',
-            '.image-container img',
-            '.main-content img',
-            '.photo-view img',
-            'img[src*="large"]',
-            'img[src*="full"]',
-            'img[src*="original"]'
-        ]
-        
-        for selector in main_image_selectors:
-            img = soup.select_one(selector)
-            if img:
-                src = img.get('src') or img.get('data-src')
-                if src:
-                    return urljoin(page_url, src)
-        
-        all_imgs = soup.find_all('img')
-        largest_img = None
-        max_size = 0
-        
-        for img in all_imgs:
+        candidates = ImageCandidates(soup)
+        for selector in MAIN_IMAGE_SELECTORS:
+            image_url = self.find_selector_image(candidates, page_url, selector)
+            if image_url:
+                return image_url
+        return self.find_largest_image(candidates, page_url)
+
+    def find_selector_image(self, candidates, page_url, selector):
+        img = candidates.get(selector)
+        if img:
             src = img.get('src') or img.get('data-src')
-            if not src:
-                continue
-                
-            width = img.get('width')
-            height = img.get('height')
-            
-            if width and height:
-                try:
-                    size = int(width) * int(height)
-                    if size > max_size:
-                        max_size = size
-                        largest_img = src
-                except ValueError:
-                    pass
-        
-        if largest_img:
-            return urljoin(page_url, largest_img)
-        
+            if src:
+                return urljoin(page_url, src)
+        return None
+
+    def find_largest_image(self, candidates, page_url):
+        if candidates.largest:
+            return urljoin(page_url, candidates.largest)
         return None
     
     def find_download_link(self, soup, page_url):
-        download_selectors = [
-            'a[href*="download"]',
-            'a[href*="original"]',
-            'a[href*="full"]',
-            'a[href*="large"]',
-            '.download-link',
-            '.full-size-link'
-        ]
-        
-        for selector in download_selectors:
-            link = soup.select_one(selector)
-            if link:
-                href = link.get('href')
-                if href and any(ext in href.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                    return urljoin(page_url, href)
-        
+        candidates = ImageCandidates(soup)
+        for selector in DOWNLOAD_SELECTORS:
+            image_url = self.find_download_href(candidates, page_url, selector)
+            if image_url:
+                return image_url
+        return None
+
+    def find_download_href(self, candidates, page_url, selector):
+        link = candidates.get(selector)
+        if link:
+            href = link.get('href')
+            if href and any(ext in href.lower() for ext in IMAGE_EXTENSIONS):
+                return urljoin(page_url, href)
         return None
     
     def find_meta_image(self, soup, page_url):
-        meta_selectors = [
-            'meta[property="og:image"]',
-            'meta[name="twitter:image"]',
-            'meta[property="og:image:url"]'
-        ]
-        
-        for selector in meta_selectors:
-            meta = soup.select_one(selector)
-            if meta:
-                content = meta.get('content')
-                if content:
-                    return urljoin(page_url, content)
-        
+        candidates = ImageCandidates(soup)
+        for selector in META_SELECTORS:
+            image_url = self.find_meta_content(candidates, page_url, selector)
+            if image_url:
+                return image_url
+        return None
+
+    def find_meta_content(self, candidates, page_url, selector):
+        meta = candidates.get(selector)
+        if meta:
+            content = meta.get('content')
+            if content:
+                return urljoin(page_url, content)
         return None
     
     def enhance_onibus_brasil_detection(self, soup, page_url):
-        lightbox_selectors = [
-            'img[data-lightbox]',
-            'img[data-fancybox]',
-            'a[data-lightbox] img',
-            'a[data-fancybox] img'
-        ]
-        
-        for selector in lightbox_selectors:
-            img = soup.select_one(selector)
-            if img:
-                parent = img.find_parent('a')
-                if parent and parent.get('href'):
-                    href = parent.get('href')
-                    if any(ext in href.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                        return urljoin(page_url, href)
-        
-        scripts = soup.find_all('script')
-        for script in scripts:
+        candidates = ImageCandidates(soup)
+        for selector in LIGHTBOX_SELECTORS:
+            image_url = self.find_lightbox_image(candidates, page_url, selector)
+            if image_url:
+                return image_url
+        return self.find_script_image(candidates, page_url)
+
+    def find_lightbox_image(self, candidates, page_url, selector):
+        img = candidates.get(selector)
+        if img:
+            parent = img.find_parent('a')
+            if parent and parent.get('href'):
+                href = parent.get('href')
+                if any(ext in href.lower() for ext in IMAGE_EXTENSIONS):
+                    return urljoin(page_url, href)
+        return None
+
+    def find_script_image(self, candidates, page_url):
+        for script in candidates.scripts:
             if script.string:
-                import re
-                img_patterns = [
-                    r'["\']([^"\']*\.(?:jpg|jpeg|png|webp)[^"\']*)["\']',
-                    r'image["\']?\s*:\s*["\']([^"\']*)["\']',
-                    r'src["\']?\s*:\s*["\']([^"\']*)["\']'
-                ]
-                
-                for pattern in img_patterns:
-                    matches = re.findall(pattern, script.string, re.IGNORECASE)
+                for pattern in SCRIPT_IMAGE_PATTERNS:
+                    matches = pattern.findall(script.string)
                     for match in matches:
                         if 'large' in match.lower() or 'full' in match.lower() or 'original' in match.lower():
                             return urljoin(page_url, match)
         
         return None
-    
-    def download_image(self, image_url, filename):
-        try:
-            response = self.session.get(image_url, timeout=15, stream=True)
+
+    def part_path(self, filepath):
+        return filepath + '.part'
+
+    def download_image(self, image_url, filename, filepath=None):
+        filepath = filepath or os.path.join(self.download_dir, filename)
+        part_path = self.part_path(filepath)
+
+        with self.metrics.stage('download'):
+            for attempt in range(self.download_attempts):
+                try:
+                    self.fetch_to_part(image_url, part_path)
+                    break
+                except (requests.RequestException, IncompleteDownload) as e:
+                    error = e
+                    if attempt < self.download_attempts - 1:
+                        self.metrics.count('download_retries')
+                        self.log.warning(f"⚠️ Download interrompido ({e}), retomando: {filename}")
+                        time.sleep(0.5 * 2 ** attempt)
+            else:
+                # O .part fica no disco e é retomado na próxima execução
+                self.metrics.count('download_errors')
+                self.log.error(f"Erro ao baixar {image_url}: {error}")
+                return False
+
+        return self.finish_download(part_path, filepath, filename)
+
+    def fetch_to_part(self, image_url, part_path):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+
+        with self.request(image_url, 15, stream=True, headers=headers) as response:
+            if response.status_code == 416:
+                self.handle_range_not_satisfiable(response.headers, part_path, offset)
+                return
             response.raise_for_status()
+            offset, expected = self.resume_plan(response.status_code, response.headers, offset)
 
-            filepath = os.path.join(self.download_dir, filename)
+            with open(part_path, 'ab' if offset else 'wb', buffering=self.buffer_size) as f:
+                # Leituras pequenas da rede: numa queda, só o último bloco se perde
+                self.write_chunks(f, response.iter_content(chunk_size=16384))
 
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=16384):  # Chunks maiores
-                    f.write(chunk)
+        self.check_complete(part_path, expected)
 
+    def write_chunks(self, f, chunks):
+        written = 0
+        write_time = 0.0
+        try:
+            for chunk in chunks:
+                start = time.perf_counter()
+                f.write(chunk)
+                write_time += time.perf_counter() - start
+                written += len(chunk)
+        finally:
+            self.metrics.observe('disk_write', write_time)
+            self.metrics.add_bytes('download', written)
+
+    def resume_plan(self, status, headers, offset):
+        # Retorna (posição onde a escrita continua, tamanho total esperado)
+        if status == 206:
+            start, total = parse_content_range(headers.get('Content-Range'))
+            if start != offset:
+                raise IncompleteDownload(f"faixa inesperada: {headers.get('Content-Range')}")
             with self.lock:
-                print(f"✓ Baixada: {filename}")
-            return True
+                self.stats['resumed_downloads'] += 1
+            return offset, total
 
-        except requests.RequestException as e:
+        length = headers.get('Content-Length')
+        if headers.get('Content-Encoding', 'identity') != 'identity' or not (length and length.isdigit()):
+            return 0, None
+        return 0, int(length)
+
+    def handle_range_not_satisfiable(self, headers, part_path, offset):
+        # 416 com "bytes */total" igual ao .part: ele já estava completo
+        _, total = parse_content_range(headers.get('Content-Range'))
+        if total is not None and total == offset:
+            return
+        os.remove(part_path)
+        raise IncompleteDownload("arquivo parcial inválido, recomeçando")
+
+    def check_complete(self, part_path, expected):
+        size = os.path.getsize(part_path)
+        if expected is not None and size != expected:
+            raise IncompleteDownload(f"{size} de {expected} bytes recebidos")
+
+    def finish_download(self, part_path, filepath, filename):
+        if self.verify_images and not self.is_valid_image(part_path):
+            os.remove(part_path)
             with self.lock:
-                print(f"Erro ao baixar {image_url}: {e}")
+                self.stats['invalid_images'] += 1
+            self.log.warning(f"❌ Imagem corrompida descartada: {filename}")
+            return False
+
+        # A renomeação é atômica: o arquivo final só aparece completo
+        os.replace(part_path, filepath)
+        self.metrics.count('images_downloaded')
+        self.log.image(f"✓ Baixada: {filename}")
+        return True
+
+    def is_valid_image(self, path):
+        from PIL import Image
+
+        try:
+            with Image.open(path) as image:
+                image.verify()
+            with Image.open(path) as image:
+                image.load()
+            return True
+        except Exception:
             return False
     
     def generate_filename(self, image_url, index, bus_info=None):
@@ -376,51 +878,39 @@ class BusCrawler:
             if not image_data:
                 return None
 
-            high_res_url = image_data['url']
-            bus_info = image_data['bus_info']
-            filename = self.generate_filename(high_res_url, index, bus_info)
-            filepath = os.path.join(self.download_dir, filename)
-
-            if os.path.exists(filepath):
-                with self.lock:
-                    print(f"⏭ Já existe: {filename}")
-                return None
-
-            with self.lock:
-                print(f"Baixando: {filename}")
-                print(f"Linha: {bus_info.get('line_number', 'N/A')} - {bus_info.get('bus_name', 'N/A')}")
-
-            if self.download_image(high_res_url, filename):
-                return filename
-            return None
+            return self.download_validated_image(image_data, index)
 
         except Exception as e:
-            with self.lock:
-                print(f"Erro no processamento: {e}")
+            self.log.error(f"Erro no processamento: {e}")
             return None
 
     def process_images_parallel(self, image_links, page_num):
         valid_images = []
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_data = {}
-            for i, image_link in enumerate(image_links):
-                future = executor.submit(self.get_high_res_image_url, image_link)
-                future_to_data[future] = (i, image_link)
-
-            temp_results = [None] * len(image_links)
-            for future in as_completed(future_to_data):
-                original_index, image_link = future_to_data[future]
-                result = future.result()
-                if result:
-                    temp_results[original_index] = (image_link, result)
+        if self.parse_processes:
+            resolved = self.resolve_images_in_processes(image_links)
+            valid_images = [(image_link, result)
+                            for image_link, result in zip(image_links, resolved) if result]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                future_to_data = {}
+                for i, image_link in enumerate(image_links):
+                    future = executor.submit(self.get_high_res_image_url, image_link)
+                    future_to_data[future] = (i, image_link)
 
-            for item in temp_results:
-                if item is not None:
-                    valid_images.append(item)
+                temp_results = [None] * len(image_links)
+                for future in as_completed(future_to_data):
+                    original_index, image_link = future_to_data[future]
+                    result = future.result()
+                    if result:
+                        temp_results[original_index] = (image_link, result)
+
+                for item in temp_results:
+                    if item is not None:
+                        valid_images.append(item)
 
         downloaded = []
-        base_index = (page_num - 1) * 100
+        base_index = self.page_base_index(page_num)
 
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             future_to_info = {}
@@ -441,31 +931,173 @@ class BusCrawler:
 
         return downloaded
 
+    def fetch_detail_page(self, image_page_url):
+        self.log.image(f"🔍 Acessando página da imagem: {image_page_url}")
+
+        response = self.get_page(image_page_url)
+        if not response:
+            return None
+
+        return response.content, response.encoding
+
+    def get_parse_pool(self):
+        if self.parse_pool is None:
+            self.parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_processes,
+                mp_context=process_context(),
+                initializer=_init_parse_worker,
+                initargs=(self.base_url, self.download_dir, self.fast_parse, self.log_level, self.log_sample),
+            )
+        return self.parse_pool
+
+    def shutdown_parse_pool(self):
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+            self.parse_pool = None
+
+    def resolve_images_in_processes(self, image_links):
+        # Threads só fazem I/O; parsing e regex rodam nos processos, em lotes
+        pool = self.get_parse_pool()
+        results = [None] * len(image_links)
+        batch_futures = []
+        batch = []
+
+        pending_links = []
+        for i, image_link in enumerate(image_links):
+            known, image_data = False, None
+            if self.journal is not None:
+                known, image_data = self.journal.detail_result(image_link)
+            if known:
+                results[i] = image_data
+            else:
+                pending_links.append((i, image_link))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_to_index = {
+                executor.submit(self.fetch_detail_page, image_link): i
+                for i, image_link in pending_links
+            }
+
+            for future in as_completed(future_to_index):
+                page = future.result()
+                if page is None:
+                    continue
+
+                i = future_to_index[future]
+                content, encoding = page
+                batch.append((i, image_links[i], content, encoding))
+                if len(batch) >= self.parse_chunksize:
+                    batch_futures.append(pool.submit(_resolve_detail_batch, batch))
+                    batch = []
+
+        if batch:
+            batch_futures.append(pool.submit(_resolve_detail_batch, batch))
+
+        for future in batch_futures:
+            for i, result, ok in future.result():
+                results[i] = result
+                if ok:
+                    self.remember_detail(image_links[i], result)
+
+        return results
+
     def download_validated_image(self, image_data, index):
         try:
             high_res_url = image_data['url']
             bus_info = image_data['bus_info']
-            filename = self.generate_filename(high_res_url, index, bus_info)
+            filename = self.reserve_filename(image_data, self.generate_filename(high_res_url, index, bus_info))
             filepath = os.path.join(self.download_dir, filename)
 
-            if os.path.exists(filepath):
-                with self.lock:
-                    print(f"⏭ Já existe: {filename}")
+            if self.is_already_downloaded(filename, filepath, high_res_url):
+                self.log.image(f"⏭ Já existe: {filename}")
+                self.index_download(image_data)
                 return None
 
-            with self.lock:
-                print(f"Baixando: {filename}")
-                print(f"Linha: {bus_info.get('line_number', 'N/A')} - {bus_info.get('bus_name', 'N/A')}")
+            self.log.image(f"Baixando: {filename}\n"
+                           f"Linha: {bus_info.get('line_number', 'N/A')} - {bus_info.get('bus_name', 'N/A')}")
+
+            if self.offline:
+                self.log.image(f"📴 Modo offline: {filename} não baixada")
+                return None
+
+            if self.store is not None:
+                temp_path = self.store.temp_path(high_res_url)
+                try:
+                    if not self.download_image(high_res_url, filename, temp_path):
+                        return None
+                    return self.store_download(temp_path, image_data, filename)
+                finally:
+                    self.store.release_temp(temp_path)
 
             if self.download_image(high_res_url, filename):
+                self.record_download(filename, high_res_url)
+                self.index_download(image_data)
+                self.submit_postprocess(filename, image_data)
                 return filename
             return None
 
         except Exception as e:
+            self.log.error(f"Erro no download: {e}")
+            return None
+
+    def is_already_downloaded(self, filename, filepath, image_url=None):
+        if self.journal is not None and self.journal.is_downloaded(filename):
+            return True
+        # No store, o nome legível não identifica a imagem; a URL sim
+        if self.store is not None:
+            return image_url is not None and self.store.url_digest(image_url) is not None
+        return os.path.exists(filepath)
+
+    def store_download(self, temp_path, image_data, filename):
+        image_url = image_data['url']
+        stored, name = self.store.add(temp_path, image_url, filename)
+        if not stored:
             with self.lock:
-                print(f"Erro no download: {e}")
+                self.stats['duplicate_images'] += 1
+            self.log.image(f"⏭ Duplicada de {name}: {filename}")
+            self.record_download(filename, image_url)
+            self.index_download(image_data)
             return None
 
+        self.record_download(filename, image_url)
+        self.index_download(image_data)
+        self.submit_postprocess(name, image_data)
+        return name
+
+    def record_download(self, filename, image_url):
+        if self.journal is not None:
+            self.journal.record_download(filename, image_url)
+
+    def record_manifest(self, filename, image_data):
+        if self.manifest is None:
+            return
+        # Páginas de detalhe guardadas por versões anteriores não têm page_url
+        bus_info = image_data.get('bus_info') or {}
+        image_url = image_data['url']
+        self.manifest.append({
+            'filename': filename,
+            'line_number': bus_info.get('line_number'),
+            'bus_name': bus_info.get('bus_name'),
+            'page_url': image_data.get('page_url'),
+            'image_url': image_url,
+            'size': os.path.getsize(os.path.join(self.download_dir, filename)),
+            'sha256': self.store.url_digest(image_url) if self.store is not None else None,
+            'downloaded_at': time.time(),
+        })
+
+    def submit_postprocess(self, filename, image_data):
+        if self.postprocessor is None:
+            self.record_manifest(filename, image_data)
+            return
+
+        # O registro no manifesto espera o veredito: uma imagem descartada
+        # pelo pós-processamento (inválida ou pequena demais) não entra
+        def finished(result):
+            if result is None or os.path.exists(result['path']):
+                self.record_manifest(filename, image_data)
+
+        self.postprocessor.submit(os.path.join(self.download_dir, filename), finished)
+
     def get_pagination_urls(self, soup, current_url):
         pagination_urls = []
         
@@ -483,93 +1115,554 @@ class BusCrawler:
             for link in links:
                 href = link.get('href')
                 if href:
-                    full_url = urljoin(current_url, href)
+                    try:
+                        full_url = urljoin(current_url, href)
+                    except ValueError:
+                        continue
                     pagination_urls.append(full_url)
         
-        pagination_urls = list(set(pagination_urls))
-        if current_url in pagination_urls:
-            pagination_urls.remove(current_url)
-        
-        return pagination_urls
+        # Remove duplicatas (pela URL canônica) mantendo a ordem do documento
+        # e a primeira forma em que cada página apareceu
+        unique = {canonicalize_url(current_url): None}
+        for url in pagination_urls:
+            unique.setdefault(canonicalize_url(url), url)
+        return [url for url in unique.values() if url is not None]
     
-    def crawl_page(self, page_url, page_num=1):
-        print(f"\nProcessando página {page_num}: {page_url}")
-        
+    def parse_listing_page(self, html, page_url, collect_pagination=True):
+        with self.metrics.stage('listing_parse'):
+            return self.parse_listing_html(html, page_url, collect_pagination)
+
+    def parse_listing_html(self, html, page_url, collect_pagination=True):
+        soup = BeautifulSoup(html, 'html.parser')
+
+        image_links = self.extract_image_links(soup, page_url)
+        pagination_urls = []
+        if collect_pagination:
+            pagination_urls = self.get_pagination_urls(soup, page_url)
+
+        return image_links, pagination_urls
+
+    def record_listing_fetch(self, page_url):
+        with self.lock:
+            self.stats['listing_fetches'] += 1
+            if page_url in self.fetched_listing_urls:
+                self.stats['duplicate_listing_fetches'] += 1
+            self.fetched_listing_urls.add(page_url)
+
+    def fetch_listing_page(self, page_url, collect_pagination=True):
+        if self.journal is not None:
+            links = self.journal.listing_links(page_url)
+            if links is not None:
+                return links
+
+        self.record_listing_fetch(page_url)
+
         response = self.get_page(page_url)
         if not response:
-            return []
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        image_links = self.extract_image_links(soup, page_url)
-        print(f"Encontrados {len(image_links)} links de imagens na página {page_num}")
+            return None
+
+        image_links, pagination_urls = self.parse_listing_page(
+            response.text, page_url, collect_pagination
+        )
+        if self.journal is not None:
+            self.journal.record_listing(page_url, image_links, pagination_urls)
+        return image_links, pagination_urls
+
+    def page_base_index(self, page_num):
+        return self.index_offset + (page_num - 1) * 100
+
+    def filter_new_links(self, image_links):
+        if not self.incremental or self.index is None:
+            return image_links
+
+        new_links = [link for link in image_links if link not in self.index]
+        skipped = len(image_links) - len(new_links)
+        if skipped:
+            with self.lock:
+                self.stats['known_links_skipped'] += skipped
+            self.log.info(f"⏭ {skipped} imagens já conhecidas puladas")
+        return new_links
+
+    def should_stop_paginating(self, new_links):
+        if not self.incremental:
+            return False
+
+        if new_links:
+            self.known_page_streak = 0
+            return False
+
+        self.known_page_streak += 1
+        if self.known_page_streak >= self.stop_after_known_pages:
+            self.log.info(f"⏹ {self.known_page_streak} páginas seguidas sem imagens novas - parando a paginação")
+            return True
+        return False
+
+    def crawl_page(self, page_url, page_num=1, collect_pagination=True):
+        self.log.info(f"\nProcessando página {page_num}: {page_url}")
+
+        links = self.fetch_listing_page(page_url, collect_pagination)
+        if links is None:
+            return PageResult(page_url, page_num)
+
+        image_links, pagination_urls = links
+        self.log.info(f"Encontrados {len(image_links)} links de imagens na página {page_num}")
+        new_links = self.filter_new_links(image_links)
+
+        downloaded = self.process_images_parallel(new_links, page_num)
+        self.log.info(f"✅ Página {page_num} concluída: {len(downloaded)} imagens baixadas em alta resolução")
+        return PageResult(page_url, page_num, image_links, pagination_urls, downloaded, new_links)
+
+    def open_frontier(self, start_url):
+        self.open_stores()
+        return Frontier(start_url, self.journal)
+
+    def open_stores(self):
+        self.log.start(self.progress_line if self.progress else None)
+
+        if self.journal_path:
+            from crawl_journal import CrawlJournal
+            self.journal = CrawlJournal(self.journal_path, resume=self.resume)
+            if self.resume and self.journal.has_state():
+                self.log.info(f"♻️ Retomando crawl a partir de {self.journal_path}")
+
+        if self.index_path:
+            from crawl_journal import DetailIndex
+            self.index = DetailIndex(self.index_path)
+            if self.incremental:
+                self.index_offset = self.index.index_offset
+                self.log.info(f"📇 Modo incremental: {len(self.index)} páginas de detalhe já conhecidas")
+
+        if self.cache_path:
+            from http_cache import HttpCache
+            self.http_cache = HttpCache(self.cache_path, self.cache_max_bytes)
+            if self.offline:
+                self.log.info(f"📴 Modo offline: páginas servidas só a partir de {self.cache_path}")
+
+        if self.strategy_path:
+            from strategy_order import StrategyStats
+            self.strategy_stats = StrategyStats(self.strategy_path)
+
+        if self.postprocess:
+            from postprocess import PostProcessor
+            self.postprocessor = PostProcessor(self.postprocess_dir, self.postprocess_processes,
+                                               thumb_size=self.thumbnail_size, webp_quality=self.webp_quality,
+                                               log=self.log)
+            self.metrics.gauge('postprocess_backlog', self.postprocessor.backlog)
+
+        if self.content_store:
+            from image_store import ImageStore
+            self.store = ImageStore(self.download_dir, perceptual=self.perceptual_dedupe, log=self.log)
+
+        if self.manifest_path:
+            from manifest import ManifestWriter
+            self.manifest = ManifestWriter(self.manifest_path, self.buffer_size)
+
+        self.start_metrics()
+        self.known_page_streak = 0
+
+    def start_metrics(self):
+        if not (self.stats_interval or self.metrics_port is not None):
+            return
+        self.metrics_reporter = MetricsReporter(
+            lambda: self.metrics.snapshot(self.stats),
+            lambda: self.metrics.prometheus(self.stats),
+            interval=self.stats_interval,
+            port=self.metrics_port,
+            write=self.log.info,
+        ).start()
+        if self.metrics_reporter.url:
+            self.log.info(f"📈 Métricas Prometheus em {self.metrics_reporter.url}")
+
+    def stop_metrics(self):
+        if self.metrics_reporter is not None:
+            self.metrics_reporter.stop()
+            if self.stats_interval:
+                self.metrics_reporter.emit()
+            self.metrics_reporter = None
+
+        for path in self.metrics.dump_profiles(self.profile_dir):
+            self.log.info(f"🔬 Perfil salvo em {path}")
+
+    def finish_run(self, frontier):
+        # Só uma execução concluída libera um novo bloco de numeração;
+        # uma execução interrompida e retomada reutiliza o mesmo
+        if self.index is not None and self.incremental:
+            self.index.advance_index_offset(frontier.page_count)
+
+    def close_stores(self):
+        if self.postprocessor is not None:
+            if self.postprocessor.backlog():
+                self.log.info(f"🖼 Aguardando o pós-processamento de {self.postprocessor.backlog()} imagens...")
+            counts = self.postprocessor.close()
+            self.postprocessor = None
+            self.stats['postprocessed'] += counts['ok']
+            self.stats['postprocess_invalid'] += counts['invalid']
+            self.stats['postprocess_too_small'] += counts['too_small']
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        if self.http_cache is not None:
+            self.http_cache.close()
+            self.http_cache = None
+        if self.strategy_stats is not None:
+            self.strategy_stats.close()
+            self.strategy_stats = None
+        if self.manifest is not None:
+            self.manifest.close()
+            self.manifest = None
+        self.stop_metrics()
+        # Esvazia a fila do log: o resumo vem depois de todas as mensagens
+        self.log.stop()
+
+    def progress_line(self):
+        snapshot = self.metrics.snapshot()
+        stages = snapshot['stages']
+        counters = snapshot['counters']
+        downloaded = counters.get('images_downloaded', 0)
+        rate = downloaded / snapshot['elapsed'] if snapshot['elapsed'] else 0.0
+        return (f"📄 {stages.get('listing_parse', {}).get('count', 0)} páginas | "
+                f"🔍 {stages.get('detail_parse', {}).get('count', 0)} detalhes | "
+                f"⬇ {downloaded} baixadas ({rate:.1f}/s) | "
+                f"❌ {counters.get('download_errors', 0)} erros")
 
-        downloaded = self.process_images_parallel(image_links, page_num)
-        print(f"✅ Página {page_num} concluída: {len(downloaded)} imagens baixadas em alta resolução")
-        return image_links
-    
     def crawl_website(self, start_url, max_pages=None):
         print(f"Iniciando crawler para: {start_url}")
-        
-        visited_urls = set()
-        urls_to_visit = [start_url]
-        page_count = 0
+
+        self.reset_stats()
+        frontier = self.open_frontier(start_url)
         total_images = 0
-        
-        while urls_to_visit and (max_pages is None or page_count < max_pages):
-            current_url = urls_to_visit.pop(0)
-            
-            if current_url in visited_urls:
-                continue
-            
-            visited_urls.add(current_url)
-            page_count += 1
-            
-            images = self.crawl_page(current_url, page_count)
-            total_images += len(images)
-            
-            if max_pages is None or page_count < max_pages:
-                response = self.get_page(current_url)
-                if response:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    new_urls = self.get_pagination_urls(soup, current_url)
-                    
-                    for url in new_urls:
-                        if url not in visited_urls and url not in urls_to_visit:
-                            urls_to_visit.append(url)
-                            print(f"🔗 Nova página encontrada: {url}")
-        
+
+        try:
+            while True:
+                page = frontier.next_page(max_pages)
+                if page is None:
+                    break
+                current_url, page_num = page
+
+                collect_pagination = frontier.wants_more(max_pages)
+                result = self.crawl_page(current_url, page_num, collect_pagination)
+                if not result.fetched:
+                    # Sem finish: a listagem fica pendente no journal e é
+                    # buscada de novo ao retomar
+                    continue
+                total_images += len(result.image_links)
+
+                if self.should_stop_paginating(result.new_links):
+                    frontier.stop()
+                else:
+                    for url in frontier.add(result.pagination_urls):
+                        self.log.info(f"🔗 Nova página encontrada: {url}")
+                frontier.finish(current_url)
+
+            self.finish_run(frontier)
+        finally:
+            self.shutdown_parse_pool()
+            self.close_stores()
+
+        self.print_summary(frontier.page_count, total_images)
+
+    def fetch_sitemap(self, url, timeout=30):
+        # O sitemap vai para um arquivo temporário em blocos: a conexão e o
+        # slot de concorrência são liberados logo, e o arquivo é lido aos
+        # poucos enquanto os detalhes são processados
+        spool = tempfile.TemporaryFile()
+        try:
+            with self.metrics.stage('page_fetch'):
+                with self.request(url, timeout, stream=True) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(self.buffer_size):
+                        spool.write(chunk)
+        except requests.RequestException as e:
+            spool.close()
+            self.log.error(f"Erro ao acessar {url}: {e}")
+            return None
+
+        self.metrics.add_bytes('page_fetch', spool.tell())
+        with self.lock:
+            self.stats['sitemap_fetches'] += 1
+        self.log.info(f"🗺 Sitemap lido: {url}")
+        spool.seek(0)
+        return spool
+
+    def crawl_sitemap(self, sitemap_url, max_details=None, pattern=DETAIL_PATTERN):
+        if self.offline:
+            raise RuntimeError("O modo offline não lê sitemaps; use um intervalo de IDs")
+        self.crawl_detail_urls(iter_sitemap_urls(self.fetch_sitemap, sitemap_url, pattern, self.log),
+                               sitemap_url, max_details)
+
+    def crawl_id_range(self, template, start, end, max_details=None):
+        self.crawl_detail_urls(iter_id_urls(template, start, end), f"{template} ({start}-{end})", max_details)
+
+    def crawl_detail_urls(self, detail_urls, source, max_details=None):
+        # Descoberta sem listagens: as páginas de detalhe vêm de um sitemap ou
+        # de um intervalo de IDs e vão direto para as threads, sem esperar
+        # página a página. A fila de tarefas é limitada e o iterador é lido
+        # conforme as threads liberam espaço.
+        print(f"Iniciando crawler para: {source}")
+
+        self.reset_stats()
+        self.open_stores()
+        found = 0
+        skipped = 0
+        downloaded = 0
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pending = set()
+                for detail_url in itertools.islice(detail_urls, max_details):
+                    # A posição na sequência numera o arquivo: uma execução
+                    # retomada gera os mesmos nomes
+                    found += 1
+                    if self.incremental and self.index is not None and detail_url in self.index:
+                        skipped += 1
+                        continue
+                    if len(pending) >= self.max_workers * 4:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        downloaded += sum(1 for future in done if future.result())
+                    pending.add(executor.submit(self.process_single_image, detail_url,
+                                                self.index_offset + found))
+                downloaded += sum(1 for future in as_completed(pending) if future.result())
+
+            if skipped:
+                self.stats['known_links_skipped'] += skipped
+                self.log.info(f"⏭ {skipped} imagens já conhecidas puladas")
+            if self.index is not None and self.incremental:
+                self.index.advance_index_offset((found + 99) // 100)
+        finally:
+            self.shutdown_parse_pool()
+            self.close_stores()
+
+        self.print_summary(0, found, downloaded)
+
+    def print_summary(self, page_count, total_images, downloaded=None):
         print(f"\nCrawler concluído!")
         print(f"Total de páginas processadas: {page_count}")
         print(f"Total de imagens encontradas: {total_images}")
+        if downloaded is not None:
+            print(f"Total de imagens baixadas: {downloaded}")
+        print(f"Requisições de listagem: {self.stats['listing_fetches']} "
+              f"(duplicadas: {self.stats['duplicate_listing_fetches']})")
+        if self.stats['sitemap_fetches']:
+            print(f"Sitemaps lidos: {self.stats['sitemap_fetches']}")
+        if self.incremental:
+            print(f"Imagens já conhecidas puladas: {self.stats['known_links_skipped']}")
+        if self.cache_path:
+            print(f"Cache HTTP: {self.stats['cache_hits']} hits, {self.stats['cache_misses']} misses, "
+                  f"{self.stats['cache_not_modified']} revalidadas (304)")
+        if self.content_store:
+            print(f"Imagens duplicadas descartadas: {self.stats['duplicate_images']}")
+        if self.stats['resumed_downloads'] or self.stats['invalid_images']:
+            print(f"Downloads retomados: {self.stats['resumed_downloads']}, "
+                  f"imagens corrompidas descartadas: {self.stats['invalid_images']}")
+        if self.postprocess:
+            print(f"Pós-processamento: {self.stats['postprocessed']} imagens com miniatura e WebP em "
+                  f"{self.postprocess_dir}, descartadas {self.stats['postprocess_invalid']} inválidas e "
+                  f"{self.stats['postprocess_too_small']} pequenas demais")
+        if self.fast_parse:
+            print(f"Parsing rápido: {self.stats['fast_parse_fallbacks']} páginas precisaram da árvore completa")
+        self.print_stage_summary()
         print(f"Imagens salvas em: {self.download_dir}")
 
-def main():
+    def print_stage_summary(self):
+        snapshot = self.metrics.snapshot()
+        if not snapshot['stages']:
+            return
+        print("Tempo por estágio:")
+        for name, info in snapshot['stages'].items():
+            if not info['count']:
+                continue
+            line = (f"  {name}: {info['count']} chamadas, total {info['sum']:.2f}s, "
+                    f"média {info['avg'] * 1000:.1f} ms, p90 ≤ {info['p90'] * 1000:g} ms")
+            if 'bytes_per_sec' in info:
+                line += f", {info['bytes_per_sec'] / 1024:.0f} KB/s"
+            print(line)
+
+        counters = snapshot['counters']
+        attempts = counters.get('strategy_onibus_brasil_attempts', 0)
+        if attempts:
+            hits = ', '.join(
+                f"{name} {counters.get(f'strategy_{name}_hits', 0)}"
+                for name in ('onibus_brasil', 'main_image', 'download_link', 'meta_image')
+            )
+            print(f"Estratégias de imagem ({attempts} páginas): {hits}, nenhuma {counters.get('strategy_misses', 0)}")
+
+
+def process_context():
+    # Processos auxiliares nunca nascem de um fork do crawler: ele sempre tem
+    # outras threads rodando (downloads, escrita do log, outros seeds) e um
+    # fork herdaria travas presas por elas. O forkserver parte de um processo
+    # limpo; onde ele não existe, spawn.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+_parse_worker = None
+
+
+def _init_parse_worker(base_url, download_dir, fast_parse=False, log_level='info', log_sample=1):
+    global _parse_worker
+    _parse_worker = BusCrawler(base_url, download_dir, max_workers=1, fast_parse=fast_parse,
+                               log_level=log_level, log_sample=log_sample)
+
+
+def _resolve_detail_batch(batch):
+    results = []
+    for index, image_page_url, content, encoding in batch:
+        html = content.decode(encoding, errors='replace') if encoding else content
+        try:
+            results.append((index, _parse_worker.resolve_image_page(html, image_page_url), True))
+        except Exception as e:
+            _parse_worker.log.error(f"Erro no processamento: {e}")
+            results.append((index, None, False))
+    return results
+
+
+def create_crawler(base_url, download_dir, max_workers=8, engine="threads", **options):
+    if engine == "async":
+        from async_crawler import AsyncBusCrawler
+        return AsyncBusCrawler(base_url, download_dir, max_workers=max_workers,
+                               max_concurrency=max_workers, **options)
+    if engine == "pipeline":
+        from pipeline_crawler import PipelineBusCrawler
+        return PipelineBusCrawler(base_url, download_dir, max_workers=max_workers, **options)
+    if engine == "sharded":
+        from sharded_crawler import ShardedBusCrawler
+        return ShardedBusCrawler(base_url, download_dir, max_workers=max_workers, **options)
+    return BusCrawler(base_url, download_dir, max_workers=max_workers, **options)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        # Com argumentos, roda sem perguntas (agendamentos, vários seeds, shards)
+        from batch_crawl import main as batch_main
+        return batch_main(argv)
+
     base_url = "https://www.onibusbrasil.com"
     
-    start_url = input("Digite a URL da página inicial para fazer o crawler: ").strip()
+    start_url = input("Digite a URL da página inicial, de um sitemap.xml ou de detalhe com {id}: ").strip()
     
     if not start_url:
         print("URL não fornecida!")
         return
     
     download_dir = "onibus_images"
-    max_pages = input("Quantas páginas deseja processar? (deixe vazio para todas): ").strip()
-    workers = input("Quantas threads usar? (padrão 8, máximo 16): ").strip()
+    # Sitemap ou intervalo de IDs: as páginas de detalhe vêm direto, sem listagens
+    id_range = None
+    if '{id}' in start_url:
+        id_range = input("Intervalo de IDs (ex.: 1-5000): ").strip()
+        try:
+            id_range = tuple(int(part) for part in id_range.split('-'))
+            if len(id_range) != 2 or id_range[0] > id_range[1]:
+                raise ValueError
+        except ValueError:
+            print("Intervalo inválido!")
+            return
+    is_sitemap = start_url.lower().endswith(('.xml', '.xml.gz'))
+    if id_range or is_sitemap:
+        max_pages = input("Quantas páginas de detalhe deseja processar? (deixe vazio para todas): ").strip()
+    else:
+        max_pages = input("Quantas páginas deseja processar? (deixe vazio para todas): ").strip()
+    engine = input("Motor de crawling (threads/pipeline/async, padrão threads): ").strip().lower() or "threads"
+    adaptive = input("Ajustar a concorrência automaticamente conforme a resposta do servidor? (s/N): ").strip().lower()
+    adaptive = adaptive in ("s", "sim", "y", "yes")
+    if engine == "async":
+        workers = input("Quantas requisições simultâneas? (padrão 100): ").strip()
+    else:
+        if engine != "pipeline":
+            engine = "threads"
+        if adaptive:
+            workers = input("Máximo de threads? (padrão 32, máximo 64): ").strip()
+        else:
+            workers = input("Quantas threads usar? (padrão 8, máximo 16): ").strip()
+
+    paths = store_paths(download_dir)
+    options = {'journal_path': paths['journal_path'], 'adaptive': adaptive}
+    if os.path.exists(options['journal_path']):
+        resume = input("Há um crawl anterior registrado. Retomar de onde parou? (S/n): ").strip().lower()
+        options['resume'] = resume not in ("n", "nao", "não", "no")
+
+    options['cache_path'] = paths['cache_path']
+    if os.path.exists(options['cache_path']):
+        offline = input("Modo offline (reprocessar só as páginas em cache, sem rede)? (s/N): ").strip().lower()
+        options['offline'] = offline in ("s", "sim", "y", "yes")
+
+    options['index_path'] = paths['index_path']
+    options['strategy_path'] = paths['strategy_path']
+    options['manifest_path'] = paths['manifest_path']
+    incremental = input("Modo incremental (pula imagens já vistas em execuções anteriores)? (s/N): ").strip().lower()
+    options['incremental'] = incremental in ("s", "sim", "y", "yes")
+
+    content_store = input("Guardar as imagens por conteúdo, sem baixar duplicatas? (s/N): ").strip().lower()
+    options['content_store'] = content_store in ("s", "sim", "y", "yes")
+    if options['content_store']:
+        perceptual = input("Descartar também imagens quase idênticas (hash perceptual)? (s/N): ").strip().lower()
+        options['perceptual_dedupe'] = perceptual in ("s", "sim", "y", "yes")
+
+    verify_images = input("Verificar cada imagem baixada com o Pillow? (s/N): ").strip().lower()
+    options['verify_images'] = verify_images in ("s", "sim", "y", "yes")
+
+    postprocess = input("Gerar miniaturas e WebP (e descartar não-imagens) em processos separados? (s/N): ").strip().lower()
+    options['postprocess'] = postprocess in ("s", "sim", "y", "yes")
 
+    fast_parse = input("Usar parsing rápido com lxml nas páginas de detalhe? (s/N): ").strip().lower()
+    options['fast_parse'] = fast_parse in ("s", "sim", "y", "yes")
+    if engine == "threads":
+        processes = input("Processos para parsing das páginas de detalhe? (0 = desativado): ").strip()
+        try:
+            options['parse_processes'] = max(int(processes), 0) if processes else 0
+        except ValueError:
+            options['parse_processes'] = 0
+
+    stats_interval = input("Imprimir estatísticas em JSON a cada quantos segundos? (vazio = não): ").strip()
     try:
-        max_pages = int(max_pages) if max_pages else None
+        options['stats_interval'] = float(stats_interval) if stats_interval else None
     except ValueError:
-        max_pages = None
+        options['stats_interval'] = None
+
+    output = input("Saída: completa, amostrada (1 a cada 20 imagens) ou só progresso? (c/a/p, padrão c): ").strip().lower()
+    if output in ("a", "amostrada"):
+        options['log_sample'] = 20
+    elif output in ("p", "progresso"):
+        options['log_level'] = 'warning'
+        options['progress'] = True
 
     try:
-        workers = min(int(workers), 16) if workers else 8
+        max_pages = int(max_pages) if max_pages else None
     except ValueError:
-        workers = 8
+        max_pages = None
+
+    if engine == "async":
+        try:
+            workers = max(int(workers), 1) if workers else 100
+        except ValueError:
+            workers = 100
+        print(f"Configuração: motor async com {workers} requisições simultâneas")
+    else:
+        # Com controle adaptativo as threads são só o teto; o limite por host é aprendido
+        max_threads, default_threads = (64, 32) if adaptive else (16, 8)
+        try:
+            workers = min(int(workers), max_threads) if workers else default_threads
+        except ValueError:
+            workers = default_threads
+        print(f"Configuração: {workers} threads paralelas")
+    if adaptive:
+        print("Controle adaptativo: a concorrência por host começa em 4 e se ajusta à resposta do servidor")
 
-    print(f"Configuração: {workers} threads paralelas")
-    crawler = BusCrawler(base_url, download_dir, max_workers=workers)
-    crawler.crawl_website(start_url, max_pages)
+    crawler = create_crawler(base_url, download_dir, max_workers=workers, engine=engine, **options)
+    if id_range:
+        crawler.crawl_id_range(start_url, *id_range, max_pages)
+    elif is_sitemap:
+        crawler.crawl_sitemap(start_url, max_pages)
+    else:
+        crawler.crawl_website(start_url, max_pages)
 
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
@@ -0,0 +1,260 @@
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listing_pages (
+    url TEXT PRIMARY KEY,
+    page_num INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    image_links TEXT,
+    pagination_urls TEXT
+);
+CREATE TABLE IF NOT EXISTS detail_pages (
+    url TEXT PRIMARY KEY,
+    image_data TEXT
+);
+CREATE TABLE IF NOT EXISTS downloads (
+    filename TEXT PRIMARY KEY,
+    image_url TEXT NOT NULL,
+    downloaded_at REAL NOT NULL
+);
+'''
+
+
+INDEX_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS details (
+    url TEXT PRIMARY KEY,
+    image_url TEXT,
+    bus_info TEXT,
+    seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS unfinished (
+    url TEXT PRIMARY KEY,
+    filename TEXT NOT NULL
+);
+'''
+
+
+class BatchedStore:
+    def __init__(self, path, schema, batch_size=200, flush_interval=2.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(schema)
+
+    def _write(self, sql, params):
+        self.pending.append((sql, params))
+        if (len(self.pending) >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            with self.conn:
+                for sql, params in self.pending:
+                    self.conn.execute(sql, params)
+            self.pending = []
+        self.last_flush = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.conn.close()
+
+
+class CrawlJournal(BatchedStore):
+    def __init__(self, path, resume=False, batch_size=200, flush_interval=2.0):
+        super().__init__(path, SCHEMA, batch_size, flush_interval)
+
+        if not resume:
+            self.conn.executescript(
+                'DELETE FROM frontier; DELETE FROM listing_pages; '
+                'DELETE FROM detail_pages; DELETE FROM downloads;'
+            )
+            self.conn.commit()
+
+        # Leituras vêm de cópias em memória; só as escritas vão em lote para o disco
+        self.frontier = {
+            url: seq for url, seq in self.conn.execute('SELECT url, seq FROM frontier')
+        }
+        self.next_seq = max(self.frontier.values(), default=0) + 1
+        self.listing_pages = {}
+        for url, page_num, done, image_links, pagination_urls in self.conn.execute(
+                'SELECT url, page_num, done, image_links, pagination_urls FROM listing_pages'):
+            self.listing_pages[url] = {
+                'page_num': page_num,
+                'done': bool(done),
+                'image_links': json.loads(image_links) if image_links else None,
+                'pagination_urls': json.loads(pagination_urls) if pagination_urls else None,
+            }
+        self.detail_pages = {
+            url: json.loads(image_data) if image_data else None
+            for url, image_data in self.conn.execute('SELECT url, image_data FROM detail_pages')
+        }
+        self.downloads = {
+            filename for (filename,) in self.conn.execute('SELECT filename FROM downloads')
+        }
+
+    def has_state(self):
+        return bool(self.frontier or self.listing_pages)
+
+    def load_frontier(self):
+        in_progress = sorted(
+            (info['page_num'], url) for url, info in self.listing_pages.items() if not info['done']
+        )
+        pending = sorted((seq, url) for url, seq in self.frontier.items())
+
+        visited = set(self.listing_pages)
+        queue = [url for _, url in in_progress] + [url for _, url in pending]
+        resumed = {url: page_num for page_num, url in in_progress}
+        page_count = max((info['page_num'] for info in self.listing_pages.values()), default=0)
+        return visited, queue, resumed, page_count
+
+    def add_frontier(self, urls):
+        with self.lock:
+            for url in urls:
+                if url in self.frontier:
+                    continue
+                self.frontier[url] = self.next_seq
+                self._write('INSERT OR REPLACE INTO frontier (url, seq) VALUES (?, ?)', (url, self.next_seq))
+                self.next_seq += 1
+
+    def start_listing(self, url, page_num):
+        with self.lock:
+            self.frontier.pop(url, None)
+            self.listing_pages[url] = {
+                'page_num': page_num,
+                'done': False,
+                'image_links': None,
+                'pagination_urls': None,
+            }
+            self._write('DELETE FROM frontier WHERE url = ?', (url,))
+            self._write(
+                'INSERT OR REPLACE INTO listing_pages (url, page_num, done) VALUES (?, ?, 0)',
+                (url, page_num),
+            )
+
+    def record_listing(self, url, image_links, pagination_urls):
+        with self.lock:
+            info = self.listing_pages.get(url)
+            if info is None:
+                return
+            info['image_links'] = image_links
+            info['pagination_urls'] = pagination_urls
+            self._write(
+                'UPDATE listing_pages SET image_links = ?, pagination_urls = ? WHERE url = ?',
+                (json.dumps(image_links), json.dumps(pagination_urls), url),
+            )
+
+    def listing_links(self, url):
+        info = self.listing_pages.get(url)
+        if info is None or info['image_links'] is None:
+            return None
+        return info['image_links'], info['pagination_urls']
+
+    def clear_frontier(self):
+        with self.lock:
+            self.frontier.clear()
+            self._write('DELETE FROM frontier', ())
+
+    def finish_listing(self, url):
+        with self.lock:
+            info = self.listing_pages.get(url)
+            if info is not None:
+                info['done'] = True
+            self._write('UPDATE listing_pages SET done = 1 WHERE url = ?', (url,))
+
+    def detail_result(self, url):
+        if url in self.detail_pages:
+            return True, self.detail_pages[url]
+        return False, None
+
+    def record_detail(self, url, image_data):
+        with self.lock:
+            self.detail_pages[url] = image_data
+            self._write(
+                'INSERT OR REPLACE INTO detail_pages (url, image_data) VALUES (?, ?)',
+                (url, json.dumps(image_data) if image_data else None),
+            )
+
+    def is_downloaded(self, filename):
+        return filename in self.downloads
+
+    def record_download(self, filename, image_url):
+        with self.lock:
+            self.downloads.add(filename)
+            self._write(
+                'INSERT OR REPLACE INTO downloads (filename, image_url, downloaded_at) VALUES (?, ?, ?)',
+                (filename, image_url, time.time()),
+            )
+
+
+class DetailIndex(BatchedStore):
+    def __init__(self, path, batch_size=200, flush_interval=2.0):
+        super().__init__(path, INDEX_SCHEMA, batch_size, flush_interval)
+
+        self.urls = {url for (url,) in self.conn.execute('SELECT url FROM details')}
+        # Downloads iniciados e não concluídos: o nome do arquivo (e o .part)
+        # é reaproveitado quando a página é tentada de novo
+        self.unfinished = dict(self.conn.execute('SELECT url, filename FROM unfinished'))
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'index_offset'").fetchone()
+        self.index_offset = int(row[0]) if row else 0
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def __len__(self):
+        return len(self.urls)
+
+    def reserve_filename(self, url, filename):
+        with self.lock:
+            reserved = self.unfinished.get(url)
+            if reserved is not None:
+                return reserved
+            self.unfinished[url] = filename
+            self._write('INSERT OR REPLACE INTO unfinished (url, filename) VALUES (?, ?)', (url, filename))
+            return filename
+
+    def record(self, url, image_data):
+        with self.lock:
+            self.urls.add(url)
+            if self.unfinished.pop(url, None) is not None:
+                self._write('DELETE FROM unfinished WHERE url = ?', (url,))
+            self._write(
+                'INSERT OR REPLACE INTO details (url, image_url, bus_info, seen_at) VALUES (?, ?, ?, ?)',
+                (url,
+                 image_data['url'] if image_data else None,
+                 json.dumps(image_data['bus_info']) if image_data else None,
+                 time.time()),
+            )
+
+    def advance_index_offset(self, pages):
+        # Cada execução incremental numera as imagens a partir de um bloco novo,
+        # para nunca reaproveitar nomes de arquivos de execuções anteriores
+        with self.lock:
+            self.index_offset += pages * 100
+            self._write(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('index_offset', ?)",
+                (str(self.index_offset),),
+            )
@@ -0,0 +1,145 @@
+import itertools
+import json
+import sys
+import threading
+import time
+from queue import SimpleQueue, Empty
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+_STOP = object()
+
+
+class CrawlLog:
+    # Saída do crawl sem trava no caminho quente: quem loga só enfileira a
+    # mensagem, e uma thread escreve tudo o que estiver na fila de uma vez.
+    # Fora de start()/stop() (processos de parsing, chamadas avulsas) a
+    # escrita é direta.
+    def __init__(self, level='info', sample_every=1, json_format=False, progress=None,
+                 interval=0.5, stream=None, name=None):
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.sample_every = max(sample_every, 1)
+        self.samples = itertools.count()
+        self.json_format = json_format
+        self.progress = progress
+        self.interval = interval
+        self.stream = stream
+        # Com vários crawlers no mesmo processo, cada linha leva o nome do seu
+        self.name = name
+        self.queue = SimpleQueue()
+        self.thread = None
+        self.progress_shown = False
+        self.last_progress = None
+
+    def debug(self, message):
+        self.log(DEBUG, message)
+
+    def info(self, message):
+        self.log(INFO, message)
+
+    def warning(self, message):
+        self.log(WARNING, message)
+
+    def error(self, message):
+        self.log(ERROR, message)
+
+    def image(self, message):
+        # Linhas por imagem: com sample_every=N só uma a cada N é escrita
+        if self.level > INFO or next(self.samples) % self.sample_every:
+            return
+        self.log(INFO, message)
+
+    def log(self, level, message):
+        if level < self.level:
+            return
+        if self.thread is None:
+            self.write([(time.time(), level, message)])
+        else:
+            self.queue.put((time.time(), level, message))
+
+    def start(self, progress=None):
+        if progress is not None:
+            self.progress = progress
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.thread = None
+        if self.progress is not None:
+            self.render_progress()
+            if self.progress_shown:
+                self.output().write('\n')
+                self.progress_shown = False
+
+    def run(self):
+        next_progress = time.monotonic() + self.interval
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.interval)]
+            except Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            stop = _STOP in batch
+            entries = [entry for entry in batch if entry is not _STOP]
+            if entries:
+                self.write(entries)
+            if stop:
+                return
+            if self.progress is not None and time.monotonic() >= next_progress:
+                self.render_progress()
+                next_progress = time.monotonic() + self.interval
+
+    def output(self):
+        # Resolvido a cada escrita: respeita redirect_stdout
+        return self.stream or sys.stdout
+
+    def format(self, entry):
+        created, level, message = entry
+        if self.json_format:
+            record = {'time': round(created, 3), 'level': LEVEL_NAMES.get(level, level),
+                      'message': message.strip('\n')}
+            if self.name:
+                record['name'] = self.name
+            return json.dumps(record, ensure_ascii=False)
+        if self.name:
+            return '\n'.join(f"[{self.name}] {line}" if line else line for line in message.split('\n'))
+        return message
+
+    def write(self, entries):
+        stream = self.output()
+        text = '\n'.join(self.format(entry) for entry in entries) + '\n'
+        if self.progress_shown:
+            # Apaga a barra de progresso; ela volta no próximo intervalo
+            text = '\r\033[K' + text
+            self.progress_shown = False
+        stream.write(text)
+        stream.flush()
+
+    def render_progress(self):
+        text = self.progress()
+        if self.name:
+            text = f"[{self.name}] {text}"
+        stream = self.output()
+        if stream.isatty():
+            stream.write('\r\033[K' + text)
+            self.progress_shown = True
+        elif text != self.last_progress:
+            stream.write(text + '\n')
+        self.last_progress = text
+        stream.flush()
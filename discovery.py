@@ -0,0 +1,85 @@
+import gzip
+import re
+from collections import deque
+from urllib.parse import urljoin, urlsplit
+
+from lxml import etree
+
+# Páginas de detalhe do Ônibus Brasil (e do fixture_site.py): /foto/<id>
+DETAIL_PATTERN = r'/foto/\d+'
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_sitemap_file(f):
+    # sitemap.xml.gz (ou gzip servido sem Content-Encoding) é descompactado
+    # durante a leitura
+    magic = f.read(2)
+    f.seek(0)
+    if magic == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=f)
+    return f
+
+
+def iter_sitemap_entries(f):
+    # (tipo, loc) de cada <url> ou <sitemap>, com ou sem namespace. Cada
+    # elemento é descartado depois de lido: a memória não cresce com o arquivo
+    for _, element in etree.iterparse(open_sitemap_file(f), events=('end',),
+                                      resolve_entities=False, huge_tree=True):
+        if not isinstance(element.tag, str):
+            continue
+        kind = etree.QName(element).localname
+        if kind not in ('url', 'sitemap'):
+            continue
+
+        loc = None
+        for child in element:
+            if isinstance(child.tag, str) and etree.QName(child).localname == 'loc':
+                loc = (child.text or '').strip()
+                break
+
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+        if loc:
+            yield kind, loc
+
+
+def iter_sitemap_urls(fetch, sitemap_url, pattern=DETAIL_PATTERN, log=None):
+    # fetch(url) devolve o sitemap num arquivo aberto (ou None em caso de
+    # erro). Índices de sitemaps são seguidos na ordem do documento; só as
+    # URLs cujo caminho casa com pattern são devolvidas. Um sitemap malformado
+    # é abandonado no ponto do erro e os demais continuam.
+    matcher = re.compile(pattern) if pattern else None
+    pending = deque([sitemap_url])
+    seen = set()
+
+    while pending:
+        url = pending.popleft()
+        if url in seen:
+            continue
+        seen.add(url)
+
+        f = fetch(url)
+        if f is None:
+            continue
+        children = []
+        with f:
+            try:
+                for kind, loc in iter_sitemap_entries(f):
+                    loc = urljoin(url, loc)
+                    if kind == 'sitemap':
+                        children.append(loc)
+                    elif matcher is None or matcher.search(urlsplit(loc).path):
+                        yield loc
+            except (etree.XMLSyntaxError, OSError, EOFError) as e:
+                if log is not None:
+                    log.error(f"Sitemap inválido {url}: {e}")
+        pending.extendleft(reversed(children))
+
+
+def iter_id_urls(template, start, end):
+    # Páginas de detalhe numeradas: template com {id}, intervalo inclusivo
+    if '{id}' not in template:
+        raise ValueError("O modelo de URL precisa conter {id}")
+    for photo_id in range(start, end + 1):
+        yield template.replace('{id}', str(photo_id))
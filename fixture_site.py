@@ -0,0 +1,408 @@
+import gzip
+import hashlib
+import io
+import random
+import re
+import socket
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Variações do texto de serviço, uma para cada ramo de match_service.
+# A última não é serviço urbano e a página é pulada pelo crawler.
+SERVICE_LAYOUTS = (
+    ('servico_inter', 'Serviço Urbano: INTER {n}'),
+    ('urbano_inter', 'Categoria: Urbano INTER {n}'),
+    ('inter_urbano', 'Linha INTER {n} (ônibus urbano)'),
+    ('urbano_depois_inter', 'Urbano - integração INTER {n}'),
+    ('servico_linha', 'Serviço Urbano: {n} - Terminal Central / Centro'),
+    ('urbano_linha', 'Urbano: {n} - Vila Nova'),
+    ('servico_espaco', 'Serviço Urbano {n} - Jardim América'),
+    ('tipo', 'Tipo: Urbano. Itinerário {n} - Parque Industrial'),
+    ('linha_urbano', 'Linha {n} - Centro Histórico, serviço urbano'),
+    ('fallback_linha', 'Ônibus urbano. Carro {n} - Bairro Alto'),
+    ('fallback_linha_sem_traco', 'Ônibus urbano, Linha {n} Morro Azul'),
+    ('generico', 'Ônibus urbano'),
+    ('rodoviario', 'Serviço Rodoviário: {n} - Expresso'),
+)
+
+# Marcação da imagem, uma para cada estratégia de find_high_res_image;
+# a última não tem imagem em alta resolução
+IMAGE_LAYOUTS = (
+    ('onibus_brasil', '<a href="/img/{n}-large.jpg" data-lightbox="foto">'
+                      '<img src="/img/{n}-medium.jpg" data-lightbox="foto"></a>'),
+    ('onibus_brasil_script', '<script>var foto = {{"image": "/img/original/{n}.jpg"}};</script>'
+                             '<img src="/img/thumb/{n}.jpg">'),
+    ('main_image', '<div class="image-container"><img src="/img/view/{n}.jpg"></div>'),
+    ('main_image_maior', '<img src="/img/thumb/{n}.jpg" width="160" height="120">'
+                         '<img src="/img/view/{n}.jpg" width="1024" height="768">'),
+    ('download_link', '<img src="/img/thumb/{n}.jpg"><a class="download-link" href="/img/download/{n}.jpg"></a>'),
+    ('meta_image', '<img src="/img/thumb/{n}.jpg">'),
+    ('sem_imagem', '<img src="/img/thumb/{n}.jpg">'),
+)
+
+
+class FixtureSite:
+    def __init__(self, pages=10, images_per_page=20, latency=0.0, error_rate=0.0,
+                 image_size=(640, 480), page_size=0, seed=0, host='127.0.0.1', port=0,
+                 capacity=None, overload_status=429, retry_after=1,
+                 shared_photos=0, distinct_images=None, drop_rate=0.0, range_support=True,
+                 mixed_layouts=False, broken_every=0, tiny_every=0, sitemap_size=50):
+        self.pages = pages
+        self.sitemap_size = sitemap_size
+        self.broken_every = broken_every
+        self.tiny_every = tiny_every
+        self.mixed_layouts = mixed_layouts
+        self.images_per_page = images_per_page
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.image_size = image_size
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.shared_photos = shared_photos
+        self.drop_rate = drop_rate
+        self.range_support = range_support
+        self.drop_count = 0
+        self.not_modified_count = 0
+        self.last_modified = formatdate(usegmt=True)
+        self.distinct_images = distinct_images
+        self.capacity = capacity
+        self.overload_status = overload_status
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.overload_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.count_lock = threading.Lock()
+        self._image_cache = {}
+
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                site.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 1024
+            daemon_threads = True
+
+        self.server = Server((host, port), Handler)
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def start_url(self):
+        return f"{self.base_url}/fotos?page=1"
+
+    @property
+    def sitemap_url(self):
+        return f"{self.base_url}/sitemap.xml"
+
+    @property
+    def id_template(self):
+        return f"{self.base_url}/foto/{{id}}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def photo_id(self, page, seq):
+        return (page - 1) * self.images_per_page + seq + 1
+
+    def handle(self, handler):
+        with self.count_lock:
+            self.request_count += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            load = self.in_flight
+        try:
+            self.respond(handler, load)
+        finally:
+            with self.count_lock:
+                self.in_flight -= 1
+
+    def respond(self, handler, load):
+        if self.capacity:
+            # Servidor sobrecarregado: responde 429/503 além da capacidade
+            # e fica mais lento à medida que a carga se aproxima dela
+            if load > self.capacity:
+                with self.count_lock:
+                    self.overload_count += 1
+                self.send(handler, self.overload_status, b'sobrecarga', 'text/plain',
+                          {'Retry-After': str(self.retry_after)})
+                return
+            if self.latency:
+                time.sleep(self.latency * (1 + load / self.capacity))
+        elif self.latency:
+            time.sleep(self.latency)
+
+        if self.error_rate:
+            with self.random_lock:
+                failed = self.random.random() < self.error_rate
+            if failed:
+                self.send(handler, 500, b'erro', 'text/plain')
+                return
+
+        parsed = urlparse(handler.path)
+        query = parse_qs(parsed.query)
+
+        if parsed.path == '/fotos':
+            page = int(query.get('page', ['1'])[0])
+            if 1 <= page <= self.pages:
+                self.send_page(handler, self.listing_page(page))
+                return
+
+        if parsed.path == '/sitemap.xml':
+            self.send(handler, 200, self.sitemap_index().encode('utf-8'), 'application/xml')
+            return
+
+        match = re.fullmatch(r'/sitemaps/fotos-(\d+)\.xml(\.gz)?', parsed.path)
+        if match and 1 <= int(match.group(1)) <= self.sitemap_count():
+            body = self.sitemap(int(match.group(1))).encode('utf-8')
+            if match.group(2):
+                self.send(handler, 200, gzip.compress(body), 'application/gzip')
+            else:
+                self.send(handler, 200, body, 'application/xml')
+            return
+
+        match = re.fullmatch(r'/foto/(\d+)', parsed.path)
+        if match:
+            self.send_page(handler, self.detail_page(int(match.group(1))))
+            return
+
+        match = re.fullmatch(r'/img/(?:\w+/)?(\d+)(?:-large)?\.jpg', parsed.path)
+        if match:
+            self.send_image(handler, self.image_bytes(int(match.group(1))))
+            return
+
+        self.send(handler, 404, b'nao encontrado', 'text/plain')
+
+    def send(self, handler, status, body, content_type, headers=None):
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def send_page(self, handler, html):
+        body = html.encode('utf-8')
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        headers = {'ETag': etag, 'Last-Modified': self.last_modified}
+
+        if_none_match = handler.headers.get('If-None-Match')
+        if (if_none_match == etag
+                or (if_none_match is None and handler.headers.get('If-Modified-Since') == self.last_modified)):
+            with self.count_lock:
+                self.not_modified_count += 1
+            handler.send_response(304)
+            for name, value in headers.items():
+                handler.send_header(name, value)
+            handler.end_headers()
+            return
+
+        self.send(handler, 200, body, 'text/html; charset=utf-8', headers)
+
+    def send_image(self, handler, data):
+        status = 200
+        headers = {'Accept-Ranges': 'bytes'} if self.range_support else {}
+        body = data
+
+        match = re.fullmatch(r'bytes=(\d+)-', handler.headers.get('Range', ''))
+        if match and self.range_support:
+            start = int(match.group(1))
+            if start >= len(data):
+                self.send(handler, 416, b'', 'image/jpeg', {'Content-Range': f'bytes */{len(data)}'})
+                return
+            status = 206
+            body = data[start:]
+            headers['Content-Range'] = f'bytes {start}-{len(data) - 1}/{len(data)}'
+
+        if self.drop_rate:
+            with self.random_lock:
+                dropped = self.random.random() < self.drop_rate
+            if dropped:
+                # Anuncia o tamanho completo, envia metade e derruba a conexão
+                with self.count_lock:
+                    self.drop_count += 1
+                handler.send_response(status)
+                handler.send_header('Content-Type', 'image/jpeg')
+                handler.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    handler.send_header(name, value)
+                handler.end_headers()
+                handler.wfile.write(body[:len(body) // 2])
+                handler.wfile.flush()
+                handler.close_connection = True
+                handler.connection.shutdown(socket.SHUT_RDWR)
+                return
+
+        self.send(handler, status, body, 'image/jpeg', headers)
+
+    def listing_page(self, page):
+        items = []
+        for seq in range(self.images_per_page):
+            photo_id = self.photo_id(page, seq)
+            items.append(
+                f'<a href="/foto/{photo_id}"><img src="/thumb/{photo_id}.jpg" width="160" height="120"></a>'
+            )
+
+        # Destaques: as primeiras fotos da página 1 aparecem em todas as listagens
+        if page > 1:
+            for seq in range(min(self.shared_photos, self.images_per_page)):
+                photo_id = self.photo_id(1, seq)
+                items.append(
+                    f'<a href="/foto/{photo_id}"><img src="/thumb/{photo_id}.jpg" width="160" height="120"></a>'
+                )
+
+        pagination = []
+        for target in (page - 1, page + 1):
+            if 1 <= target <= self.pages:
+                pagination.append(f'<a href="/fotos?page={target}">{target}</a>')
+
+        return (
+            '<html><head><title>Fotos</title></head><body>'
+            '<div class="header"><a href="/"><img src="/logo.png" width="200" height="50"></a></div>'
+            f'<div class="fotos">{"".join(items)}</div>'
+            f'<div class="pagination">{"".join(pagination)}</div>'
+            '</body></html>'
+        )
+
+    def sitemap_count(self):
+        return max(-(-self.pages * self.images_per_page // self.sitemap_size), 1)
+
+    def sitemap_index(self):
+        # Sitemaps ímpares em .xml.gz, pares em .xml: os dois formatos aparecem
+        entries = ''.join(
+            f'<sitemap><loc>{self.base_url}/sitemaps/fotos-{k}.xml{".gz" if k % 2 else ""}</loc></sitemap>'
+            for k in range(1, self.sitemap_count() + 1)
+        )
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>')
+
+    def sitemap(self, k):
+        total = self.pages * self.images_per_page
+        first = (k - 1) * self.sitemap_size + 1
+        urls = [f'/foto/{photo_id}' for photo_id in range(first, min(first + self.sitemap_size, total + 1))]
+        # Páginas que não são de detalhe, para o filtro do crawler descartar
+        if k == 1:
+            urls += ['/', '/sobre'] + [f'/fotos?page={page}' for page in range(1, self.pages + 1)]
+        entries = ''.join(f'<url><loc>{self.base_url}{url.replace("&", "&amp;")}</loc>'
+                          f'<lastmod>2024-01-01</lastmod></url>' for url in urls)
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>')
+
+    def layouts(self, photo_id):
+        # Tamanhos coprimos: todas as combinações aparecem a cada 91 fotos
+        return (SERVICE_LAYOUTS[photo_id % len(SERVICE_LAYOUTS)],
+                IMAGE_LAYOUTS[photo_id % len(IMAGE_LAYOUTS)])
+
+    def expected_images(self):
+        # Fotos que o crawler deve baixar: serviço urbano com imagem encontrável
+        photos = range(1, self.pages * self.images_per_page + 1)
+        if not self.mixed_layouts:
+            return len(photos)
+        return sum(1 for photo_id in photos
+                   if self.layouts(photo_id)[0][0] != 'rodoviario'
+                   and self.layouts(photo_id)[1][0] != 'sem_imagem')
+
+    def detail_page(self, photo_id):
+        if self.mixed_layouts:
+            return self.mixed_detail_page(photo_id)
+
+        image = f'/img/{photo_id}-large.jpg'
+        return (
+            '<html><head>'
+            f'<meta property="og:image" content="{image}">'
+            '</head><body>'
+            f'<h1>Foto {photo_id}</h1>'
+            f'{self.filler(photo_id)}'
+            f'<table><tr><td>Serviço Urbano: {100 + photo_id % 50} - Terminal Central / Centro</td></tr></table>'
+            f'<a href="{image}" data-lightbox="foto"><img src="/img/{photo_id}-medium.jpg" data-lightbox="foto"></a>'
+            '</body></html>'
+        )
+
+    def mixed_detail_page(self, photo_id):
+        (_, service), (image_layout, image) = self.layouts(photo_id)
+        meta = '' if image_layout == 'sem_imagem' else f'<meta property="og:image" content="/img/og/{photo_id}.jpg">'
+        # A marcação da imagem vem antes do serviço para não entrar no nome da linha
+        return (
+            f'<html><head>{meta}</head><body>'
+            f'<h1>Foto {photo_id}</h1>'
+            f'{self.filler(photo_id)}'
+            f'{image.format(n=photo_id)}'
+            f'<table><tr><td>{service.format(n=100 + photo_id % 50)}</td></tr></table>'
+            '</body></html>'
+        )
+
+    def filler(self, photo_id):
+        # Conteúdo irrelevante (comentários, menus, tabelas) até atingir page_size bytes
+        blocks = []
+        size = 0
+        n = 0
+        while size < self.page_size:
+            block = (
+                f'<div class="comentario"><span class="autor">Usuário {n}</span>'
+                f'<p>Foto {photo_id}: carroceria em ótimo estado, registrada na garagem {n % 17}.</p>'
+                f'<a href="/perfil/{n}">perfil</a></div>'
+            )
+            blocks.append(block)
+            size += len(block)
+            n += 1
+        return ''.join(blocks)
+
+    def image_bytes(self, photo_id):
+        # Com distinct_images, fotos diferentes repetem o mesmo conteúdo
+        if self.distinct_images:
+            photo_id = (photo_id - 1) % self.distinct_images + 1
+        data = self._image_cache.get(photo_id)
+        if data is None:
+            from PIL import Image
+
+            # A cada broken_every fotos o servidor devolve HTML no lugar da imagem,
+            # e a cada tiny_every fotos uma imagem menor que 100px
+            if self.broken_every and photo_id % self.broken_every == 0:
+                data = b'<html><body>Imagem removida</body></html>'
+                self._image_cache[photo_id] = data
+                return data
+            size = (40, 30) if self.tiny_every and photo_id % self.tiny_every == 0 else self.image_size
+
+            # Manchas e ruído sobre a cor de fundo: cada foto tem um hash
+            # perceptual próprio e o tamanho de uma foto de verdade (várias
+            # leituras de rede), então uma queda no meio do download deixa um
+            # .part com dados para retomar
+            rng = random.Random(photo_id)
+            color = (photo_id * 37 % 256, photo_id * 59 % 256, photo_id * 83 % 256)
+            blotches = Image.frombytes('L', (16, 12), rng.randbytes(16 * 12)).resize(size, Image.BILINEAR)
+            noise = Image.frombytes('L', size, rng.randbytes(size[0] * size[1]))
+            image = Image.blend(Image.new('RGB', size, color),
+                                Image.blend(blotches, noise, 0.3).convert('RGB'), 0.5)
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG')
+            data = buffer.getvalue()
+            self._image_cache[photo_id] = data
+        return data
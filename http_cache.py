@@ -0,0 +1,125 @@
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from crawl_journal import BatchedStore
+
+CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    encoding TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+'''
+
+
+class CacheEntry:
+    def __init__(self, url, etag, last_modified, content_type, encoding, body, fetched_at):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+        self.encoding = encoding
+        self.body = body
+        self.fetched_at = fetched_at
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def is_fresh(self, max_age):
+        return max_age > 0 and time.time() - self.fetched_at < max_age
+
+    def text(self):
+        return self.body.decode(self.encoding or 'utf-8', errors='replace')
+
+    def to_response(self):
+        # Resposta equivalente à original para quem lê .text, .content e .encoding
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response._content = self.body
+        response.encoding = self.encoding
+        response.headers = CaseInsensitiveDict({'Content-Type': self.content_type or 'text/html'})
+        return response
+
+
+class HttpCache(BatchedStore):
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, batch_size=200, flush_interval=2.0):
+        super().__init__(path, CACHE_SCHEMA, batch_size, flush_interval)
+        self.max_bytes = max_bytes
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        self.pending_urls = set()
+
+    def get(self, url):
+        with self.lock:
+            if url in self.pending_urls:
+                self._flush()
+                self.pending_urls.clear()
+            row = self.conn.execute(
+                'SELECT etag, last_modified, content_type, encoding, body, fetched_at FROM entries WHERE url = ?',
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._write('UPDATE entries SET accessed_at = ? WHERE url = ?', (time.time(), url))
+
+        etag, last_modified, content_type, encoding, body, fetched_at = row
+        return CacheEntry(url, etag, last_modified, content_type, encoding, zlib.decompress(body), fetched_at)
+
+    def put(self, url, body, etag=None, last_modified=None, content_type=None, encoding=None):
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+        with self.lock:
+            if url in self.pending_urls:
+                self._flush()
+                self.pending_urls.clear()
+            old = self.conn.execute('SELECT size FROM entries WHERE url = ?', (url,)).fetchone()
+            if old is not None:
+                self.total_bytes -= old[0]
+            self.total_bytes += len(compressed)
+            self.pending_urls.add(url)
+            self._write(
+                'INSERT OR REPLACE INTO entries '
+                '(url, etag, last_modified, content_type, encoding, body, size, fetched_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, content_type, encoding, compressed, len(compressed), now, now),
+            )
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def touch(self, url):
+        # Revalidação com 304: a entrada volta a contar como recém-baixada
+        with self.lock:
+            now = time.time()
+            self._write('UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+
+    def _evict(self):
+        # LRU: remove as entradas acessadas há mais tempo até caber em 90% do limite
+        self._flush()
+        self.pending_urls.clear()
+        target = self.max_bytes * 0.9
+        with self.conn:
+            while self.total_bytes > target:
+                rows = self.conn.execute(
+                    'SELECT url, size FROM entries ORDER BY accessed_at LIMIT 256').fetchall()
+                if not rows:
+                    break
+                for url, size in rows:
+                    if self.total_bytes <= target:
+                        break
+                    self.conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+                    self.total_bytes -= size
@@ -0,0 +1,144 @@
+import re
+
+# Estratégias de imagem em alta resolução, na ordem em que são tentadas
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+LIGHTBOX_SELECTORS = (
+    'img[data-lightbox]',
+    'img[data-fancybox]',
+    'a[data-lightbox] img',
+    'a[data-fancybox] img',
+)
+SCRIPT_IMAGE_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'["\']([^"\']*\.(?:jpg|jpeg|png|webp)[^"\']*)["\']',
+    r'image["\']?\s*:\s*["\']([^"\']*)["\']',
+    r'src["\']?\s*:\s*["\']([^"\']*)["\']',
+))
+MAIN_IMAGE_SELECTORS = (
+    'img.main-image',
+    'img.large-image',
+    'img.full-size',
+    '.image-container img',
+    '.main-content img',
+    '.photo-view img',
+    'img[src*="large"]',
+    'img[src*="full"]',
+    'img[src*="original"]',
+)
+DOWNLOAD_SELECTORS = (
+    'a[href*="download"]',
+    'a[href*="original"]',
+    'a[href*="full"]',
+    'a[href*="large"]',
+    '.download-link',
+    '.full-size-link',
+)
+META_SELECTORS = (
+    'meta[property="og:image"]',
+    'meta[name="twitter:image"]',
+    'meta[property="og:image:url"]',
+)
+
+# Os mesmos seletores decompostos em regras simples, para classificar cada
+# elemento numa única passada em vez de uma busca na árvore por seletor
+IMG_ATTR_RULES = (('data-lightbox', 'img[data-lightbox]'), ('data-fancybox', 'img[data-fancybox]'))
+IMG_CLASS_RULES = {'main-image': 'img.main-image', 'large-image': 'img.large-image', 'full-size': 'img.full-size'}
+IMG_SRC_RULES = (('large', 'img[src*="large"]'), ('full', 'img[src*="full"]'), ('original', 'img[src*="original"]'))
+ANCESTOR_CLASS_RULES = {
+    'image-container': '.image-container img',
+    'main-content': '.main-content img',
+    'photo-view': '.photo-view img',
+}
+ANCESTOR_LINK_RULES = (('data-lightbox', 'a[data-lightbox] img'), ('data-fancybox', 'a[data-fancybox] img'))
+HREF_RULES = (
+    ('download', 'a[href*="download"]'),
+    ('original', 'a[href*="original"]'),
+    ('full', 'a[href*="full"]'),
+    ('large', 'a[href*="large"]'),
+)
+CLASS_RULES = {'download-link': '.download-link', 'full-size-link': '.full-size-link'}
+META_RULES = (
+    ('property', 'og:image', 'meta[property="og:image"]'),
+    ('name', 'twitter:image', 'meta[name="twitter:image"]'),
+    ('property', 'og:image:url', 'meta[property="og:image:url"]'),
+)
+
+
+def _classes(tag):
+    classes = tag.get('class') or ()
+    if isinstance(classes, str):
+        classes = classes.split()
+    return classes
+
+
+class ImageCandidates:
+    # Percorre a árvore uma vez e guarda, para cada seletor, o primeiro
+    # elemento que casa com ele (o mesmo que soup.select_one devolveria),
+    # além dos scripts e da maior <img> com width e height
+    def __init__(self, soup):
+        self.first = {}
+        self.scripts = []
+        self.largest = None
+        self.largest_size = 0
+
+        for tag in soup.find_all(True):
+            name = tag.name
+            classes = _classes(tag)
+            for cls in classes:
+                selector = CLASS_RULES.get(cls)
+                if selector is not None and selector not in self.first:
+                    self.first[selector] = tag
+
+            if name == 'img':
+                self.add_img(tag, classes)
+            elif name == 'a':
+                href = tag.get('href')
+                if href is not None:
+                    for part, selector in HREF_RULES:
+                        if part in href and selector not in self.first:
+                            self.first[selector] = tag
+            elif name == 'meta':
+                for attr, value, selector in META_RULES:
+                    if tag.get(attr) == value and selector not in self.first:
+                        self.first[selector] = tag
+            elif name == 'script':
+                self.scripts.append(tag)
+
+    def add_img(self, img, classes):
+        first = self.first
+        for attr, selector in IMG_ATTR_RULES:
+            if attr in img.attrs and selector not in first:
+                first[selector] = img
+        for cls in classes:
+            selector = IMG_CLASS_RULES.get(cls)
+            if selector is not None and selector not in first:
+                first[selector] = img
+        src = img.get('src')
+        if src is not None:
+            for part, selector in IMG_SRC_RULES:
+                if part in src and selector not in first:
+                    first[selector] = img
+
+        for parent in img.parents:
+            if parent.name == 'a':
+                for attr, selector in ANCESTOR_LINK_RULES:
+                    if attr in parent.attrs and selector not in first:
+                        first[selector] = img
+            for cls in _classes(parent):
+                selector = ANCESTOR_CLASS_RULES.get(cls)
+                if selector is not None and selector not in first:
+                    first[selector] = img
+
+        src = src or img.get('data-src')
+        width = img.get('width')
+        height = img.get('height')
+        if src and width and height:
+            try:
+                size = int(width) * int(height)
+            except ValueError:
+                return
+            if size > self.largest_size:
+                self.largest_size = size
+                self.largest = src
+
+    def get(self, selector):
+        return self.first.get(selector)
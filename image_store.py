@@ -0,0 +1,226 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from crawl_journal import BatchedStore
+from crawl_log import CrawlLog
+
+STORE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    ext TEXT NOT NULL,
+    phash TEXT,
+    band0 INTEGER,
+    band1 INTEGER,
+    band2 INTEGER,
+    band3 INTEGER,
+    band4 INTEGER,
+    band5 INTEGER,
+    band6 INTEGER,
+    band7 INTEGER,
+    stored_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blobs_band0 ON blobs (band0) WHERE band0 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS blobs_band1 ON blobs (band1) WHERE band1 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS blobs_band2 ON blobs (band2) WHERE band2 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS blobs_band3 ON blobs (band3) WHERE band3 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS blobs_band4 ON blobs (band4) WHERE band4 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS blobs_band5 ON blobs (band5) WHERE band5 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS blobs_band6 ON blobs (band6) WHERE band6 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS blobs_band7 ON blobs (band7) WHERE band7 IS NOT NULL;
+CREATE TABLE IF NOT EXISTS urls (
+    image_url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS names (
+    filename TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    image_url TEXT NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+def perceptual_hash(path):
+    # dHash de 64 bits: compara pixels vizinhos de uma miniatura 9x8 em tons de cinza
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.draft('L', (64, 64))
+        pixels = list(image.convert('L').resize((9, 8)).getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            offset = row * 9 + col
+            value = value << 1 | (pixels[offset] > pixels[offset + 1])
+    return value
+
+
+def hash_bands(value):
+    return [(value >> shift) & 0xFF for shift in range(56, -1, -8)]
+
+
+class ImageStore(BatchedStore):
+    # Com até 7 bits de diferença, ao menos uma das 8 faixas de 8 bits do hash
+    # é idêntica, então a busca por quase-duplicatas usa só os índices das faixas
+    MAX_PHASH_DISTANCE = 7
+
+    def __init__(self, download_dir, perceptual=False, phash_distance=5,
+                 batch_size=200, flush_interval=2.0, log=None):
+        self.download_dir = download_dir
+        self.log = log or CrawlLog()
+        self.root = os.path.join(download_dir, '.store')
+        self.blob_dir = os.path.join(self.root, 'blobs')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        super().__init__(os.path.join(self.root, 'index.db'), STORE_SCHEMA, batch_size, flush_interval)
+
+        self.perceptual = perceptual
+        self.phash_distance = min(phash_distance, self.MAX_PHASH_DISTANCE)
+
+        # Nada é carregado na abertura: consultas vão à chave primária do SQLite
+        # e só o que foi gravado nesta execução fica em memória
+        self.session_urls = {}
+        self.session_blobs = {}
+        self.session_names = {}
+        self.active_temps = set()
+
+    def _lookup(self, cache, sql, key):
+        value = cache.get(key)
+        if value is not None:
+            return value
+        row = self.conn.execute(sql, (key,)).fetchone()
+        return row[0] if row else None
+
+    def url_digest(self, image_url):
+        with self.lock:
+            return self._lookup(self.session_urls, 'SELECT sha256 FROM urls WHERE image_url = ?', image_url)
+
+    def blob_ext(self, digest):
+        return self._lookup(self.session_blobs, 'SELECT ext FROM blobs WHERE sha256 = ?', digest)
+
+    def name_digest(self, filename):
+        return self._lookup(self.session_names, 'SELECT sha256 FROM names WHERE filename = ?', filename)
+
+    def blob_path(self, digest, ext):
+        return os.path.join(self.blob_dir, digest[:2], digest + ext)
+
+    def temp_path(self, image_url):
+        # O nome vem da URL: um .part interrompido é retomado na próxima
+        # execução. Se outra thread já baixa a mesma URL, usa um nome único
+        path = os.path.join(self.blob_dir, f"download_{hashlib.sha1(image_url.encode('utf-8')).hexdigest()}.tmp")
+        with self.lock:
+            if path not in self.active_temps:
+                self.active_temps.add(path)
+                return path
+        fd, path = tempfile.mkstemp(prefix='download_', suffix='.tmp', dir=self.blob_dir)
+        os.close(fd)
+        return path
+
+    def release_temp(self, temp_path):
+        with self.lock:
+            if temp_path in self.active_temps:
+                self.active_temps.remove(temp_path)
+                return
+        for path in (temp_path, temp_path + '.part'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _link(self, blob_path, filepath):
+        try:
+            os.link(blob_path, filepath)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(blob_path, filepath)
+
+    def find_similar(self, phash):
+        bands = hash_bands(phash)
+        self._flush()
+        rows = self.conn.execute(
+            'SELECT sha256, phash FROM blobs WHERE ' + ' OR '.join(f'band{i} = ?' for i in range(8)),
+            bands,
+        )
+        for digest, other in rows:
+            if bin(phash ^ int(other, 16)).count('1') <= self.phash_distance:
+                return digest
+        return None
+
+    def existing_name(self, digest):
+        self._flush()
+        row = self.conn.execute('SELECT filename FROM names WHERE sha256 = ? LIMIT 1', (digest,)).fetchone()
+        return row[0] if row else digest
+
+    # Registra um arquivo baixado em temp_path. Retorna (True, nome) se é uma
+    # imagem nova, ou (False, nome existente) se é duplicata exata ou visual.
+    def add(self, temp_path, image_url, filename):
+        # O hash é calculado sobre o arquivo completo, já que o download
+        # pode ter sido retomado em várias partes
+        digest = hashlib.sha256()
+        with open(temp_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        digest = digest.hexdigest()
+
+        phash = None
+        if self.perceptual:
+            try:
+                phash = perceptual_hash(temp_path)
+            except Exception as e:
+                self.log.warning(f"Não foi possível calcular o hash perceptual de {filename}: {e}")
+            # Imagens lisas (hash zerado) seriam todas "parecidas" entre si
+            if phash == 0:
+                phash = None
+
+        stem, ext = os.path.splitext(filename)
+        with self.lock:
+            # O blob no disco aparece antes do índice de outro processo ser gravado
+            known = self.blob_ext(digest) is not None or os.path.exists(self.blob_path(digest, ext))
+            duplicate = digest if known else None
+            if duplicate is None and phash is not None:
+                duplicate = self.find_similar(phash)
+
+            if duplicate is not None:
+                os.remove(temp_path)
+                self.session_urls[image_url] = duplicate
+                self._write('INSERT OR REPLACE INTO urls (image_url, sha256) VALUES (?, ?)',
+                            (image_url, duplicate))
+                return False, self.existing_name(duplicate)
+
+            blob_path = self.blob_path(digest, ext)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(temp_path, blob_path)
+
+            # Nome legível já usado por outra imagem (ou por um arquivo antigo
+            # fora do store) ganha o prefixo do hash para não sobrescrevê-la
+            filepath = os.path.join(self.download_dir, filename)
+            if self.name_digest(filename) is not None or os.path.exists(filepath):
+                filename = f"{stem}_{digest[:8]}{ext}"
+                filepath = os.path.join(self.download_dir, filename)
+            try:
+                os.link(blob_path, filepath)
+            except FileExistsError:
+                # Outro processo gravando no mesmo diretório criou o nome entre
+                # a verificação e o link: usa o nome com o hash
+                filename = f"{stem}_{digest[:8]}{ext}"
+                filepath = os.path.join(self.download_dir, filename)
+                self._link(blob_path, filepath)
+            except OSError:
+                shutil.copyfile(blob_path, filepath)
+
+            bands = hash_bands(phash) if phash is not None else [None] * 8
+            self.session_blobs[digest] = ext
+            self.session_urls[image_url] = digest
+            self.session_names[filename] = digest
+            self._write(
+                'INSERT OR REPLACE INTO blobs (sha256, size, ext, phash, band0, band1, band2, band3, '
+                'band4, band5, band6, band7, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (digest, os.path.getsize(blob_path), ext,
+                 f"{phash:016x}" if phash is not None else None, *bands, time.time()),
+            )
+            self._write('INSERT OR REPLACE INTO urls (image_url, sha256) VALUES (?, ?)', (image_url, digest))
+            self._write('INSERT OR REPLACE INTO names (filename, sha256, image_url) VALUES (?, ?, ?)',
+                        (filename, digest, image_url))
+            return True, filename
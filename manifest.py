@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import sqlite3
+
+from crawl_journal import BatchedStore
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+MANIFEST_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+    offset INTEGER PRIMARY KEY,
+    length INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    line_number TEXT,
+    bus_name TEXT
+);
+CREATE INDEX IF NOT EXISTS records_line ON records (line_number);
+CREATE INDEX IF NOT EXISTS records_filename ON records (filename);
+'''
+
+
+def manifest_index_path(path):
+    return os.path.splitext(path)[0] + '.db'
+
+
+def _index_row(offset, length, record):
+    line_number = record.get('line_number')
+    return (offset, length, record['filename'],
+            str(line_number) if line_number is not None else None, record.get('bus_name'))
+
+
+def _read_lines(path, start):
+    # (posição, linha) de cada linha completa a partir de start; uma última
+    # linha sem '\n' é uma escrita interrompida e fica de fora
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if not line.endswith(b'\n'):
+                return
+            yield offset, line
+            offset += len(line)
+
+
+class ManifestWriter(BatchedStore):
+    # Manifesto só de acréscimo, um registro JSON por imagem baixada. O índice
+    # SQLite ao lado guarda a posição de cada linha; um só processo escreve
+    # em cada manifesto.
+    def __init__(self, path, buffer_size=65536, batch_size=200, flush_interval=2.0):
+        super().__init__(manifest_index_path(path), MANIFEST_SCHEMA, batch_size, flush_interval)
+        self.manifest_path = path
+        self.catch_up()
+        self.file = open(path, 'ab', buffering=buffer_size)
+        self.offset = self.file.tell()
+
+    def catch_up(self):
+        # Indexa o que foi gravado no JSONL depois do último lote do índice
+        # (queda entre os dois) e corta uma linha escrita pela metade
+        end = self.conn.execute('SELECT COALESCE(MAX(offset + length), 0) FROM records').fetchone()[0]
+        size = os.path.getsize(self.manifest_path) if os.path.exists(self.manifest_path) else 0
+        if end > size:
+            # JSONL trocado ou truncado por fora: o índice é refeito do zero
+            with self.conn:
+                self.conn.execute('DELETE FROM records')
+            end = 0
+
+        rows = []
+        for offset, line in _read_lines(self.manifest_path, end):
+            try:
+                rows.append(_index_row(offset, len(line), json.loads(line)))
+            except (ValueError, KeyError):
+                pass
+            end = offset + len(line)
+        if rows:
+            with self.conn:
+                self.conn.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)', rows)
+        if end < size:
+            with open(self.manifest_path, 'r+b') as f:
+                f.truncate(end)
+
+    def append(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            offset = self.offset
+            self.file.write(line)
+            self.offset += len(line)
+            self._write('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)',
+                        _index_row(offset, len(line), record))
+
+    def _flush(self):
+        # O JSONL vai para o disco antes do índice, que nunca aponta para
+        # uma linha ainda no buffer
+        self.file.flush()
+        super()._flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class Manifest:
+    # Leitura do manifesto: as consultas vão ao índice e leem só as linhas
+    # necessárias. O trecho ainda não indexado (crawl em andamento) é lido
+    # direto do JSONL.
+    def __init__(self, path):
+        # Consulta não cria nada: um caminho errado é um erro, não um manifesto vazio
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Manifesto não encontrado: {path}")
+        self.path = path
+        if not os.path.exists(manifest_index_path(path)):
+            ManifestWriter(path).close()
+        self.conn = sqlite3.connect(manifest_index_path(path))
+
+    def indexed_end(self):
+        return self.conn.execute('SELECT COALESCE(MAX(offset + length), 0) FROM records').fetchone()[0]
+
+    def tail(self):
+        for _, line in _read_lines(self.path, self.indexed_end()):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                pass
+
+    def read(self, rows):
+        records = []
+        with open(self.path, 'rb') as f:
+            for offset, length in rows:
+                f.seek(offset)
+                records.append(json.loads(f.read(length)))
+        return records
+
+    def by_line(self, line_number):
+        line_number = str(line_number)
+        rows = self.conn.execute(
+            'SELECT offset, length FROM records WHERE line_number = ? ORDER BY offset', (line_number,)).fetchall()
+        records = self.read(rows)
+        records.extend(r for r in self.tail() if str(r.get('line_number')) == line_number)
+        return records
+
+    def by_filename(self, filename):
+        rows = self.conn.execute(
+            'SELECT offset, length FROM records WHERE filename = ? ORDER BY offset DESC LIMIT 1',
+            (filename,)).fetchall()
+        matches = [r for r in self.tail() if r['filename'] == filename]
+        if matches:
+            return matches[-1]
+        return self.read(rows)[0] if rows else None
+
+    def lines(self):
+        counts = dict(self.conn.execute(
+            'SELECT line_number, COUNT(*) FROM records GROUP BY line_number ORDER BY line_number'))
+        for record in self.tail():
+            key = record.get('line_number')
+            key = str(key) if key is not None else None
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM records').fetchone()[0] + sum(1 for _ in self.tail())
+
+    def __iter__(self):
+        for _, line in _read_lines(self.path, 0):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                pass
+
+    def close(self):
+        self.conn.close()
+
+
+def export_columnar(manifest_path, output_path, batch_size=10000):
+    # Parquet em lotes: o manifesto nunca é carregado inteiro na memória
+    if pyarrow is None:
+        raise RuntimeError("A exportação colunar requer o pacote pyarrow (pip install pyarrow)")
+
+    schema = pyarrow.schema([
+        ('filename', pyarrow.string()),
+        ('line_number', pyarrow.string()),
+        ('bus_name', pyarrow.string()),
+        ('page_url', pyarrow.string()),
+        ('image_url', pyarrow.string()),
+        ('size', pyarrow.int64()),
+        ('sha256', pyarrow.string()),
+        ('downloaded_at', pyarrow.float64()),
+    ])
+    manifest = Manifest(manifest_path)
+    count = 0
+    try:
+        with pyarrow.parquet.ParquetWriter(output_path, schema) as writer:
+            batch = []
+            for record in manifest:
+                line_number = record.get('line_number')
+                record['line_number'] = str(line_number) if line_number is not None else None
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    writer.write_batch(pyarrow.RecordBatch.from_pylist(batch, schema))
+                    count += len(batch)
+                    batch = []
+            if batch:
+                writer.write_batch(pyarrow.RecordBatch.from_pylist(batch, schema))
+                count += len(batch)
+    finally:
+        manifest.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta e exportação do manifesto de imagens baixadas")
+    parser.add_argument('command', choices=['lines', 'line', 'export'])
+    parser.add_argument('manifest', help="arquivo JSONL do manifesto (ex.: onibus_images_manifest.jsonl)")
+    parser.add_argument('value', nargs='?', help="número da linha (line) ou arquivo Parquet de saída (export)")
+    args = parser.parse_args()
+    if not os.path.exists(args.manifest):
+        parser.error(f"manifesto não encontrado: {args.manifest}")
+
+    if args.command == 'export':
+        if not args.value:
+            parser.error("export requer o arquivo de saída")
+        count = export_columnar(args.manifest, args.value)
+        print(f"📦 {count} registros exportados para {args.value}")
+        return
+
+    manifest = Manifest(args.manifest)
+    try:
+        if args.command == 'lines':
+            for line_number, count in manifest.lines().items():
+                print(f"{line_number}: {count} imagens")
+        else:
+            if not args.value:
+                parser.error("line requer o número da linha")
+            for record in manifest.by_line(args.value):
+                print(json.dumps(record, ensure_ascii=False))
+    finally:
+        manifest.close()
+
+
+if __name__ == "__main__":
+    main()
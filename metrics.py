@@ -0,0 +1,248 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites dos buckets em segundos, no estilo dos histogramas do Prometheus
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        # Estimativa pelo limite superior do bucket onde cai o quantil
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'avg': round(self.sum / self.count, 6) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+    def __init__(self, profile_stages=()):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.histograms = {}
+        self.in_flight = {}
+        self.bytes = {}
+        self.counters = {}
+        self.gauges = {}
+
+        self.profile_stages = set(profile_stages)
+        self.profiles = {}
+        self.profiling = False
+
+    @contextmanager
+    def stage(self, name):
+        with self.lock:
+            self.in_flight[name] = self.in_flight.get(name, 0) + 1
+        profiler = None
+        start = time.perf_counter()
+        try:
+            profiler = self._start_profile(name)
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                self._stop_profile(name, profiler)
+            with self.lock:
+                self.in_flight[name] -= 1
+                self._histogram(name).observe(elapsed)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self._histogram(name).observe(seconds)
+
+    def add_bytes(self, name, count):
+        with self.lock:
+            self.bytes[name] = self.bytes.get(name, 0) + count
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, read):
+        self.gauges[name] = read
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def _start_profile(self, name):
+        # Um único perfilador no processo: desde o Python 3.12 o cProfile não
+        # aceita dois ativos ao mesmo tempo. Enquanto uma execução é perfilada,
+        # as das outras threads (e os estágios aninhados) rodam sem perfil
+        if name not in self.profile_stages:
+            return None
+        with self.lock:
+            if self.profiling:
+                return None
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Outra ferramenta de profiling já está ativa
+                return None
+            self.profiling = True
+        return profiler
+
+    def _stop_profile(self, name, profiler):
+        profiler.disable()
+        with self.lock:
+            self.profiling = False
+            stats = self.profiles.get(name)
+            if stats is None:
+                self.profiles[name] = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+
+    def snapshot(self, counters=None):
+        elapsed = time.monotonic() - self.started
+        with self.lock:
+            stages = {}
+            for name in sorted(set(self.histograms) | set(self.in_flight) | set(self.bytes)):
+                info = self.histograms[name].summary() if name in self.histograms else {'count': 0}
+                info['in_flight'] = self.in_flight.get(name, 0)
+                if name in self.bytes:
+                    info['bytes'] = self.bytes[name]
+                    info['bytes_per_sec'] = round(self.bytes[name] / elapsed) if elapsed else 0
+                stages[name] = info
+            all_counters = dict(counters or {})
+            all_counters.update(self.counters)
+
+        return {
+            'elapsed': round(elapsed, 3),
+            'stages': stages,
+            'counters': all_counters,
+            'gauges': {name: read() for name, read in self.gauges.items()},
+        }
+
+    def prometheus(self, counters=None):
+        snapshot_counters = dict(counters or {})
+        lines = ['# TYPE buscrawl_stage_seconds histogram']
+        with self.lock:
+            snapshot_counters.update(self.counters)
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'buscrawl_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'buscrawl_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'buscrawl_stage_seconds_sum{{stage="{name}"}} {histogram.sum}')
+                lines.append(f'buscrawl_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+
+            lines.append('# TYPE buscrawl_stage_in_flight gauge')
+            for name, value in sorted(self.in_flight.items()):
+                lines.append(f'buscrawl_stage_in_flight{{stage="{name}"}} {value}')
+
+            lines.append('# TYPE buscrawl_stage_bytes_total counter')
+            for name, value in sorted(self.bytes.items()):
+                lines.append(f'buscrawl_stage_bytes_total{{stage="{name}"}} {value}')
+
+        lines.append('# TYPE buscrawl_events_total counter')
+        for name, value in sorted(snapshot_counters.items()):
+            lines.append(f'buscrawl_events_total{{event="{name}"}} {value}')
+
+        lines.append('# TYPE buscrawl_gauge gauge')
+        for name, read in sorted(self.gauges.items()):
+            lines.append(f'buscrawl_gauge{{name="{name}"}} {read()}')
+        return '\n'.join(lines) + '\n'
+
+    def dump_profiles(self, directory):
+        paths = []
+        with self.lock:
+            profiles = dict(self.profiles)
+        for name, stats in profiles.items():
+            path = os.path.join(directory, f"profile_{name}.prof")
+            stats.dump_stats(path)
+            paths.append(path)
+        return paths
+
+
+class MetricsReporter:
+    def __init__(self, read_snapshot, read_prometheus, interval=None, port=None, host='127.0.0.1', write=print):
+        self.read_snapshot = read_snapshot
+        self.write = write
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.server = None
+
+        if port is not None:
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path != '/metrics':
+                        self.send_error(404)
+                        return
+                    body = read_prometheus().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((host, port), Handler)
+            self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        if self.server is None:
+            return None
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        if self.server is not None:
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        if self.interval:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.emit()
+
+    def emit(self):
+        self.write("📊 " + json.dumps(self.read_snapshot(), ensure_ascii=False))
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
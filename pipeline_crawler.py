@@ -0,0 +1,180 @@
+import threading
+from queue import Queue
+
+from bus_crawler import BusCrawler
+
+_STOP = object()
+
+
+class _PageState:
+    def __init__(self, page_num, url, total):
+        self.page_num = page_num
+        self.url = url
+        self.total = total
+        self.results = {}
+        self.next_position = 0
+        self.seq_num = 0
+        self.pending = total
+        self.downloaded = 0
+
+
+class PipelineBusCrawler(BusCrawler):
+    def __init__(self, base_url, download_dir="images", max_workers=8,
+                 resolve_workers=None, download_workers=None, queue_size=None, window=None, **options):
+        super().__init__(base_url, download_dir, max_workers, **options)
+        self.resolve_workers = resolve_workers or max_workers
+        self.download_workers = download_workers or max_workers
+        self.queue_size = queue_size or max_workers * 2
+        self.window = window or max_workers * 8
+
+        self.page_lock = threading.Lock()
+        self.pages = {}
+
+    def listing_stage(self, frontier, max_pages):
+        total_images = 0
+
+        while True:
+            page = frontier.next_page(max_pages)
+            if page is None:
+                break
+            current_url, page_num = page
+
+            self.log.info(f"\nProcessando página {page_num}: {current_url}")
+
+            collect_pagination = frontier.wants_more(max_pages)
+            links = self.fetch_listing_page(current_url, collect_pagination)
+            if links is None:
+                continue
+
+            image_links, pagination_urls = links
+            self.log.info(f"Encontrados {len(image_links)} links de imagens na página {page_num}")
+            total_images += len(image_links)
+            image_links = self.filter_new_links(image_links)
+
+            if self.should_stop_paginating(image_links):
+                frontier.stop()
+            else:
+                for url in frontier.add(pagination_urls):
+                    self.log.info(f"🔗 Nova página encontrada: {url}")
+
+            if image_links:
+                with self.page_lock:
+                    self.pages[page_num] = _PageState(page_num, current_url, len(image_links))
+
+                for position, image_link in enumerate(image_links):
+                    # A janela limita itens em trânsito entre os estágios (backpressure)
+                    self.window_slots.acquire()
+                    self.resolve_queue.put((page_num, position, image_link))
+            else:
+                frontier.finish(current_url)
+                self.log.info(f"✅ Página {page_num} concluída: 0 imagens baixadas em alta resolução")
+
+        return total_images
+
+    def resolve_stage(self):
+        while True:
+            item = self.resolve_queue.get()
+            if item is _STOP:
+                return
+
+            page_num, position, image_link = item
+            try:
+                result = self.get_high_res_image_url(image_link)
+            except Exception as e:
+                self.log.error(f"Erro no processamento: {e}")
+                result = None
+
+            for ready in self.collect_ready(page_num, position, result):
+                self.download_queue.put(ready)
+
+    def collect_ready(self, page_num, position, result):
+        ready = []
+        finished = []
+
+        with self.page_lock:
+            state = self.pages[page_num]
+            state.results[position] = result
+
+            # Numeração só avança sobre o prefixo contíguo já resolvido,
+            # mantendo a mesma ordem do modo em fases
+            while state.next_position in state.results:
+                image_data = state.results.pop(state.next_position)
+                state.next_position += 1
+                if image_data:
+                    state.seq_num += 1
+                    index = self.page_base_index(page_num) + state.seq_num
+                    ready.append((page_num, image_data, index))
+                else:
+                    finished.append(page_num)
+
+        for page in finished:
+            self.finish_item(page, None)
+
+        return ready
+
+    def download_stage(self):
+        while True:
+            item = self.download_queue.get()
+            if item is _STOP:
+                return
+
+            page_num, image_data, index = item
+            filename = self.download_validated_image(image_data, index)
+            self.finish_item(page_num, filename)
+
+    def finish_item(self, page_num, filename):
+        self.window_slots.release()
+
+        with self.page_lock:
+            state = self.pages[page_num]
+            state.pending -= 1
+            if filename:
+                state.downloaded += 1
+                self.downloaded_total += 1
+            done = state.pending == 0
+            if done:
+                del self.pages[page_num]
+
+        if done:
+            self.frontier.finish(state.url)
+            self.log.info(f"✅ Página {page_num} concluída: {state.downloaded} imagens baixadas em alta resolução")
+
+    def crawl_website(self, start_url, max_pages=None):
+        print(f"Iniciando crawler em pipeline para: {start_url}")
+
+        self.reset_stats()
+        self.frontier = self.open_frontier(start_url)
+        self.pages = {}
+        self.downloaded_total = 0
+        self.resolve_queue = Queue(maxsize=self.queue_size)
+        self.download_queue = Queue(maxsize=self.queue_size)
+        self.window_slots = threading.Semaphore(self.window)
+        self.metrics.gauge('resolve_queue', self.resolve_queue.qsize)
+        self.metrics.gauge('download_queue', self.download_queue.qsize)
+        self.metrics.gauge('pages_in_flight', lambda: len(self.pages))
+        completed = False
+
+        resolvers = [threading.Thread(target=self.resolve_stage, daemon=True)
+                     for _ in range(self.resolve_workers)]
+        downloaders = [threading.Thread(target=self.download_stage, daemon=True)
+                       for _ in range(self.download_workers)]
+        for thread in resolvers + downloaders:
+            thread.start()
+
+        try:
+            total_images = self.listing_stage(self.frontier, max_pages)
+            completed = True
+        finally:
+            for _ in resolvers:
+                self.resolve_queue.put(_STOP)
+            for thread in resolvers:
+                thread.join()
+            for _ in downloaders:
+                self.download_queue.put(_STOP)
+            for thread in downloaders:
+                thread.join()
+            if completed:
+                self.finish_run(self.frontier)
+            self.close_stores()
+
+        self.print_summary(self.frontier.page_count, total_images, self.downloaded_total)
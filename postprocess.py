@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue
+
+from crawl_journal import BatchedStore
+from crawl_log import CrawlLog
+
+POSTPROCESS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS images (
+    filename TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    format TEXT,
+    thumbnail TEXT,
+    webp TEXT,
+    processed_at REAL NOT NULL
+) WITHOUT ROWID;
+'''
+
+# Mesma regra de is_valid_image_link: menos de 100px em um dos lados não é foto
+MIN_IMAGE_SIZE = 100
+
+_STOP = object()
+
+
+def _save(image, path, format, **params):
+    # Grava ao lado e renomeia: quem lê o diretório nunca vê arquivo pela metade
+    temp_path = path + '.tmp'
+    image.save(temp_path, format, **params)
+    os.replace(temp_path, path)
+
+
+def _init_worker():
+    from PIL import Image  # noqa: F401
+
+
+def _ready(_):
+    return True
+
+
+def process_image(path, thumb_dir, webp_dir, thumb_size, webp_quality, min_size=MIN_IMAGE_SIZE):
+    # Roda num processo do pool: decodifica, confere o tamanho e grava as variantes
+    from PIL import Image
+
+    filename = os.path.basename(path)
+    stem = os.path.splitext(filename)[0]
+    result = {'filename': filename, 'path': path, 'status': 'ok', 'width': None, 'height': None,
+              'format': None, 'thumbnail': None, 'webp': None, 'error': None}
+    try:
+        with Image.open(path) as image:
+            image.verify()
+        with Image.open(path) as image:
+            image.load()
+            result.update(width=image.width, height=image.height, format=image.format)
+            if image.width < min_size or image.height < min_size:
+                result['status'] = 'too_small'
+                return result
+
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+
+            result['webp'] = os.path.join(webp_dir, stem + '.webp')
+            _save(image, result['webp'], 'WEBP', quality=webp_quality)
+
+            image.thumbnail((thumb_size, thumb_size))
+            result['thumbnail'] = os.path.join(thumb_dir, stem + '.jpg')
+            _save(image, result['thumbnail'], 'JPEG', quality=85)
+    except Exception as e:
+        result['status'] = 'invalid'
+        result['error'] = str(e)
+    return result
+
+
+class PostProcessIndex(BatchedStore):
+    def __init__(self, path, batch_size=200, flush_interval=2.0):
+        super().__init__(path, POSTPROCESS_SCHEMA, batch_size, flush_interval)
+
+    def record(self, result):
+        with self.lock:
+            self._write(
+                'INSERT OR REPLACE INTO images '
+                '(filename, status, width, height, format, thumbnail, webp, processed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (result['filename'], result['status'], result['width'], result['height'], result['format'],
+                 result['thumbnail'], result['webp'], time.time()),
+            )
+
+
+class PostProcessor:
+    # Estágio depois do download. Quem baixa só enfileira o caminho, sem nunca
+    # bloquear. Uma thread alimenta o pool de processos com no máximo
+    # max_pending imagens em andamento, e o resto espera na fila.
+    def __init__(self, output_dir, processes=1, max_pending=None, thumb_size=256, webp_quality=80,
+                 drop_invalid=True, log=None):
+        self.output_dir = output_dir
+        self.log = log or CrawlLog()
+        self.thumb_dir = os.path.join(output_dir, 'thumbs')
+        self.webp_dir = os.path.join(output_dir, 'webp')
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        os.makedirs(self.webp_dir, exist_ok=True)
+        self.thumb_size = thumb_size
+        self.webp_quality = webp_quality
+        self.drop_invalid = drop_invalid
+
+        self.index = PostProcessIndex(os.path.join(output_dir, 'images.db'))
+        processes = max(processes, 1)
+        from bus_crawler import process_context
+        self.pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                        mp_context=process_context())
+        # Sobe todos os processos agora: a partida (e o import do Pillow) não
+        # atrasa as primeiras imagens
+        list(self.pool.map(_ready, range(processes)))
+        self.slots = threading.Semaphore(max_pending or processes * 4)
+        self.paths = Queue()
+        self.lock = threading.Lock()
+        self.counts = {'ok': 0, 'invalid': 0, 'too_small': 0}
+        self.feeder = threading.Thread(target=self.feed, daemon=True)
+        self.feeder.start()
+
+    def submit(self, path, callback=None):
+        # callback(resultado) roda depois do registro e do descarte; com
+        # None se o processamento falhou e o arquivo ficou intacto
+        self.paths.put((path, callback))
+
+    def backlog(self):
+        return self.paths.qsize()
+
+    def feed(self):
+        while True:
+            item = self.paths.get()
+            if item is _STOP:
+                return
+            path, callback = item
+            self.slots.acquire()
+            future = self.pool.submit(process_image, path, self.thumb_dir, self.webp_dir,
+                                      self.thumb_size, self.webp_quality)
+            future.add_done_callback(lambda future, callback=callback: self.finished(future, callback))
+
+    def finished(self, future, callback=None):
+        result = None
+        try:
+            result = future.result()
+            self.record(result)
+        except Exception as e:
+            self.log.error(f"Erro no pós-processamento: {e}")
+            result = None
+        try:
+            if callback is not None:
+                callback(result)
+        except Exception as e:
+            self.log.error(f"Erro no pós-processamento: {e}")
+        finally:
+            self.slots.release()
+
+    def record(self, result):
+        self.index.record(result)
+        with self.lock:
+            self.counts[result['status']] += 1
+
+        if result['status'] != 'ok' and self.drop_invalid:
+            reason = 'não é uma imagem válida' if result['status'] == 'invalid' else 'pequena demais'
+            try:
+                os.remove(result['path'])
+            except FileNotFoundError:
+                pass
+            self.log.image(f"🗑 Descartada ({reason}): {result['filename']}")
+
+    def close(self):
+        # Espera todo o backlog: o crawl só termina com as variantes gravadas
+        self.paths.put(_STOP)
+        self.feeder.join()
+        self.pool.shutdown(wait=True)
+        self.index.close()
+        return dict(self.counts)
@@ -0,0 +1,222 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Respostas que indicam sobrecarga do servidor: reduzem a concorrência do host
+OVERLOAD_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class HostLimiter:
+    def __init__(self, initial, minimum, maximum, target_latency, rate=None, burst=None,
+                 adaptive=True, decrease_factor=0.5):
+        self.limit = float(initial)
+        self.adaptive = adaptive
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.waiters = []
+
+        self.in_flight = 0
+        self.latency = None
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.successes = 0
+        self.overloads = 0
+        self.errors = 0
+
+    def try_acquire(self):
+        # 0.0 com a vaga reservada; senão o tempo até o fim do Retry-After ou a
+        # reposição do token bucket, ou None com o host no limite
+        with self.lock:
+            return self._reserve(time.monotonic())
+
+    def _reserve(self, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        if self.bucket is not None:
+            wait = self.bucket.reserve(now)
+            if wait:
+                return wait
+        self.in_flight += 1
+        return 0.0
+
+    def acquire(self):
+        # No limite a thread dorme na condição até um release ou um aumento do
+        # limite; só o Retry-After e o token bucket são esperados com timeout
+        with self.changed:
+            while True:
+                wait = self._reserve(time.monotonic())
+                if wait == 0.0:
+                    return
+                self.changed.wait(wait)
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.lock:
+                wait = self._reserve(time.monotonic())
+                if wait == 0.0:
+                    return
+                woken = loop.create_future()
+                self.waiters.append((loop, woken))
+            try:
+                await asyncio.wait({woken}, timeout=wait)
+            finally:
+                with self.lock:
+                    if (loop, woken) in self.waiters:
+                        self.waiters.remove((loop, woken))
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+            self._notify()
+
+    def _notify(self, everyone=False):
+        # Chamado com o lock: acorda as threads e as corrotinas à espera de vaga
+        if everyone:
+            self.changed.notify_all()
+        else:
+            self.changed.notify()
+        for loop, woken in self.waiters:
+            loop.call_soon_threadsafe(_wake, woken)
+        self.waiters.clear()
+
+    def observe(self, latency, status=None, retry_after=None, error=False):
+        with self.lock:
+            now = time.monotonic()
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+            if error or status in OVERLOAD_STATUSES:
+                if error:
+                    self.errors += 1
+                else:
+                    self.overloads += 1
+                self._decrease(now, self.decrease_factor)
+                return
+
+            self.successes += 1
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if self.latency > self.target_latency:
+                self._decrease(now, 0.9)
+            elif self.adaptive and self.in_flight >= int(self.limit) - 1:
+                # Aumento aditivo: cerca de +1 por "janela" de respostas, e só
+                # quando o limite atual está de fato sendo usado
+                limit = int(self.limit)
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+                if int(self.limit) > limit:
+                    self._notify(everyone=True)
+
+    def _decrease(self, now, factor):
+        if not self.adaptive:
+            return
+        # No máximo uma redução por intervalo de latência, como no TCP,
+        # para que uma rajada de 429 não derrube o limite até o mínimo
+        window = self.latency or self.target_latency
+        if now - self.last_decrease < window:
+            return
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit * factor)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'latency': round(self.latency, 4) if self.latency is not None else None,
+                'successes': self.successes,
+                'overloads': self.overloads,
+                'errors': self.errors,
+            }
+
+
+class RateController:
+    def __init__(self, initial=4, minimum=1, maximum=64, target_latency=1.0,
+                 rate=None, burst=None, adaptive=True, max_attempts=4,
+                 backoff_base=0.5, backoff_cap=30.0):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.rate = rate
+        self.burst = burst
+        self.adaptive = adaptive
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            limiter = self.hosts.get(host)
+            if limiter is None:
+                limiter = HostLimiter(self.initial, self.minimum, self.maximum, self.target_latency,
+                                      self.rate, self.burst, self.adaptive)
+                self.hosts[host] = limiter
+            return limiter
+
+    def acquire(self, url):
+        limiter = self.limiter(url)
+        limiter.acquire()
+        return limiter
+
+    async def acquire_async(self, url):
+        limiter = self.limiter(url)
+        await limiter.acquire_async()
+        return limiter
+
+    def backoff(self, attempt, retry_after=None):
+        # Backoff exponencial com "full jitter"; Retry-After é o piso
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def snapshot(self):
+        with self.lock:
+            hosts = dict(self.hosts)
+        return {host: limiter.snapshot() for host, limiter in hosts.items()}
@@ -0,0 +1,139 @@
+import re
+
+NAME_CHARS = r'[A-ZÀ-ÿÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ/\s\-\.]'
+LINE = r'([A-Z]?\d+[A-Z]?)\s*-\s*(' + NAME_CHARS + r'+)'
+
+# Uma única varredura localiza todas as âncoras possíveis dos padrões.
+# As palavras não se sobrepõem entre si, então nenhuma ocorrência se perde.
+# Sem grupos nomeados o sre usa o prefixo de caracteres para pular o texto,
+# e a palavra é identificada pela primeira letra.
+TOKENS = re.compile(r'Serviço|Urbano|INTER\s+\d+|Tipo|Linha', re.IGNORECASE)
+# Varrer o texto em minúsculas sem IGNORECASE é bem mais rápido e equivalente,
+# exceto para os únicos caracteres cujo case folding difere de lower()
+# nessas palavras (ou que mudam de tamanho ao virar minúsculos).
+TOKENS_LOWER = re.compile(r'serviço|urbano|inter\s+\d+|tipo|linha')
+CASE_FOLD_SPECIAL = re.compile('[\u0130\u0131\u017f]')
+
+TOKEN_KINDS = {
+    's': 'servico', 'S': 'servico', '\u017f': 'servico',
+    'u': 'urbano', 'U': 'urbano',
+    'i': 'inter', 'I': 'inter', '\u0130': 'inter', '\u0131': 'inter',
+    't': 'tipo', 'T': 'tipo',
+    'l': 'linha', 'L': 'linha',
+}
+
+SERVICO_INTER = re.compile(r'Serviço\s+Urbano:?\s*(INTER\s+\d+)', re.IGNORECASE)
+URBANO_INTER = re.compile(r'Urbano:?\s*(INTER\s+\d+)', re.IGNORECASE)
+SERVICO_LINE = re.compile(r'Serviço\s+Urbano:\s*' + LINE, re.IGNORECASE)
+URBANO_LINE = re.compile(r'Urbano:\s*' + LINE, re.IGNORECASE)
+SERVICO_SPACE_LINE = re.compile(r'Serviço\s+Urbano\s+' + LINE, re.IGNORECASE)
+LINE_ONLY = re.compile(LINE, re.IGNORECASE)
+LINHA_URBANO = re.compile(r'Linha\s*' + LINE + r'.*Urbano', re.IGNORECASE)
+
+FALLBACK_LINE = re.compile(r'([A-Z]?\d+[A-Z]?)\s*-\s*(' + NAME_CHARS + r'{3,})', re.IGNORECASE)
+FALLBACK_LINHA = re.compile(r'Linha\s*([A-Z]?\d+[A-Z]?)\s*(' + NAME_CHARS + r'{3,})', re.IGNORECASE)
+
+
+class ServiceTokens:
+    def __init__(self, text):
+        self.servico = []
+        self.urbano = []
+        self.inter = []
+        self.tipo = []
+        self.linha = []
+
+        if CASE_FOLD_SPECIAL.search(text):
+            matches = TOKENS.finditer(text)
+        else:
+            matches = TOKENS_LOWER.finditer(text.lower())
+
+        for match in matches:
+            getattr(self, TOKEN_KINDS[match.group()[0]]).append(match)
+
+
+def _first_anchored(pattern, text, anchors):
+    for anchor in anchors:
+        match = pattern.match(text, anchor.start())
+        if match:
+            return match
+    return None
+
+
+def _inter(name):
+    return {
+        'line_number': 'INTER',
+        'bus_name': name.lower()
+    }
+
+
+def _line(match):
+    return {
+        'line_number': match.group(1),
+        'bus_name': match.group(2).strip()
+    }
+
+
+# Retorna (origem, bus_info) com a mesma prioridade da antiga cascata de
+# regex, onde origem é 'servico', 'fallback' ou 'generico'; None se a página
+# não menciona serviço urbano.
+def match_service(text, tokens=None):
+    tokens = tokens or ServiceTokens(text)
+    if not tokens.urbano:
+        return None
+
+    match = _first_anchored(SERVICO_INTER, text, tokens.servico)
+    if match:
+        return 'servico', _inter(match.group(1))
+
+    match = _first_anchored(URBANO_INTER, text, tokens.urbano)
+    if match:
+        return 'servico', _inter(match.group(1))
+
+    # (INTER\s+\d+).*Urbano: só o primeiro INTER pode ter um "urbano" depois
+    last_urbano = tokens.urbano[-1].start()
+    if tokens.inter and tokens.inter[0].end() <= last_urbano:
+        return 'servico', _inter(tokens.inter[0].group())
+
+    # Urbano.*(INTER\s+\d+): último INTER após o primeiro "urbano"
+    if tokens.inter and tokens.inter[-1].start() >= tokens.urbano[0].end():
+        return 'servico', _inter(tokens.inter[-1].group())
+
+    for pattern, anchors in ((SERVICO_LINE, tokens.servico),
+                             (URBANO_LINE, tokens.urbano),
+                             (SERVICO_SPACE_LINE, tokens.servico)):
+        match = _first_anchored(pattern, text, anchors)
+        if match:
+            return 'servico', _line(match)
+
+    # Tipo.*Urbano.*?LINHA: o ".*" guloso tenta do último "urbano" para trás
+    if tokens.tipo:
+        tipo_end = tokens.tipo[0].end()
+        for urbano in reversed(tokens.urbano):
+            if urbano.start() < tipo_end:
+                break
+            match = LINE_ONLY.search(text, urbano.end())
+            if match:
+                return 'servico', _line(match)
+
+    for linha in tokens.linha:
+        if linha.end() > last_urbano:
+            break
+        match = LINHA_URBANO.match(text, linha.start())
+        if match:
+            return 'servico', _line(match)
+
+    if tokens.inter:
+        return 'fallback', _inter(tokens.inter[0].group())
+
+    match = FALLBACK_LINE.search(text)
+    if match and len(match.group(2).strip()) > 3:
+        return 'fallback', _line(match)
+
+    match = FALLBACK_LINHA.search(text)
+    if match and len(match.group(2).strip()) > 3:
+        return 'fallback', _line(match)
+
+    return 'generico', {
+        'line_number': 'unknown',
+        'bus_name': 'urbano'
+    }
@@ -0,0 +1,196 @@
+import argparse
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from bus_crawler import BusCrawler, canonicalize_url
+from work_queue import WorkQueue
+
+
+class ShardedBusCrawler(BusCrawler):
+    # Vários processos (em uma ou mais máquinas) dividem o crawl por uma fila
+    # compartilhada: páginas de listagem e de detalhe são tarefas com lease
+    def __init__(self, base_url, download_dir="images", max_workers=8, queue_path=None,
+                 worker_id=None, lease_timeout=300.0, poll_interval=0.5, max_attempts=3,
+                 queue_journal_mode='WAL', **options):
+        if not queue_path:
+            raise RuntimeError("O modo distribuído requer o caminho da fila (queue_path)")
+        if options.get('incremental') or options.get('resume'):
+            raise RuntimeError("Os modos incremental e de retomada não se aplicam à fila compartilhada")
+
+        super().__init__(base_url, download_dir, max_workers, **options)
+        self.queue_path = queue_path
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.queue_journal_mode = queue_journal_mode
+        self.queue = None
+        self.attempt = threading.local()
+
+    def open_queue(self):
+        return WorkQueue(self.queue_path, self.max_attempts, self.queue_journal_mode, key=canonicalize_url)
+
+    def run_task(self, task):
+        try:
+            if task.kind == 'listing':
+                ok = self.run_listing_task(task)
+            else:
+                ok = self.run_detail_task(task)
+        except Exception as e:
+            self.log.error(f"Erro na tarefa {task.url}: {e}")
+            ok = False
+
+        # Falha devolve a tarefa à fila; após max_attempts ela fica como 'failed'
+        if ok:
+            self.queue.complete(task.id)
+        else:
+            self.queue.release(task.id, self.worker_id)
+
+    def run_listing_task(self, task):
+        self.log.info(f"\nProcessando página {task.page_num}: {task.url}")
+
+        links = self.fetch_listing_page(task.url)
+        if links is None:
+            return False
+
+        image_links, pagination_urls = links
+        self.log.info(f"Encontrados {len(image_links)} links de imagens na página {task.page_num}")
+
+        for url in self.queue.add_listings(pagination_urls):
+            self.log.info(f"🔗 Nova página encontrada: {url}")
+        self.queue.add_details(task.page_num, image_links)
+
+        with self.lock:
+            self.page_count += 1
+            self.total_images += len(image_links)
+        return True
+
+    def run_detail_task(self, task):
+        # Falha de rede (página ou imagem) devolve a tarefa à fila; página sem
+        # imagem urbana ou imagem que já estava salva conclui a tarefa
+        response = self.get_page(task.url)
+        if response is None:
+            return False
+        image_data = self.resolve_image_page(response.text, task.url)
+        self.remember_detail(task.url, image_data)
+        if not image_data:
+            return True
+
+        # O id da tarefa numera o arquivo: único entre todos os workers
+        self.attempt.tag = f"{task.id}-{task.attempts}"
+        try:
+            filename = self.download_validated_image(image_data, task.id)
+        finally:
+            self.attempt.tag = None
+        if filename:
+            with self.lock:
+                self.downloaded_total += 1
+            return True
+        return self.is_stored(image_data, task.id)
+
+    def is_stored(self, image_data, index):
+        # Sem arquivo novo: já existia ou era duplicada (sucesso), ou o download falhou
+        filename = self.reserve_filename(image_data, self.generate_filename(
+            image_data['url'], index, image_data['bus_info']))
+        return self.is_already_downloaded(filename, os.path.join(self.download_dir, filename), image_data['url'])
+
+    def part_path(self, filepath):
+        # Um lease vencido pode rodar a mesma tarefa em dois workers ao mesmo
+        # tempo: cada tentativa escreve no seu próprio .part
+        tag = getattr(self.attempt, 'tag', None)
+        if tag is None:
+            return super().part_path(filepath)
+        return f"{filepath}.{tag}.part"
+
+    def crawl_website(self, start_url=None, max_pages=None):
+        print(f"Iniciando worker {self.worker_id} na fila {self.queue_path}")
+
+        self.reset_stats()
+        self.queue = self.open_queue()
+        if start_url:
+            self.queue.seed(start_url, max_pages)
+        self.open_stores()
+        self.page_count = 0
+        self.total_images = 0
+        self.downloaded_total = 0
+        running = set()
+        waiting = False
+        self.metrics.gauge('leased_tasks', lambda: len(running))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while True:
+                    free = self.max_workers - len(running)
+                    tasks = self.queue.lease(self.worker_id, free, self.lease_timeout) if free else []
+                    for task in tasks:
+                        running.add(executor.submit(self.run_task, task))
+
+                    if not running:
+                        if self.queue.drained():
+                            break
+                        if not waiting and not self.queue.is_seeded():
+                            self.log.info("⏳ Aguardando a fila ser semeada...")
+                            waiting = True
+                        time.sleep(self.poll_interval)
+                        continue
+
+                    done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+        finally:
+            self.shutdown_parse_pool()
+            self.close_stores()
+            self.queue.close()
+            self.queue = None
+
+        self.print_summary(self.page_count, self.total_images, self.downloaded_total)
+
+
+def print_status(queue):
+    counts = queue.counts()
+    for kind, label in (('listing', 'Páginas de listagem'), ('detail', 'Páginas de detalhe')):
+        states = counts.get(kind, {})
+        print(f"{label}: " + ', '.join(
+            f"{state} {states.get(state, 0)}" for state in ('pending', 'leased', 'done', 'failed')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl distribuído por uma fila SQLite compartilhada")
+    parser.add_argument('command', choices=['seed', 'worker', 'status'])
+    parser.add_argument('--queue', required=True, help="arquivo da fila (num disco compartilhado entre as máquinas)")
+    parser.add_argument('--url', help="URL inicial (seed)")
+    parser.add_argument('--pages', type=int, help="máximo de páginas de listagem (seed)")
+    parser.add_argument('--base-url', default="https://www.onibusbrasil.com")
+    parser.add_argument('--download-dir', default="onibus_images")
+    parser.add_argument('--threads', type=int, default=8, help="tarefas simultâneas por worker")
+    parser.add_argument('--lease-timeout', type=float, default=300.0,
+                        help="segundos até uma tarefa de um worker parado voltar para a fila")
+    parser.add_argument('--content-store', action='store_true', help="store de imagens por conteúdo compartilhado")
+    parser.add_argument('--journal-mode', default='WAL',
+                        help="modo de journal do SQLite da fila (DELETE em sistemas de arquivos de rede)")
+    args = parser.parse_args()
+
+    if args.command == 'seed':
+        if not args.url:
+            parser.error("seed requer --url")
+        queue = WorkQueue(args.queue, journal_mode=args.journal_mode, key=canonicalize_url)
+        queue.seed(args.url, args.pages)
+        print(f"🌱 Fila {args.queue} semeada com {args.url}")
+        print_status(queue)
+        queue.close()
+    elif args.command == 'status':
+        queue = WorkQueue(args.queue, journal_mode=args.journal_mode)
+        print_status(queue)
+        queue.close()
+    else:
+        crawler = ShardedBusCrawler(args.base_url, args.download_dir, max_workers=args.threads,
+                                    queue_path=args.queue, lease_timeout=args.lease_timeout,
+                                    queue_journal_mode=args.journal_mode, content_store=args.content_store)
+        crawler.crawl_website()
+
+
+if __name__ == "__main__":
+    main()
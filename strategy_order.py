@@ -0,0 +1,78 @@
+from urllib.parse import urlparse
+
+from crawl_journal import BatchedStore
+
+STRATEGY_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS wins (
+    pattern TEXT NOT NULL,
+    probe TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (pattern, probe)
+) WITHOUT ROWID;
+'''
+
+# Chave usada quando nenhuma estratégia encontra a imagem
+MISS = ''
+
+
+def url_pattern(url):
+    # Páginas de detalhe do mesmo host e da mesma seção usam o mesmo template
+    parsed = urlparse(url)
+    section = parsed.path.strip('/').split('/', 1)[0]
+    return f"{parsed.netloc.lower()}/{section}"
+
+
+class StrategyStats(BatchedStore):
+    def __init__(self, path, explore_every=20, min_samples=10, confidence=0.9,
+                 max_samples=1000, batch_size=200, flush_interval=2.0):
+        super().__init__(path, STRATEGY_SCHEMA, batch_size, flush_interval)
+        self.explore_every = explore_every
+        self.min_samples = min_samples
+        self.confidence = confidence
+        self.max_samples = max_samples
+
+        # Quantas vezes cada sonda foi a primeira a acertar na ordem original
+        self.wins = {}
+        for pattern, probe, count in self.conn.execute('SELECT pattern, probe, count FROM wins'):
+            self.wins.setdefault(pattern, {})[probe] = count
+        self.visits = {}
+
+    def preferred(self, pattern):
+        # Sonda a tentar primeiro, ou None para percorrer a ordem original:
+        # padrão ainda sem amostras suficientes, vencedora pouco dominante ou
+        # a página de exploração periódica que mantém as estatísticas atualizadas
+        with self.lock:
+            visits = self.visits[pattern] = self.visits.get(pattern, 0) + 1
+            wins = self.wins.get(pattern)
+            if not wins or visits % self.explore_every == 0:
+                return None
+
+            hits = {probe: count for probe, count in wins.items() if probe != MISS}
+            if not hits:
+                return None
+            best = max(hits, key=hits.get)
+            if hits[best] < self.min_samples or hits[best] < self.confidence * sum(hits.values()):
+                return None
+            return best
+
+    def record(self, pattern, probe):
+        probe = probe or MISS
+        with self.lock:
+            wins = self.wins.setdefault(pattern, {})
+            wins[probe] = wins.get(probe, 0) + 1
+            self._write(
+                'INSERT INTO wins (pattern, probe, count) VALUES (?, ?, 1) '
+                'ON CONFLICT (pattern, probe) DO UPDATE SET count = count + 1',
+                (pattern, probe),
+            )
+
+            # Decaimento: metade das contagens ao atingir o teto, para que
+            # uma mudança de template no site seja aprendida em poucas páginas
+            if sum(wins.values()) > self.max_samples:
+                for key in wins:
+                    wins[key] //= 2
+                self._write('UPDATE wins SET count = count / 2 WHERE pattern = ?', (pattern,))
+
+    def snapshot(self):
+        with self.lock:
+            return {pattern: dict(wins) for pattern, wins in self.wins.items()}
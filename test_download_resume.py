@@ -0,0 +1,116 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from bus_crawler import BusCrawler
+from fixture_site import FixtureSite
+
+PHOTO_ID = 7
+
+
+class DownloadResumeTest(unittest.TestCase):
+    # Downloads cortados no meio pelo site de fixture: o .part precisa ser
+    # retomado (ou refeito) até ficar idêntico byte a byte à imagem servida
+    def setUp(self):
+        self.site = FixtureSite(pages=1, images_per_page=1).start()
+        self.addCleanup(self.site.stop)
+        self.download_dir = tempfile.mkdtemp(prefix='buscrawl_test_')
+        self.addCleanup(shutil.rmtree, self.download_dir, True)
+        self.image_url = f"{self.site.base_url}/img/{PHOTO_ID}-large.jpg"
+        self.expected = self.site.image_bytes(PHOTO_ID)
+        self.filepath = os.path.join(self.download_dir, 'foto.jpg')
+        self.part_path = self.filepath + '.part'
+
+    def crawler(self, cls=BusCrawler, download_attempts=1):
+        return cls(self.site.base_url, self.download_dir, download_attempts=download_attempts, log_level='error')
+
+    def interrupt(self):
+        # Uma tentativa com a conexão derrubada no meio do corpo
+        crawler = self.crawler()
+        self.site.drop_rate = 1.0
+        self.assertFalse(crawler.download_image(self.image_url, 'foto.jpg'))
+        self.site.drop_rate = 0.0
+
+        partial = os.path.getsize(self.part_path)
+        self.assertGreater(partial, 0)
+        self.assertLess(partial, len(self.expected))
+        self.assertFalse(os.path.exists(self.filepath))
+        return partial
+
+    def assert_complete(self):
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), self.expected)
+        self.assertFalse(os.path.exists(self.part_path))
+
+    def test_image_spans_several_reads(self):
+        self.assertGreater(len(self.expected), 4 * 16384)
+
+    def test_range_resume(self):
+        self.interrupt()
+        crawler = self.crawler()
+        self.assertTrue(crawler.download_image(self.image_url, 'foto.jpg'))
+        self.assert_complete()
+        self.assertEqual(crawler.stats['resumed_downloads'], 1)
+
+    def test_retry_within_same_download(self):
+        crawler = self.crawler(download_attempts=3)
+        self.site.drop_rate = 1.0
+        # A primeira tentativa cai; as seguintes retomam com Range
+        original = self.site.send_image
+
+        def drop_once(handler, data):
+            self.site.drop_rate = 0.0 if self.site.drop_count else 1.0
+            original(handler, data)
+
+        self.site.send_image = drop_once
+        self.assertTrue(crawler.download_image(self.image_url, 'foto.jpg'))
+        self.assert_complete()
+        self.assertEqual(self.site.drop_count, 1)
+        self.assertEqual(crawler.stats['resumed_downloads'], 1)
+
+    def test_server_ignores_range(self):
+        self.interrupt()
+        self.site.range_support = False
+        crawler = self.crawler()
+        self.assertTrue(crawler.download_image(self.image_url, 'foto.jpg'))
+        # 200 com o corpo inteiro: o .part é reescrito do início
+        self.assert_complete()
+        self.assertEqual(crawler.stats['resumed_downloads'], 0)
+
+    def test_part_already_complete(self):
+        # Queda depois do último byte: o servidor responde 416 com o mesmo tamanho
+        with open(self.part_path, 'wb') as f:
+            f.write(self.expected)
+        crawler = self.crawler()
+        self.assertTrue(crawler.download_image(self.image_url, 'foto.jpg'))
+        self.assert_complete()
+
+    def test_part_larger_than_image(self):
+        # 416 com outro tamanho: o .part é inválido e o download recomeça
+        with open(self.part_path, 'wb') as f:
+            f.write(self.expected + b'lixo')
+        crawler = self.crawler(download_attempts=2)
+        self.assertTrue(crawler.download_image(self.image_url, 'foto.jpg'))
+        self.assert_complete()
+
+    def test_async_range_resume(self):
+        import aiohttp
+        from async_crawler import AsyncBusCrawler
+
+        self.interrupt()
+        crawler = self.crawler(AsyncBusCrawler)
+
+        async def download():
+            async with aiohttp.ClientSession() as http:
+                crawler.http = http
+                return await crawler.download_image_async(self.image_url, 'foto.jpg')
+
+        self.assertTrue(asyncio.run(download()))
+        self.assert_complete()
+        self.assertEqual(crawler.stats['resumed_downloads'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
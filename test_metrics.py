@@ -0,0 +1,71 @@
+import cProfile
+import threading
+import unittest
+from unittest import mock
+
+from metrics import Metrics
+
+
+def busy_work():
+    return sum(i * i for i in range(2000))
+
+
+class StageProfilingTest(unittest.TestCase):
+    def run_threads(self, metrics, threads=8, rounds=20):
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(rounds):
+                    with metrics.stage('detail_parse'):
+                        with metrics.stage('service_match'):
+                            busy_work()
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return errors
+
+    def test_concurrent_profiled_stages(self):
+        metrics = Metrics(profile_stages=('detail_parse', 'service_match'))
+        errors = self.run_threads(metrics)
+
+        self.assertEqual(errors, [])
+        stages = metrics.snapshot()['stages']
+        self.assertEqual(stages['detail_parse']['in_flight'], 0)
+        self.assertEqual(stages['service_match']['in_flight'], 0)
+        self.assertEqual(stages['detail_parse']['count'], 8 * 20)
+        self.assertIn('detail_parse', metrics.profiles)
+        self.assertFalse(metrics.profiling)
+
+    def test_profiler_already_active(self):
+        # Com outra ferramenta de profiling ativa o estágio roda sem perfil
+        metrics = Metrics(profile_stages=('detail_parse',))
+        error = ValueError("Another profiling tool is already active")
+        with mock.patch.object(cProfile.Profile, 'enable', side_effect=error):
+            errors = self.run_threads(metrics, threads=4, rounds=5)
+
+        self.assertEqual(errors, [])
+        stages = metrics.snapshot()['stages']
+        self.assertEqual(stages['detail_parse']['in_flight'], 0)
+        self.assertEqual(stages['detail_parse']['count'], 4 * 5)
+        self.assertEqual(metrics.profiles, {})
+
+    def test_failing_stage_leaves_no_in_flight(self):
+        metrics = Metrics(profile_stages=('detail_parse',))
+        with self.assertRaises(RuntimeError):
+            with metrics.stage('detail_parse'):
+                raise RuntimeError('falha no parsing')
+
+        self.assertEqual(metrics.snapshot()['stages']['detail_parse']['in_flight'], 0)
+        self.assertFalse(metrics.profiling)
+
+
+if __name__ == "__main__":
+    unittest.main()
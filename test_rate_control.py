@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+from rate_control import HostLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class AimdConvergenceTest(unittest.TestCase):
+    def setUp(self):
+        # Relógio simulado: cada rodada avança a latência da resposta, então as
+        # janelas de redução do AIMD não dependem do tempo real do teste
+        self.clock = FakeClock()
+        patcher = mock.patch('rate_control.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_rounds(self, limiter, server, rounds):
+        # Em cada rodada ocupa todas as vagas do limite, observa as respostas
+        # do servidor simulado para essa concorrência e libera as vagas
+        limits = []
+        for _ in range(rounds):
+            slots = 0
+            while limiter.try_acquire() == 0.0:
+                slots += 1
+            latency, status = server(slots)
+            for _ in range(slots):
+                limiter.observe(latency, status)
+            for _ in range(slots):
+                limiter.release()
+            self.clock.now += latency
+            limits.append(limiter.limit)
+        return limits
+
+    def test_additive_increase_until_overload(self):
+        # Servidor rápido que responde 429 acima de 8 requisições simultâneas
+        def server(in_flight):
+            return 0.05, 429 if in_flight > 8 else 200
+
+        limiter = HostLimiter(2, 1, 64, target_latency=1.0)
+        limits = self.run_rounds(limiter, server, 400)
+
+        self.assertGreaterEqual(max(limits[:200]), 8)
+        # Dente de serra do AIMD: sobe até a capacidade e cai pela metade
+        steady = limits[200:]
+        self.assertLessEqual(max(steady), 10)
+        self.assertGreaterEqual(min(steady), 4)
+        self.assertGreater(limiter.overloads, 0)
+
+    def test_latency_above_target_reduces_limit(self):
+        # Latência cresce com a concorrência: 0.05 s por requisição simultânea;
+        # com alvo de 0.4 s o equilíbrio fica em torno de 8
+        def server(in_flight):
+            return 0.05 * in_flight, 200
+
+        limiter = HostLimiter(32, 1, 64, target_latency=0.4)
+        limits = self.run_rounds(limiter, server, 600)
+
+        steady = limits[300:]
+        self.assertLessEqual(max(steady), 10)
+        self.assertGreaterEqual(min(steady), 5)
+
+    def test_burst_of_429_decreases_once_per_window(self):
+        limiter = HostLimiter(16, 1, 64, target_latency=1.0)
+        for _ in range(20):
+            limiter.observe(0.1, 429)
+        self.assertEqual(limiter.limit, 8)
+
+        self.clock.now += 1.0
+        limiter.observe(0.1, 429)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_retry_after_blocks_host(self):
+        limiter = HostLimiter(4, 1, 64, target_latency=1.0)
+        limiter.observe(0.1, 429, retry_after=2.0)
+        self.assertAlmostEqual(limiter.try_acquire(), 2.0)
+
+        self.clock.now += 2.0
+        self.assertEqual(limiter.try_acquire(), 0.0)
+
+
+class BlockingAcquireTest(unittest.TestCase):
+    def test_release_wakes_waiting_thread(self):
+        limiter = HostLimiter(1, 1, 1, target_latency=1.0, adaptive=False)
+        limiter.acquire()
+        acquired = threading.Event()
+
+        def waiter():
+            limiter.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        self.assertFalse(acquired.wait(0.2))
+
+        limiter.release()
+        self.assertTrue(acquired.wait(1.0))
+        thread.join()
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_waiting_threads_do_not_poll(self):
+        limiter = HostLimiter(1, 1, 1, target_latency=1.0, adaptive=False)
+        limiter.acquire()
+        reserve = limiter._reserve
+        calls = []
+
+        def counting_reserve(now):
+            calls.append(now)
+            return reserve(now)
+
+        limiter._reserve = counting_reserve
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.3)
+        # Uma tentativa por thread, sem acordar a cada poucos milissegundos
+        self.assertEqual(len(calls), 8)
+
+        for _ in threads:
+            limiter.release()
+        for thread in threads:
+            thread.join(1.0)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+
+    def test_release_wakes_waiting_coroutine(self):
+        limiter = HostLimiter(1, 1, 1, target_latency=1.0, adaptive=False)
+        limiter.acquire()
+
+        async def main():
+            task = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.1)
+            self.assertFalse(task.done())
+            threading.Timer(0.05, limiter.release).start()
+            await asyncio.wait_for(task, 1.0)
+
+        asyncio.run(main())
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertEqual(limiter.waiters, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from bs4 import BeautifulSoup
+
+from bus_crawler import BusCrawler
+
+# Páginas de detalhe com o bus_info que a cascata de regex original
+# (extract_bus_service_info antes do match_service) devolvia para cada uma:
+# os layouts do fixture_site.py, casos de borda e textos aleatórios
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service_matcher_golden.json')
+
+
+class ServiceMatcherGoldenTest(unittest.TestCase):
+    def setUp(self):
+        self.download_dir = tempfile.mkdtemp(prefix='buscrawl_test_')
+        self.crawler = BusCrawler("https://www.onibusbrasil.com", self.download_dir, log_level='error')
+        with open(GOLDEN_PATH, encoding='utf-8') as f:
+            self.cases = json.load(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+
+    def test_same_result_as_regex_cascade(self):
+        for case in self.cases:
+            soup = BeautifulSoup(case['html'], 'html.parser')
+            with self.subTest(html=case['html']):
+                self.assertEqual(self.crawler.extract_bus_service_info(soup), case['expected'])
+
+    def test_fast_parse_text_matches(self):
+        # No parsing rápido o texto vem da árvore do lxml, não do BeautifulSoup
+        import lxml.html
+        from bus_crawler import SERVICE_TEXT
+
+        for case in self.cases:
+            if not case['html']:
+                continue
+            page_text = ''.join(SERVICE_TEXT(lxml.html.fromstring(case['html'])))
+            with self.subTest(html=case['html']):
+                self.assertEqual(self.crawler.extract_bus_service_info(None, page_text), case['expected'])
+
+    def test_corpus_covers_every_branch(self):
+        from service_matcher import match_service
+
+        origins = set()
+        for case in self.cases:
+            text = BeautifulSoup(case['html'], 'html.parser').get_text().replace('\n', ' ').replace('\r', ' ')
+            result = match_service(text)
+            origins.add(result[0] if result else None)
+        self.assertEqual(origins, {'servico', 'fallback', 'generico', None})
+
+
+if __name__ == "__main__":
+    unittest.main()
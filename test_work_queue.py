@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from work_queue import WorkQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class WorkQueueLeaseTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='buscrawl_test_')
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+        self.path = os.path.join(self.work_dir, 'fila.db')
+        self.clock = FakeClock()
+        patcher = mock.patch('work_queue.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_queue(self):
+        # Cada worker abre a fila com sua própria conexão, como processos separados
+        queue = WorkQueue(self.path)
+        self.addCleanup(queue.close)
+        return queue
+
+    def seed_details(self, queue, count):
+        queue.seed('http://fixture/fotos?page=1')
+        [listing] = queue.lease('seed', 1, 30)
+        queue.add_details(1, [f"http://fixture/foto/{i}" for i in range(1, count + 1)])
+        queue.complete(listing.id)
+
+    def test_expired_lease_goes_to_another_worker_once(self):
+        first = self.open_queue()
+        second = self.open_queue()
+        self.seed_details(first, 1)
+
+        [task] = first.lease('a', 10, 30)
+        self.assertEqual(second.lease('b', 10, 30), [])
+
+        # O worker "a" morre sem concluir: depois do timeout o lease vence
+        self.clock.now += 31
+        [retry] = second.lease('b', 10, 30)
+        self.assertEqual((retry.id, retry.url, retry.attempts), (task.id, task.url, 2))
+        self.assertEqual(first.lease('a', 10, 30), [])
+        self.assertEqual(second.lease('c', 10, 30), [])
+
+        self.assertTrue(second.complete(retry.id))
+        self.assertTrue(first.drained())
+
+    def test_complete_is_idempotent(self):
+        first = self.open_queue()
+        second = self.open_queue()
+        self.seed_details(first, 1)
+
+        [task] = first.lease('a', 10, 30)
+        self.clock.now += 31
+        [retry] = second.lease('b', 10, 30)
+
+        # O worker travado acorda e conclui depois do outro: só a primeira conta
+        self.assertTrue(second.complete(retry.id))
+        self.assertFalse(first.complete(task.id))
+        self.assertEqual(first.counts(), {'listing': {'done': 1}, 'detail': {'done': 1}})
+
+    def test_stale_release_does_not_requeue(self):
+        first = self.open_queue()
+        second = self.open_queue()
+        self.seed_details(first, 1)
+
+        [task] = first.lease('a', 10, 30)
+        self.clock.now += 31
+        second.lease('b', 10, 30)
+
+        # Release do dono antigo não devolve a tarefa que agora é de "b"
+        first.release(task.id, 'a')
+        self.assertEqual(first.counts()['detail'], {'leased': 1})
+
+    def test_failed_after_max_attempts(self):
+        queue = self.open_queue()
+        self.seed_details(queue, 1)
+
+        for attempt in range(1, 4):
+            [task] = queue.lease('a', 10, 30)
+            self.assertEqual(task.attempts, attempt)
+            self.clock.now += 31
+
+        self.assertEqual(queue.lease('a', 10, 30), [])
+        self.assertEqual(queue.counts()['detail'], {'failed': 1})
+        self.assertTrue(queue.drained())
+
+    def test_concurrent_workers_never_share_a_task(self):
+        self.seed_details(self.open_queue(), 200)
+        leased = []
+        lock = threading.Lock()
+
+        def worker(name):
+            queue = WorkQueue(self.path)
+            try:
+                while True:
+                    tasks = queue.lease(name, 5, 30)
+                    if not tasks:
+                        return
+                    with lock:
+                        leased.extend(task.id for task in tasks)
+                    for task in tasks:
+                        queue.complete(task.id)
+            finally:
+                queue.close()
+
+        threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(leased), 200)
+        self.assertEqual(len(set(leased)), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import sqlite3
+import threading
+import time
+
+QUEUE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    fetch_url TEXT,
+    page_num INTEGER NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (kind, url)
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+
+class Task:
+    def __init__(self, id, kind, url, page_num, position, attempts):
+        self.id = id
+        self.kind = kind
+        self.url = url
+        self.page_num = page_num
+        self.position = position
+        self.attempts = attempts
+
+
+class WorkQueue:
+    # Fila compartilhada entre processos (ou máquinas, com o arquivo num disco
+    # compartilhado). Ao contrário do BatchedStore, cada operação é confirmada
+    # na hora: outro worker precisa enxergar o lease imediatamente.
+    # key(url) é a chave de deduplicação das páginas de listagem (a URL
+    # canônica); a tarefa guarda também a URL como veio, que é a buscada
+    def __init__(self, path, max_attempts=3, journal_mode='WAL', busy_timeout=60.0, key=None):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.key = key
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        # WAL exige memória compartilhada; em sistemas de arquivos de rede use 'DELETE'
+        self.conn.execute(f'PRAGMA journal_mode={journal_mode}')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(QUEUE_SCHEMA)
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(tasks)')]
+        if 'fetch_url' not in columns:
+            # Filas criadas antes da coluna fetch_url
+            self.conn.execute('ALTER TABLE tasks ADD COLUMN fetch_url TEXT')
+
+    def _transaction(self, work):
+        # BEGIN IMMEDIATE: a trava de escrita é pega antes das leituras, então
+        # dois workers nunca recebem a mesma tarefa
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = work()
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+            return result
+
+    def _meta(self, key):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def seed(self, start_url, max_pages=None):
+        def work():
+            if self._meta('seeded') is None:
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('seeded', ?)", (str(time.time()),))
+                if max_pages:
+                    self.conn.execute("INSERT INTO meta (key, value) VALUES ('max_pages', ?)", (str(max_pages),))
+            return self._add_listings([start_url])
+        return self._transaction(work)
+
+    def add_listings(self, urls):
+        return self._transaction(lambda: self._add_listings(urls))
+
+    def _add_listings(self, urls):
+        # Numeração das páginas na ordem em que entram na fila, respeitando max_pages
+        max_pages = self._meta('max_pages')
+        max_pages = int(max_pages) if max_pages else None
+        count = self.conn.execute("SELECT COUNT(*) FROM tasks WHERE kind = 'listing'").fetchone()[0]
+
+        added = []
+        for url in urls:
+            if max_pages is not None and count >= max_pages:
+                break
+            key = self.key(url) if self.key is not None else url
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO tasks (kind, url, fetch_url, page_num) VALUES ('listing', ?, ?, ?)",
+                (key, url if url != key else None, count + 1))
+            if cursor.rowcount:
+                count += 1
+                added.append(url)
+        return added
+
+    def add_details(self, page_num, urls):
+        def work():
+            # Uma página de detalhe listada em duas páginas fica com a primeira
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (kind, url, page_num, position) VALUES ('detail', ?, ?, ?)",
+                [(url, page_num, position) for position, url in enumerate(urls)],
+            )
+        self._transaction(work)
+
+    def lease(self, owner, limit, visibility_timeout):
+        def work():
+            now = time.time()
+            # Leases vencidos (worker morto ou travado) voltam para a fila,
+            # a não ser que a tarefa já tenha esgotado as tentativas
+            self.conn.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, owner = NULL "
+                "WHERE state = 'leased' AND lease_expires < ?",
+                (self.max_attempts, now),
+            )
+            rows = self.conn.execute(
+                "SELECT id, kind, COALESCE(fetch_url, url), page_num, position, attempts FROM tasks "
+                "WHERE state = 'pending' ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE tasks SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                [(owner, now + visibility_timeout, row[0]) for row in rows],
+            )
+            return [Task(*row[:5], row[5] + 1) for row in rows]
+        return self._transaction(work)
+
+    def complete(self, task_id):
+        # Idempotente: se o lease venceu e outro worker também concluiu a
+        # tarefa, só a primeira conclusão conta
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET state = 'done', owner = NULL WHERE id = ? AND state != 'done'", (task_id,))
+            return cursor.rowcount == 1
+
+    def release(self, task_id, owner):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, owner = NULL "
+                "WHERE id = ? AND owner = ? AND state = 'leased'",
+                (self.max_attempts, task_id, owner),
+            )
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute('SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state').fetchall()
+        counts = {}
+        for kind, state, count in rows:
+            counts.setdefault(kind, {})[state] = count
+        return counts
+
+    def is_seeded(self):
+        with self.lock:
+            return self._meta('seeded') is not None
+
+    def drained(self):
+        with self.lock:
+            if self._meta('seeded') is None:
+                return False
+            row = self.conn.execute(
+                "SELECT 1 FROM tasks WHERE state IN ('pending', 'leased') LIMIT 1").fetchone()
+            return row is None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()